@@ -0,0 +1,333 @@
+"""
+AI 建议结果缓存
+
+DeepSeekAdvisor 的缓存后端，相同提示词的建议不再重复调用（计费的）API：
+- MemoryLRUCache: 进程内 LRU 缓存，同时按条目数和字节数限制容量，支持 TTL
+- SQLiteAdviceCache: 本地 SQLite 持久化缓存，服务重启后仍有效，多个 worker 进程可共享
+- TieredAdviceCache: 内存 + SQLite 两级缓存，内存未命中时从 SQLite 读取并回填
+所有后端都统计命中率。
+
+缓存值以 JSON 序列化存储，读取时返回新的字典副本，调用方修改结果不会影响缓存。
+
+作者: Health Management System Team
+日期: 2026-02-15
+"""
+
+import json
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class CacheStats:
+    """缓存命中率统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def record(self, field: str, count: int = 1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + count)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'sets': self.sets,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+class BaseAdviceCache(ABC):
+    """缓存后端接口（子类必须实现 get/set/clear）"""
+
+    def __init__(self, ttl: int = 3600):
+        self.ttl = ttl
+        self.stats = CacheStats()
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict]:
+        """读取缓存，未命中或已过期返回 None"""
+
+    @abstractmethod
+    def set(self, key: str, value: Dict):
+        """写入缓存"""
+
+    @abstractmethod
+    def clear(self):
+        """清空缓存"""
+
+    def get_stats(self) -> Dict:
+        return {'backend': self.__class__.__name__, 'ttl': self.ttl, **self.stats.to_dict()}
+
+    @staticmethod
+    def _dumps(value: Dict) -> bytes:
+        return json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+    @staticmethod
+    def _loads(payload: bytes) -> Dict:
+        return json.loads(payload)
+
+
+class MemoryLRUCache(BaseAdviceCache):
+    """
+    进程内 LRU + TTL 缓存
+
+    超过 max_entries 条或 max_bytes 字节时淘汰最久未使用的条目；
+    过期条目在读取时删除，写入时顺带清理。
+    """
+
+    def __init__(self, ttl: int = 3600, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()  # key -> (expires_at, payload)
+        self._bytes = 0
+
+    def _remove(self, key: str):
+        _, payload = self._entries.pop(key)
+        self._bytes -= len(payload)
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.record('misses')
+                return None
+            if entry[0] <= time.time():
+                self._remove(key)
+                self.stats.record('expirations')
+                self.stats.record('misses')
+                return None
+            self._entries.move_to_end(key)
+            payload = entry[1]
+        self.stats.record('hits')
+        return self._loads(payload)
+
+    def set(self, key: str, value: Dict, expires_at: Optional[float] = None):
+        payload = self._dumps(value)
+        if len(payload) > self.max_bytes:
+            return
+        expires_at = expires_at or time.time() + self.ttl
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, payload)
+            self._bytes += len(payload)
+            self.stats.record('sets')
+
+            # 先清理过期条目，再按 LRU 淘汰到容量以内
+            now = time.time()
+            expired = [k for k, (exp, _) in self._entries.items() if exp <= now]
+            for k in expired:
+                self._remove(k)
+            if expired:
+                self.stats.record('expirations', len(expired))
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.stats.record('evictions')
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            size = {'entries': len(self._entries), 'bytes': self._bytes}
+        return {
+            **super().get_stats(),
+            **size,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+        }
+
+
+class SQLiteAdviceCache(BaseAdviceCache):
+    """
+    SQLite 持久化缓存
+
+    使用 WAL 模式，多个 worker 进程可同时读写同一个数据库文件；
+    每个线程使用独立连接。超过 max_entries 条时按最近访问时间淘汰。
+    """
+
+    PRUNE_EVERY = 100  # 每写入多少次清理一次过期/超量条目
+
+    def __init__(self, path: str, ttl: int = 3600, max_entries: int = 100000):
+        super().__init__(ttl)
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS advice_cache ('
+                ' key TEXT PRIMARY KEY,'
+                ' value BLOB NOT NULL,'
+                ' expires_at REAL NOT NULL,'
+                ' accessed_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS advice_cache_accessed ON advice_cache (accessed_at)')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get_with_expiry(self, key: str) -> Optional[tuple]:
+        """读取缓存值及其过期时间（两级缓存用过期时间回填内存层）"""
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT value, expires_at FROM advice_cache WHERE key = ?', (key,)
+        ).fetchone()
+
+        if row is None:
+            self.stats.record('misses')
+            return None
+
+        if row[1] <= now:
+            with conn:
+                conn.execute('DELETE FROM advice_cache WHERE key = ?', (key,))
+            self.stats.record('expirations')
+            self.stats.record('misses')
+            return None
+
+        with conn:
+            conn.execute('UPDATE advice_cache SET accessed_at = ? WHERE key = ?', (now, key))
+        self.stats.record('hits')
+        return self._loads(row[0]), row[1]
+
+    def get(self, key: str) -> Optional[Dict]:
+        found = self.get_with_expiry(key)
+        return found[0] if found is not None else None
+
+    def set(self, key: str, value: Dict):
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO advice_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, self._dumps(value), now + self.ttl, now)
+            )
+        self.stats.record('sets')
+
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self):
+        """删除过期条目，并按最近访问时间淘汰超出容量的条目"""
+        conn = self._connect()
+        with conn:
+            expired = conn.execute('DELETE FROM advice_cache WHERE expires_at <= ?', (time.time(),)).rowcount
+            evicted = conn.execute(
+                'DELETE FROM advice_cache WHERE key IN ('
+                ' SELECT key FROM advice_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            ).rowcount
+        self.stats.record('expirations', max(expired, 0))
+        self.stats.record('evictions', max(evicted, 0))
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM advice_cache')
+
+    def get_stats(self) -> Dict:
+        entries = self._connect().execute('SELECT COUNT(*) FROM advice_cache').fetchone()[0]
+        return {
+            **super().get_stats(),
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'path': self.path,
+        }
+
+
+class TieredAdviceCache(BaseAdviceCache):
+    """内存 + SQLite 两级缓存"""
+
+    def __init__(self, memory: MemoryLRUCache, persistent: SQLiteAdviceCache):
+        super().__init__(memory.ttl)
+        self.memory = memory
+        self.persistent = persistent
+
+    def get(self, key: str) -> Optional[Dict]:
+        value = self.memory.get(key)
+        if value is None:
+            found = self.persistent.get_with_expiry(key)
+            if found is not None:
+                value, expires_at = found
+                self.memory.set(key, value, expires_at=expires_at)
+
+        self.stats.record('hits' if value is not None else 'misses')
+        return value
+
+    def set(self, key: str, value: Dict):
+        self.memory.set(key, value)
+        self.persistent.set(key, value)
+        self.stats.record('sets')
+
+    def clear(self):
+        self.memory.clear()
+        self.persistent.clear()
+
+    def get_stats(self) -> Dict:
+        return {
+            **super().get_stats(),
+            'memory': self.memory.get_stats(),
+            'persistent': self.persistent.get_stats(),
+        }
+
+
+def build_advice_cache(ttl: int = 3600) -> BaseAdviceCache:
+    """
+    按环境变量创建缓存后端
+
+    ADVICE_CACHE_BACKEND: memory（默认）/ sqlite / tiered
+    ADVICE_CACHE_MAX_ENTRIES: 内存缓存最大条目数，默认 1024
+    ADVICE_CACHE_MAX_BYTES: 内存缓存最大字节数，默认 16MB
+    ADVICE_CACHE_PATH: SQLite 文件路径，默认 cache/advice_cache.sqlite3
+    """
+    backend = os.getenv('ADVICE_CACHE_BACKEND', 'memory').lower()
+
+    def memory():
+        return MemoryLRUCache(
+            ttl=ttl,
+            max_entries=int(os.getenv('ADVICE_CACHE_MAX_ENTRIES', '1024')),
+            max_bytes=int(os.getenv('ADVICE_CACHE_MAX_BYTES', str(16 * 1024 * 1024))),
+        )
+
+    def sqlite():
+        return SQLiteAdviceCache(
+            os.getenv('ADVICE_CACHE_PATH', os.path.join('cache', 'advice_cache.sqlite3')),
+            ttl=ttl,
+        )
+
+    if backend == 'sqlite':
+        return sqlite()
+    if backend == 'tiered':
+        return TieredAdviceCache(memory(), sqlite())
+    return memory()
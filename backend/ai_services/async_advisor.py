@@ -0,0 +1,231 @@
+"""
+异步 DeepSeek AI 顾问
+
+DeepSeekAdvisor 使用同步 OpenAI 客户端和 time.sleep 退避，在 FastAPI 的 async 路由中调用
+会阻塞事件循环（限流重试时最长 25 秒）。异步版本：
+- AsyncOpenAI 客户端 + 有界连接池，信号量限制同时进行的上游请求数
+- asyncio.sleep 非阻塞指数退避
+- single-flight: 并发的相同提示词只触发一次上游调用，其余请求等待同一结果
+- SQLite/分级缓存的读写有阻塞 I/O，放到线程池执行，不占用事件循环
+缓存、提示词模板和 Mock 响应与同步版本共用。
+
+作者: Health Management System Team
+日期: 2026-02-15
+"""
+
+import asyncio
+import copy
+import os
+from datetime import datetime
+from typing import Dict, Optional
+
+try:
+    import openai
+    from openai import AsyncOpenAI
+except ImportError:
+    pass  # 父类会切换到 Mock 模式
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from ai_services.deepseek_advisor import DeepSeekAdvisor
+from ai_services.advice_cache import BaseAdviceCache, MemoryLRUCache
+from ai_services.prompt_templates import PromptTemplates
+
+
+class AsyncDeepSeekAdvisor(DeepSeekAdvisor):
+    """
+    异步 DeepSeek AI 健康顾问
+
+    公共方法与 DeepSeekAdvisor 同名，均为协程。
+    """
+
+    def __init__(self, api_key: Optional[str] = None, use_cache: bool = True,
+                 cache_ttl: int = 3600, mock_mode: bool = False,
+                 cache: Optional[BaseAdviceCache] = None,
+                 base_url: Optional[str] = None, max_concurrency: int = 8,
+                 canonicalize: bool = True):
+        """
+        初始化异步 DeepSeek 顾问
+
+        Args:
+            api_key: DeepSeek API Key (从环境变量读取: DEEPSEEK_API_KEY)
+            use_cache: 是否使用缓存
+            cache_ttl: 缓存有效期 (秒)
+            mock_mode: 是否使用 Mock 模式（用于测试）
+            cache: 缓存后端
+            base_url: API 地址（默认读取 DEEPSEEK_API_BASE，可指向本地 stub 服务）
+            max_concurrency: 同时进行的上游请求数上限（也是连接池大小）
+            canonicalize: 渲染提示词前是否按临床档位规范化输入
+        """
+        self.base_url = base_url or os.getenv('DEEPSEEK_API_BASE', self.DEEPSEEK_API_BASE)
+        self.max_concurrency = max_concurrency
+
+        # 父类初始化时会创建同步客户端，这里替换为异步客户端
+        super().__init__(api_key=api_key, use_cache=use_cache, cache_ttl=cache_ttl,
+                         mock_mode=mock_mode, cache=cache, canonicalize=canonicalize)
+
+        if not self.mock_mode:
+            client_kwargs = {}
+            if httpx is not None:
+                # 连接池大小与并发上限一致
+                client_kwargs['http_client'] = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=max_concurrency,
+                        max_keepalive_connections=max_concurrency
+                    )
+                )
+            # 重试与退避由 _request_upstream 负责，关闭客户端内置重试，避免重复重试
+            self.client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                      max_retries=0, **client_kwargs)
+
+        self._semaphore = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.upstream_calls = 0
+        self.coalesced_calls = 0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _run_cache(self, method, *args):
+        """调用缓存方法：内存 LRU 直接执行，其他后端（SQLite 等）在线程池中执行"""
+        if self.cache is None or isinstance(self.cache, MemoryLRUCache):
+            return method(*args)
+        return await asyncio.to_thread(method, *args)
+
+    async def _call_api(self, prompt: str, max_retries: int = 3,
+                        timeout: int = 30) -> Dict:
+        """
+        调用 DeepSeek API（异步，带 single-flight 合并）
+
+        Args:
+            prompt: 提示词
+            max_retries: 最大重试次数
+            timeout: 超时时间（秒）
+
+        Returns:
+            API 响应字典（每个调用方拿到独立副本）
+        """
+        if self.mock_mode:
+            return self._mock_response(prompt)
+
+        # 检查缓存
+        cache_key = self._get_cache_key(prompt)
+        cached_result = await self._run_cache(self._get_from_cache, cache_key)
+
+        if cached_result is not None:
+            return cached_result
+
+        # 相同提示词已有请求在进行中，等待其结果（检查与登记之间没有 await，不会重复发起）
+        inflight = self._inflight.get(cache_key)
+        if inflight is not None:
+            self.coalesced_calls += 1
+            return copy.deepcopy(await asyncio.shield(inflight))
+
+        task = asyncio.ensure_future(self._request_upstream(prompt, cache_key, max_retries, timeout))
+        self._inflight[cache_key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(cache_key, None))
+
+        return copy.deepcopy(await asyncio.shield(task))
+
+    async def _request_upstream(self, prompt: str, cache_key: str,
+                                max_retries: int, timeout: int) -> Dict:
+        """在并发上限内调用上游 API，失败时非阻塞退避重试"""
+        for attempt in range(max_retries):
+            try:
+                async with self._get_semaphore():
+                    self.upstream_calls += 1
+                    response = await self.client.chat.completions.create(
+                        model=self.DEEPSEEK_MODEL,
+                        messages=[
+                            {"role": "system", "content": "你是一位专业的健康顾问。"},
+                            {"role": "user", "content": prompt}
+                        ],
+                        temperature=0.7,
+                        max_tokens=2000,
+                        timeout=timeout
+                    )
+
+                result = self._parse_content(response.choices[0].message.content)
+
+                # 保存到缓存
+                await self._run_cache(self._save_to_cache, cache_key, result)
+
+                return result
+
+            except openai.APITimeoutError:
+                print(f"API 超时 (尝试 {attempt + 1}/{max_retries})")
+                if attempt == max_retries - 1:
+                    return {
+                        'success': False,
+                        'error': 'API 超时',
+                        'fallback': self._mock_response(prompt)
+                    }
+                await asyncio.sleep(2 ** attempt)  # 指数退避
+
+            except openai.RateLimitError:
+                print(f"API 限流 (尝试 {attempt + 1}/{max_retries})")
+                if attempt == max_retries - 1:
+                    return {
+                        'success': False,
+                        'error': 'API 限流',
+                        'fallback': self._mock_response(prompt)
+                    }
+                await asyncio.sleep(5 ** attempt)
+
+            except Exception as e:
+                print(f"API 错误: {str(e)}")
+                return {
+                    'success': False,
+                    'error': str(e),
+                    'fallback': self._mock_response(prompt)
+                }
+
+        return {
+            'success': False,
+            'error': '超过最大重试次数',
+            'fallback': self._mock_response(prompt)
+        }
+
+    async def _advise(self, prompt: str) -> Dict:
+        result = await self._call_api(prompt)
+
+        # 如果 API 失败但有 fallback，使用 fallback
+        if not result.get('success') and 'fallback' in result:
+            result = result['fallback']
+
+        # 添加时间戳
+        result['generated_at'] = datetime.now().isoformat()
+
+        return result
+
+    async def get_health_advice(self, user_profile: Dict, recent_data: Dict,
+                                risk_assessment: Dict) -> Dict:
+        """获取健康建议（异步）"""
+        prompt = self.build_health_advice_prompt(user_profile, recent_data, risk_assessment)
+        return await self._advise(prompt)
+
+    async def get_simple_advice(self, metric: str, value: float, risk_level: str) -> Dict:
+        """获取简单的单指标建议（异步）"""
+        return await self._advise(self.build_simple_advice_prompt(metric, value, risk_level))
+
+    async def analyze_trend(self, metric: str, trend_data: list) -> Dict:
+        """分析指标趋势（异步）"""
+        return await self._advise(PromptTemplates.get_trend_analysis_prompt(metric, trend_data))
+
+    def get_cache_stats(self) -> Dict:
+        return {
+            **super().get_cache_stats(),
+            'upstream_calls': self.upstream_calls,
+            'coalesced_calls': self.coalesced_calls,
+            'inflight': len(self._inflight),
+        }
+
+    async def aclose(self):
+        """关闭异步 HTTP 连接池"""
+        if not self.mock_mode:
+            await self.client.close()
@@ -0,0 +1,192 @@
+"""
+批量 AI 健康建议
+
+医生需要为名下所有患者批量刷新建议（如夜间任务），逐个调用 get_health_advice 太慢。
+批量执行器：
+- 输入多组 (user_profile, recent_data, risk_assessment)，生成提示词后按缓存键去重，
+  相同提示词只请求一次，结果分发给所有对应条目
+- 有界并发执行，结果按完成顺序流式输出
+- 单个条目失败不影响其他条目，失败时使用 _mock_response 兜底
+- 每成功完成一个提示词追加写入 JSONL 检查点，进程崩溃后用同一检查点重跑会跳过已完成的条目；
+  失败（使用兜底建议）的提示词不写入检查点，重跑时重新请求
+
+使用方法（夜间任务，在 backend 目录下运行）:
+    python -m ai_services.batch_advisor patients.jsonl --output advice.jsonl \
+        --checkpoint cache/advice_batches/nightly.jsonl --concurrency 4
+输入文件每行一个 JSON: {"item_id": "...", "user_profile": {...}, "recent_data": {...}, "risk_assessment": {...}}
+
+作者: Health Management System Team
+日期: 2026-02-15
+"""
+
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+
+class BatchAdviceRunner:
+    """批量建议执行器"""
+
+    DEFAULT_RISK_ASSESSMENT = {'level': '未评估', 'key_factors': []}
+
+    def __init__(self, advisor, max_concurrency: int = 4, checkpoint_path: Optional[str] = None):
+        """
+        Args:
+            advisor: AsyncDeepSeekAdvisor 实例
+            max_concurrency: 同时处理的提示词数
+            checkpoint_path: JSONL 检查点路径（为空则不记录进度）
+        """
+        self.advisor = advisor
+        self.max_concurrency = max_concurrency
+        self.checkpoint_path = checkpoint_path
+
+    # ------------------------------------------------------------------
+    # 检查点
+    # ------------------------------------------------------------------
+    def _load_checkpoint(self) -> Dict[str, Dict]:
+        """读取已成功完成的提示词结果: cache_key -> result（带 error 的兜底结果不算完成）"""
+        done = {}
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return done
+
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # 崩溃时写了一半的行
+                if 'error' in record['result']:
+                    continue  # 旧版本写入的失败结果，重新请求
+                done[record['key']] = record['result']
+        return done
+
+    def _append_checkpoint(self, handle, key: str, result: Dict):
+        if handle is None or 'error' in result:
+            return  # 失败的结果不记录，续传时重新请求
+        handle.write(json.dumps({'key': key, 'result': result}, ensure_ascii=False) + '\n')
+        handle.flush()
+        os.fsync(handle.fileno())
+
+    # ------------------------------------------------------------------
+    # 执行
+    # ------------------------------------------------------------------
+    def _group_items(self, items: Iterable[Dict]) -> Dict[str, Dict]:
+        """生成提示词并按缓存键去重: cache_key -> {'prompt', 'item_ids'}"""
+        groups: Dict[str, Dict] = {}
+        for index, item in enumerate(items):
+            item_id = str(item.get('item_id', index))
+            prompt = self.advisor.build_health_advice_prompt(
+                item.get('user_profile') or {},
+                item.get('recent_data') or {},
+                item.get('risk_assessment') or self.DEFAULT_RISK_ASSESSMENT
+            )
+            key = self.advisor._get_cache_key(prompt)
+            group = groups.setdefault(key, {'prompt': prompt, 'item_ids': []})
+            group['item_ids'].append(item_id)
+        return groups
+
+    async def _advise_one(self, semaphore: asyncio.Semaphore, key: str, prompt: str) -> tuple:
+        async with semaphore:
+            try:
+                result = await self.advisor._call_api(prompt)
+                if not result.get('success') and 'fallback' in result:
+                    result = {**result['fallback'], 'error': result.get('error')}
+            except Exception as e:
+                result = {**self.advisor._mock_response(prompt), 'error': str(e)}
+        result['generated_at'] = datetime.now().isoformat()
+        return key, result
+
+    async def run(self, items: Iterable[Dict]) -> AsyncIterator[Dict]:
+        """
+        执行批量建议，按完成顺序逐条产出结果
+
+        Yields:
+            {'item_id', 'success', 'deduplicated', 'resumed', 'advice'}
+        """
+        groups = self._group_items(items)
+        done = self._load_checkpoint()
+
+        # 检查点中已完成的直接输出
+        for key in [key for key in groups if key in done]:
+            group = groups.pop(key)
+            for position, item_id in enumerate(group['item_ids']):
+                yield self._make_record(item_id, done[key], position > 0, resumed=True)
+
+        if not groups:
+            return
+
+        handle = None
+        if self.checkpoint_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.checkpoint_path)), exist_ok=True)
+            handle = open(self.checkpoint_path, 'a', encoding='utf-8')
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = [
+            asyncio.ensure_future(self._advise_one(semaphore, key, group['prompt']))
+            for key, group in groups.items()
+        ]
+
+        try:
+            for finished in asyncio.as_completed(tasks):
+                key, result = await finished
+                self._append_checkpoint(handle, key, result)
+                for position, item_id in enumerate(groups[key]['item_ids']):
+                    yield self._make_record(item_id, result, position > 0, resumed=False)
+        finally:
+            for task in tasks:
+                task.cancel()
+            if handle is not None:
+                handle.close()
+
+    @staticmethod
+    def _make_record(item_id: str, result: Dict, deduplicated: bool, resumed: bool) -> Dict:
+        return {
+            'item_id': item_id,
+            'success': 'error' not in result,
+            'deduplicated': deduplicated,
+            'resumed': resumed,
+            'advice': result,
+        }
+
+    async def run_all(self, items: Iterable[Dict]) -> List[Dict]:
+        """执行批量建议并返回全部结果"""
+        return [record async for record in self.run(items)]
+
+
+async def _main(args):
+    from ai_services.async_advisor import AsyncDeepSeekAdvisor
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        items = [json.loads(line) for line in f if line.strip()]
+
+    advisor = AsyncDeepSeekAdvisor(mock_mode=args.mock, max_concurrency=args.concurrency)
+    runner = BatchAdviceRunner(advisor, max_concurrency=args.concurrency, checkpoint_path=args.checkpoint)
+
+    completed = 0
+    out = open(args.output, 'a', encoding='utf-8') if args.output else sys.stdout
+    try:
+        async for record in runner.run(items):
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            completed += 1
+            if args.output:
+                print(f"\r进度: {completed}/{len(items)}", end='', file=sys.stderr)
+    finally:
+        if args.output:
+            out.close()
+            print(file=sys.stderr)
+        await advisor.aclose()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='批量生成 AI 健康建议')
+    parser.add_argument('input', help='输入 JSONL 文件')
+    parser.add_argument('--output', help='输出 JSONL 文件（默认标准输出）')
+    parser.add_argument('--checkpoint', help='检查点 JSONL 文件，崩溃后重跑可续传')
+    parser.add_argument('--concurrency', type=int, default=4, help='并发数')
+    parser.add_argument('--mock', action='store_true', help='使用 Mock 模式')
+    asyncio.run(_main(parser.parse_args()))
@@ -2,7 +2,7 @@
 DeepSeek AI 顾问
 
 集成 DeepSeek API 提供智能健康建议
-支持缓存、错误处理和Mock模式
+支持缓存（有界 LRU + TTL，可选 SQLite 持久化）、错误处理和Mock模式
 
 作者: Health Management System Team
 日期: 2026-02-15
@@ -24,6 +24,8 @@ except ImportError:
     print("警告: openai 库未安装，DeepSeek API 不可用")
 
 from ai_services.prompt_templates import PromptTemplates
+from ai_services.advice_cache import BaseAdviceCache, build_advice_cache
+from ai_services.prompt_canonicalizer import PromptCanonicalizer
 
 
 class DeepSeekAdvisor:
@@ -38,7 +40,8 @@ class DeepSeekAdvisor:
     DEEPSEEK_MODEL = "deepseek-chat"
     
     def __init__(self, api_key: Optional[str] = None, use_cache: bool = True, 
-                 cache_ttl: int = 3600, mock_mode: bool = False):
+                 cache_ttl: int = 3600, mock_mode: bool = False,
+                 cache: Optional[BaseAdviceCache] = None, canonicalize: bool = True):
         """
         初始化 DeepSeek 顾问
         
@@ -47,11 +50,14 @@ class DeepSeekAdvisor:
             use_cache: 是否使用缓存
             cache_ttl: 缓存有效期 (秒)
             mock_mode: 是否使用 Mock 模式（用于测试）
+            cache: 缓存后端（默认按环境变量 ADVICE_CACHE_BACKEND 创建，见 advice_cache）
+            canonicalize: 渲染提示词前是否按临床档位规范化输入（提高缓存命中率）
         """
         self.mock_mode = mock_mode
         self.use_cache = use_cache
         self.cache_ttl = cache_ttl
-        self.cache = {}  # 简单的内存缓存
+        self.cache = (cache or build_advice_cache(cache_ttl)) if use_cache else None
+        self.canonicalizer = PromptCanonicalizer() if canonicalize else None
         
         if not mock_mode:
             # 从环境变量或参数获取 API Key
@@ -78,9 +84,49 @@ class DeepSeekAdvisor:
             prompt: 提示词
             
         Returns:
-            缓存键 (MD5 hash)
+            缓存键 (SHA-256 hash)
         """
-        return hashlib.md5(prompt.encode()).hexdigest()
+        return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+    
+    def build_health_advice_prompt(self, user_profile: Dict, recent_data: Dict,
+                                   risk_assessment: Dict) -> str:
+        """
+        生成健康建议提示词（启用规范化时先把输入归入临床档位）
+        
+        临床上等价的输入生成完全相同的提示词，从而命中同一缓存。
+        
+        Args:
+            user_profile: 用户个人信息
+            recent_data: 最近健康数据
+            risk_assessment: 风险评估结果
+            
+        Returns:
+            提示词字符串
+        """
+        if self.canonicalizer is not None:
+            canonical = self.canonicalizer.canonicalize(user_profile, recent_data, risk_assessment)
+            user_profile = canonical['user_profile']
+            recent_data = canonical['recent_data']
+            risk_assessment = canonical['risk_assessment']
+        
+        return PromptTemplates.get_health_advice_prompt(user_profile, recent_data, risk_assessment)
+    
+    def build_simple_advice_prompt(self, metric: str, value: float, risk_level: str) -> str:
+        """
+        生成单指标建议提示词（启用规范化时指标值取所在档位的代表值）
+        
+        Args:
+            metric: 指标名称
+            value: 指标值
+            risk_level: 风险等级
+            
+        Returns:
+            提示词字符串
+        """
+        if self.canonicalizer is not None:
+            value = self.canonicalizer.canonicalize_value(metric, value)
+        
+        return PromptTemplates.get_simple_advice_prompt(metric, value, risk_level)
     
     def _get_from_cache(self, cache_key: str) -> Optional[Dict]:
         """
@@ -95,17 +141,7 @@ class DeepSeekAdvisor:
         if not self.use_cache:
             return None
         
-        if cache_key in self.cache:
-            cached_item = self.cache[cache_key]
-            
-            # 检查是否过期
-            if time.time() - cached_item['timestamp'] < self.cache_ttl:
-                return cached_item['data']
-            else:
-                # 过期，删除
-                del self.cache[cache_key]
-        
-        return None
+        return self.cache.get(cache_key)
     
     def _save_to_cache(self, cache_key: str, data: Dict):
         """
@@ -116,10 +152,44 @@ class DeepSeekAdvisor:
             data: 数据
         """
         if self.use_cache:
-            self.cache[cache_key] = {
-                'data': data,
-                'timestamp': time.time()
+            self.cache.set(cache_key, data)
+    
+    def get_cache_stats(self) -> Dict:
+        """
+        获取缓存统计（命中率、容量等）
+        
+        Returns:
+            统计字典
+        """
+        if not self.use_cache:
+            return {'enabled': False}
+        return {'enabled': True, **self.cache.get_stats()}
+    
+    @staticmethod
+    def _parse_content(content: str) -> Dict:
+        """
+        解析 API 返回的文本内容
+        
+        Args:
+            content: 模型输出
+            
+        Returns:
+            结果字典
+        """
+        # 尝试解析为 JSON
+        try:
+            result = json.loads(content)
+        except json.JSONDecodeError:
+            # 如果不是 JSON，包装成字典
+            result = {
+                'raw_response': content,
+                'success': True
             }
+        
+        result['success'] = True
+        result['source'] = 'api'
+        
+        return result
     
     def _call_api(self, prompt: str, max_retries: int = 3, 
                   timeout: int = 30) -> Dict:
@@ -160,20 +230,7 @@ class DeepSeekAdvisor:
                 )
                 
                 # 解析响应
-                content = response.choices[0].message.content
-                
-                # 尝试解析为 JSON
-                try:
-                    result = json.loads(content)
-                except json.JSONDecodeError:
-                    # 如果不是 JSON，包装成字典
-                    result = {
-                        'raw_response': content,
-                        'success': True
-                    }
-                
-                result['success'] = True
-                result['source'] = 'api'
+                result = self._parse_content(response.choices[0].message.content)
                 
                 # 保存到缓存
                 self._save_to_cache(cache_key, result)
@@ -269,9 +326,7 @@ class DeepSeekAdvisor:
             健康建议字典
         """
         # 生成提示词
-        prompt = PromptTemplates.get_health_advice_prompt(
-            user_profile, recent_data, risk_assessment
-        )
+        prompt = self.build_health_advice_prompt(user_profile, recent_data, risk_assessment)
         
         # 调用 API
         result = self._call_api(prompt)
@@ -297,7 +352,7 @@ class DeepSeekAdvisor:
         Returns:
             建议字典
         """
-        prompt = PromptTemplates.get_simple_advice_prompt(metric, value, risk_level)
+        prompt = self.build_simple_advice_prompt(metric, value, risk_level)
         result = self._call_api(prompt)
         
         if not result.get('success') and 'fallback' in result:
@@ -0,0 +1,155 @@
+"""
+提示词输入规范化
+
+健康建议提示词由用户信息、近期数据均值和风险评估渲染而成，收缩压 120.0 与 120.3、
+既往病史顺序不同等细微差异都会生成不同的提示词，导致缓存未命中，而这些情况在临床上是等价的。
+规范化层在渲染提示词之前：
+- 把数值按临床意义分档：档位边界与临床阈值对齐（如收缩压 120/130/140/160/180），
+  阈值区间内再按可配置的档宽细分，一个档位不会跨越临床阈值
+- 每个指标取均值后替换为所在档位的代表值
+- 病史、风险因素去重排序
+规范化后的输入生成的提示词完全相同，缓存键随之相同。
+
+档宽可通过参数或环境变量 ADVICE_CANONICAL_BANDS（JSON，如 {"systolic": 10}）配置，
+设置为 0 表示该字段不分档。
+
+作者: Health Management System Team
+日期: 2026-02-15
+"""
+
+import json
+import math
+import os
+from typing import Dict, List, Optional
+
+
+# 临床阈值（档位边界）
+CLINICAL_THRESHOLDS = {
+    'age': [18, 40, 60, 75],
+    'height_cm': [],
+    'weight_kg': [],
+    'systolic': [90, 120, 130, 140, 160, 180],
+    'diastolic': [60, 80, 90, 100, 110],
+    'heart_rate': [50, 60, 100, 120],
+    'blood_glucose': [3.9, 6.1, 7.0, 11.1],
+}
+
+# 默认档宽
+DEFAULT_BAND_WIDTHS = {
+    'age': 5,
+    'height_cm': 5,
+    'weight_kg': 2,
+    'systolic': 5,
+    'diastolic': 5,
+    'heart_rate': 5,
+    'blood_glucose': 0.3,
+}
+
+# 代表值保留的小数位
+DISPLAY_DECIMALS = {
+    'age': 0,
+    'height_cm': 0,
+    'weight_kg': 1,
+    'systolic': 0,
+    'diastolic': 0,
+    'heart_rate': 0,
+    'blood_glucose': 1,
+}
+
+
+class PromptCanonicalizer:
+    """提示词输入规范化"""
+
+    def __init__(self, band_widths: Optional[Dict[str, float]] = None):
+        self.band_widths = dict(DEFAULT_BAND_WIDTHS)
+
+        env_bands = os.getenv('ADVICE_CANONICAL_BANDS')
+        if env_bands:
+            self.band_widths.update(json.loads(env_bands))
+        if band_widths:
+            self.band_widths.update(band_widths)
+
+    def band(self, field: str, value) -> Optional[float]:
+        """
+        取数值所在档位的代表值
+
+        档位先按档宽从 0 开始等分，再截断到所在的临床阈值区间内，
+        代表值为截断后档位的中点。
+        """
+        if value is None:
+            return None
+        value = float(value)
+        if math.isnan(value):
+            return None
+
+        decimals = DISPLAY_DECIMALS.get(field, 2)
+        width = self.band_widths.get(field) or 0
+        if width <= 0:
+            return round(value, decimals)
+
+        thresholds = CLINICAL_THRESHOLDS.get(field, [])
+        segment_low = max([t for t in thresholds if t <= value], default=-math.inf)
+        segment_high = min([t for t in thresholds if t > value], default=math.inf)
+
+        # round 消除浮点误差（如 6.3 / 0.3）
+        bucket_low = math.floor(round(value / width, 9)) * width
+        low = max(bucket_low, segment_low)
+        high = min(bucket_low + width, segment_high)
+
+        return round((low + high) / 2, decimals)
+
+    @staticmethod
+    def _normalize_terms(terms) -> List[str]:
+        """去重、去空白并排序"""
+        normalized = set()
+        for term in terms or []:
+            if isinstance(term, dict):
+                term = term.get('factor', '')
+            term = str(term).strip()
+            if term:
+                normalized.add(term)
+        return sorted(normalized)
+
+    def canonicalize(self, user_profile: Dict, recent_data: Dict, risk_assessment: Dict) -> Dict:
+        """
+        规范化健康建议的输入
+
+        Returns:
+            {'user_profile', 'recent_data', 'risk_assessment'}，可直接传给
+            PromptTemplates.get_health_advice_prompt；recent_data 每个指标只保留一个档位代表值
+        """
+        profile = {
+            'age': self.band('age', user_profile.get('age')),
+            'gender': user_profile.get('gender'),
+            'height_cm': self.band('height_cm', user_profile.get('height_cm')),
+            'weight_kg': self.band('weight_kg', user_profile.get('weight_kg')),
+            'conditions': self._normalize_terms(user_profile.get('conditions')),
+        }
+        for field in ('age', 'height_cm', 'weight_kg'):
+            if profile[field] is None:
+                del profile[field]  # 模板对缺失字段显示“未知”
+            elif DISPLAY_DECIMALS[field] == 0:
+                profile[field] = int(profile[field])
+
+        data = {}
+        for metric in sorted(recent_data or {}):
+            values = [float(v) for v in recent_data[metric] or [] if v is not None]
+            if not values:
+                continue
+            banded = self.band(metric, sum(values) / len(values))
+            if banded is not None:
+                data[metric] = [banded]
+
+        risk = {
+            'level': (risk_assessment or {}).get('level', '未知'),
+            'key_factors': self._normalize_terms((risk_assessment or {}).get('key_factors')),
+        }
+
+        return {'user_profile': profile, 'recent_data': data, 'risk_assessment': risk}
+
+    def canonicalize_value(self, metric: str, value: float):
+        """规范化单个指标值（简单建议）"""
+        banded = self.band(metric, value)
+        if banded is not None and DISPLAY_DECIMALS.get(metric) == 0:
+            return int(banded)
+        return banded
@@ -0,0 +1,199 @@
+"""
+本地 DeepSeek（OpenAI 兼容）stub 服务
+
+用于在不调用真实（计费的）API 的情况下测试异步顾问：
+- 实现 POST /chat/completions，返回与 DeepSeek 相同结构的响应
+- 可配置响应延迟，以及前 N 个请求返回 429 以验证退避重试
+- 统计收到的请求数和同时处理中的最大请求数，用于验证 single-flight 合并和并发上限
+
+使用方法:
+    # 单独启动 stub，然后设置 DEEPSEEK_API_BASE=http://127.0.0.1:8765
+    python ai_services/stub_server.py --port 8765 --latency 0.5
+
+    # 演示：并发相同/不同提示词，检查上游调用次数和事件循环是否被阻塞
+    python ai_services/stub_server.py --demo
+
+    # 自动化测试（single-flight、并发上限、退避重试）
+    python -m pytest ai_services/tests
+
+作者: Health Management System Team
+日期: 2026-02-15
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+STUB_ADVICE = {
+    'analysis': '（stub）根据您最近的健康数据，整体状况良好。',
+    'recommendations': ['保持规律作息', '适度运动', '均衡饮食'],
+    'lifestyle_plan': {
+        'diet': '低盐低脂饮食',
+        'exercise': '每周3-5次有氧运动',
+        'sleep': '每天7-8小时睡眠'
+    },
+    'medical_advice': '建议定期体检。'
+}
+
+
+class StubState:
+    """stub 服务状态（请求计数、并发统计、限流配置）"""
+
+    def __init__(self, latency: float = 0.2, rate_limit_first: int = 0):
+        self.latency = latency
+        self.rate_limit_first = rate_limit_first
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+
+def _make_handler(state: StubState):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def log_message(self, format, *args):
+            pass  # 不打印访问日志
+
+        def _send_json(self, status: int, payload: dict):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self._send_json(404, {'error': {'message': 'not found'}})
+                return
+
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+
+            with state.lock:
+                state.requests += 1
+                count = state.requests
+
+            if count <= state.rate_limit_first:
+                self._send_json(429, {'error': {'message': 'rate limited', 'type': 'rate_limit'}})
+                return
+
+            with state.lock:
+                state.active += 1
+                state.max_active = max(state.max_active, state.active)
+            try:
+                time.sleep(state.latency)
+            finally:
+                with state.lock:
+                    state.active -= 1
+
+            self._send_json(200, {
+                'id': f'stub-{count}',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': request.get('model', 'deepseek-chat'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': json.dumps(STUB_ADVICE, ensure_ascii=False)},
+                    'finish_reason': 'stop'
+                }],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+            })
+
+    return Handler
+
+
+def start_stub_server(host: str = '127.0.0.1', port: int = 0, latency: float = 0.2,
+                      rate_limit_first: int = 0) -> Tuple[ThreadingHTTPServer, StubState]:
+    """
+    在后台线程中启动 stub 服务
+
+    Returns:
+        (server, state)，服务地址为 http://{host}:{server.server_port}
+    """
+    state = StubState(latency=latency, rate_limit_first=rate_limit_first)
+    server = ThreadingHTTPServer((host, port), _make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+async def _demo(latency: float):
+    """并发调用异步顾问，验证 single-flight 和事件循环不被阻塞"""
+    import asyncio
+    from ai_services.async_advisor import AsyncDeepSeekAdvisor
+    from ai_services.advice_cache import MemoryLRUCache
+
+    server, state = start_stub_server(latency=latency)
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    advisor = AsyncDeepSeekAdvisor(
+        api_key='stub-key', base_url=base_url, max_concurrency=4,
+        cache=MemoryLRUCache(ttl=60)
+    )
+
+    # 事件循环心跳：被阻塞时间隔会明显变大
+    gaps = []
+
+    async def heartbeat(stop):
+        last = time.perf_counter()
+        while not stop.is_set():
+            await asyncio.sleep(0.01)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(stop))
+
+    start = time.perf_counter()
+    identical = [advisor.get_simple_advice('systolic', 150, '高风险') for _ in range(20)]
+    distinct = [advisor.get_simple_advice('heart_rate', 60 + i, '低风险') for i in range(8)]
+    # 规范化后不同心率可能落入同一档位，期望的上游调用次数按实际提示词计算
+    expected = len({advisor.build_simple_advice_prompt('systolic', 150, '高风险')} | {
+        advisor.build_simple_advice_prompt('heart_rate', 60 + i, '低风险') for i in range(8)
+    })
+    results = await asyncio.gather(*identical, *distinct)
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await beat
+    await advisor.aclose()
+    server.shutdown()
+
+    print(f"请求数: {len(results)}（20 个相同 + 8 个不同提示词）")
+    print(f"上游调用次数: {state.requests}（期望 {expected}）")
+    print(f"最大并发请求数: {state.max_active}")
+    print(f"合并的调用: {advisor.coalesced_calls}")
+    print(f"总耗时: {elapsed:.2f}s（stub 延迟 {latency}s，并发上限 4）")
+    print(f"事件循环最大心跳间隔: {max(gaps) * 1000:.1f}ms")
+    print(f"全部成功: {all(r.get('source') == 'api' for r in results)}")
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    parser = argparse.ArgumentParser(description='DeepSeek API 本地 stub 服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.2, help='响应延迟（秒）')
+    parser.add_argument('--rate-limit-first', type=int, default=0, help='前 N 个请求返回 429')
+    parser.add_argument('--demo', action='store_true', help='运行异步顾问演示')
+    args = parser.parse_args()
+
+    if args.demo:
+        import asyncio
+        asyncio.run(_demo(args.latency))
+    else:
+        server, _ = start_stub_server(args.host, args.port, args.latency, args.rate_limit_first)
+        print(f"Stub 服务已启动: http://{args.host}:{server.server_port}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
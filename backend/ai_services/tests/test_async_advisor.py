@@ -0,0 +1,150 @@
+"""
+异步 DeepSeek 顾问测试（基于本地 stub 服务，不调用真实 API）
+
+覆盖 single-flight 合并、并发上限以及限流时的退避重试。
+"""
+
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip('openai')
+
+from ai_services.advice_cache import MemoryLRUCache
+from ai_services.async_advisor import AsyncDeepSeekAdvisor
+from ai_services.stub_server import start_stub_server
+
+
+@pytest.fixture
+def stub():
+    """启动 stub 服务，返回工厂函数 (latency, rate_limit_first) -> (base_url, state)"""
+    servers = []
+
+    def start(latency=0.1, rate_limit_first=0):
+        server, state = start_stub_server(latency=latency, rate_limit_first=rate_limit_first)
+        servers.append(server)
+        return f'http://127.0.0.1:{server.server_port}', state
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _advisor(base_url, **kwargs):
+    return AsyncDeepSeekAdvisor(api_key='stub-key', base_url=base_url,
+                                cache=MemoryLRUCache(ttl=60), **kwargs)
+
+
+def test_identical_prompts_share_one_upstream_call(stub):
+    base_url, state = stub(latency=0.2)
+
+    async def run():
+        advisor = _advisor(base_url, max_concurrency=4)
+        try:
+            results = await asyncio.gather(*[
+                advisor.get_simple_advice('systolic', 150, '高风险') for _ in range(20)
+            ])
+        finally:
+            await advisor.aclose()
+        return advisor, results
+
+    advisor, results = asyncio.run(run())
+
+    assert state.requests == 1
+    assert advisor.upstream_calls == 1
+    assert advisor.coalesced_calls == 19
+    assert all(result.get('source') == 'api' for result in results)
+    # 每个调用方拿到独立副本
+    results[0]['recommendations'].append('modified')
+    assert 'modified' not in results[1]['recommendations']
+
+
+def test_upstream_concurrency_is_bounded(stub):
+    base_url, state = stub(latency=0.2)
+    max_concurrency = 3
+
+    async def run():
+        # 不规范化，保证每个提示词都不同
+        advisor = _advisor(base_url, max_concurrency=max_concurrency, canonicalize=False)
+        try:
+            start = time.perf_counter()
+            results = await asyncio.gather(*[
+                advisor.get_simple_advice('heart_rate', 60 + i, '低风险') for i in range(9)
+            ])
+            return results, time.perf_counter() - start
+        finally:
+            await advisor.aclose()
+
+    results, elapsed = asyncio.run(run())
+
+    assert state.requests == 9
+    assert state.max_active == max_concurrency
+    # 9 个请求、并发 3，至少需要 3 轮
+    assert elapsed >= 3 * 0.2
+    assert all(result.get('source') == 'api' for result in results)
+
+
+def test_rate_limited_request_is_retried_after_backoff(stub):
+    base_url, state = stub(latency=0.05, rate_limit_first=1)
+
+    async def run():
+        advisor = _advisor(base_url)
+        try:
+            prompt = advisor.build_simple_advice_prompt('systolic', 150, '高风险')
+            start = time.perf_counter()
+            result = await advisor._call_api(prompt)
+            return result, time.perf_counter() - start
+        finally:
+            await advisor.aclose()
+
+    result, elapsed = asyncio.run(run())
+
+    assert state.requests == 2
+    assert result.get('source') == 'api'
+    # 第一次重试前退避 5 ** 0 = 1 秒
+    assert elapsed >= 1.0
+
+
+def test_exhausted_retries_fall_back_without_caching(stub):
+    base_url, state = stub(latency=0.05, rate_limit_first=10)
+
+    async def run():
+        advisor = _advisor(base_url)
+        try:
+            prompt = advisor.build_simple_advice_prompt('systolic', 150, '高风险')
+            result = await advisor._call_api(prompt, max_retries=2)
+            return advisor, prompt, result
+        finally:
+            await advisor.aclose()
+
+    advisor, prompt, result = asyncio.run(run())
+
+    assert state.requests == 2
+    assert result['success'] is False
+    assert result['error'] == 'API 限流'
+    assert 'fallback' in result
+    assert advisor._get_from_cache(advisor._get_cache_key(prompt)) is None
+
+
+def test_sqlite_cache_is_used_off_the_event_loop(stub, tmp_path):
+    from ai_services.advice_cache import SQLiteAdviceCache
+
+    base_url, state = stub(latency=0.05)
+    cache = SQLiteAdviceCache(str(tmp_path / 'advice.sqlite3'), ttl=60)
+
+    async def run():
+        advisor = AsyncDeepSeekAdvisor(api_key='stub-key', base_url=base_url, cache=cache)
+        try:
+            first = await advisor.get_simple_advice('systolic', 150, '高风险')
+            second = await advisor.get_simple_advice('systolic', 150, '高风险')
+        finally:
+            await advisor.aclose()
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert state.requests == 1
+    assert first['analysis'] == second['analysis']
+    assert cache.get_stats()['hits'] == 1
@@ -0,0 +1,65 @@
+"""
+批量建议执行器测试（Mock 模式，不调用上游）
+
+覆盖按提示词去重，以及检查点只记录成功结果、续传时重试失败条目。
+"""
+
+import asyncio
+
+from ai_services.async_advisor import AsyncDeepSeekAdvisor
+from ai_services.batch_advisor import BatchAdviceRunner
+
+
+class FlakyAdvisor(AsyncDeepSeekAdvisor):
+    """Mock 模式顾问：failing 中的提示词返回与上游失败相同结构的结果"""
+
+    def __init__(self, failing=()):
+        super().__init__(mock_mode=True, use_cache=False)
+        self.failing = set(failing)
+        self.prompts = []
+
+    async def _call_api(self, prompt, max_retries=3, timeout=30):
+        self.prompts.append(prompt)
+        if prompt in self.failing:
+            return {'success': False, 'error': 'API 限流', 'fallback': self._mock_response(prompt)}
+        return self._mock_response(prompt)
+
+
+def _items():
+    return [
+        {'item_id': 'a', 'user_profile': {'age': 30}, 'recent_data': {'systolic': [118, 122]}},
+        {'item_id': 'b', 'user_profile': {'age': 30}, 'recent_data': {'systolic': [118, 122]}},
+        {'item_id': 'c', 'user_profile': {'age': 65}, 'recent_data': {'systolic': [158, 162]}},
+    ]
+
+
+def _run(runner):
+    return asyncio.run(runner.run_all(_items()))
+
+
+def test_identical_items_are_requested_once():
+    advisor = FlakyAdvisor()
+    records = _run(BatchAdviceRunner(advisor))
+
+    assert len(advisor.prompts) == 2
+    assert sorted(record['item_id'] for record in records) == ['a', 'b', 'c']
+    assert sum(record['deduplicated'] for record in records) == 1
+    assert all(record['success'] for record in records)
+
+
+def test_failed_items_are_retried_on_resume(tmp_path):
+    checkpoint = str(tmp_path / 'batch.jsonl')
+    failing_prompt = FlakyAdvisor().build_health_advice_prompt(
+        {'age': 65}, {'systolic': [158, 162]}, BatchAdviceRunner.DEFAULT_RISK_ASSESSMENT
+    )
+
+    first = _run(BatchAdviceRunner(FlakyAdvisor(failing={failing_prompt}), checkpoint_path=checkpoint))
+    assert {record['item_id']: record['success'] for record in first} == {'a': True, 'b': True, 'c': False}
+
+    advisor = FlakyAdvisor()
+    resumed = {record['item_id']: record for record in _run(BatchAdviceRunner(advisor, checkpoint_path=checkpoint))}
+
+    # 成功的条目从检查点恢复，失败的条目重新请求
+    assert advisor.prompts == [failing_prompt]
+    assert resumed['a']['resumed'] and resumed['b']['resumed']
+    assert not resumed['c']['resumed'] and resumed['c']['success']
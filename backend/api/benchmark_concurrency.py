@@ -0,0 +1,137 @@
+"""
+并发基准测试
+
+验证 AI 微服务在处理耗时请求（预测/风险评估）时不会阻塞其他请求：
+- 同时发起 N 个耗时请求
+- 期间持续探测 /api/v2/health 的响应延迟
+- 如果事件循环被阻塞，探测延迟会接近耗时请求的处理时间；
+  ORM 和推理放入线程池后，探测延迟应保持在毫秒级
+
+使用方法（先启动服务: uvicorn api.main:app --port 8001）:
+    python api/benchmark_concurrency.py
+    python api/benchmark_concurrency.py --concurrency 16 --endpoint /api/v2/risk-assessment \
+        --payload '{"user_id": 1, "time_window": 30}'
+
+作者: Health Management System Team
+日期: 2026-02-15
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _request(url: str, payload: dict = None, timeout: float = 120.0):
+    """发送一次 HTTP 请求，返回 (状态码, 耗时秒)"""
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(
+        url, data=data, method='POST' if data else 'GET',
+        headers={'Content-Type': 'application/json'}
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = 0
+    return status, time.perf_counter() - start
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(int(round(pct / 100 * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def run_benchmark(base_url: str, endpoint: str, payload: dict,
+                  concurrency: int, probe_interval: float) -> dict:
+    """
+    执行基准测试
+
+    Returns:
+        包含耗时请求和探测请求延迟统计的字典
+    """
+    heavy_url = base_url.rstrip('/') + endpoint
+    probe_url = base_url.rstrip('/') + '/api/v2/health'
+
+    probe_latencies = []
+    stop = threading.Event()
+
+    def probe():
+        while not stop.is_set():
+            status, elapsed = _request(probe_url, timeout=30)
+            if status == 200:
+                probe_latencies.append(elapsed)
+            time.sleep(probe_interval)
+
+    probe_thread = threading.Thread(target=probe, daemon=True)
+    probe_thread.start()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: _request(heavy_url, payload), range(concurrency)))
+    wall_time = time.perf_counter() - start
+
+    stop.set()
+    probe_thread.join()
+
+    heavy_latencies = [elapsed for _, elapsed in results]
+    status_counts = {}
+    for status, _ in results:
+        status_counts[status] = status_counts.get(status, 0) + 1
+
+    return {
+        'endpoint': endpoint,
+        'concurrency': concurrency,
+        'wall_time_s': round(wall_time, 3),
+        'heavy_status_counts': status_counts,
+        'heavy_latency_s': {
+            'mean': round(statistics.mean(heavy_latencies), 3),
+            'p95': round(_percentile(heavy_latencies, 95), 3),
+            'max': round(max(heavy_latencies), 3),
+        },
+        'health_probe_latency_ms': {
+            'count': len(probe_latencies),
+            'p50': round(_percentile(probe_latencies, 50) * 1000, 1),
+            'p95': round(_percentile(probe_latencies, 95) * 1000, 1),
+            'max': round(max(probe_latencies, default=0) * 1000, 1),
+        },
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='AI 微服务并发基准测试')
+    parser.add_argument('--url', default='http://localhost:8001', help='服务地址')
+    parser.add_argument('--endpoint', default='/api/v2/predict', help='耗时请求的端点')
+    parser.add_argument('--payload', default='{"user_id": 1, "metric": "blood_glucose", "days": 7}',
+                        help='耗时请求的 JSON 请求体')
+    parser.add_argument('--concurrency', type=int, default=8, help='并发耗时请求数')
+    parser.add_argument('--probe-interval', type=float, default=0.05, help='健康检查探测间隔（秒）')
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        args.url, args.endpoint, json.loads(args.payload),
+        args.concurrency, args.probe_interval
+    )
+
+    print("并发基准测试结果")
+    print("=" * 60)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    print("=" * 60)
+
+    probe_p95 = report['health_probe_latency_ms']['p95']
+    heavy_mean = report['heavy_latency_s']['mean'] * 1000
+    if heavy_mean and probe_p95 > heavy_mean * 0.5:
+        print("警告: 健康检查延迟接近耗时请求的处理时间，事件循环可能被阻塞")
+    else:
+        print("健康检查延迟未受耗时请求影响，事件循环未被阻塞")
@@ -0,0 +1,61 @@
+"""
+后台执行器
+
+FastAPI 路由均为 async def，Django ORM 查询和 PyTorch 推理/训练都是阻塞调用，
+直接在协程里执行会卡住 uvicorn 的事件循环。这里提供两个有界线程池：
+- DB 执行器: Django ORM 查询（线程数与数据库连接数对应）
+- CPU 执行器: 模型推理和训练（PyTorch 算子执行时会释放 GIL）
+
+作者: Health Management System Team
+日期: 2026-02-15
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+T = TypeVar('T')
+
+DB_MAX_WORKERS = int(os.getenv('API_DB_MAX_WORKERS', '8'))
+CPU_MAX_WORKERS = int(os.getenv('API_CPU_MAX_WORKERS', str(max(os.cpu_count() or 1, 2))))
+
+db_executor = ThreadPoolExecutor(max_workers=DB_MAX_WORKERS, thread_name_prefix='api-db')
+cpu_executor = ThreadPoolExecutor(max_workers=CPU_MAX_WORKERS, thread_name_prefix='api-cpu')
+
+
+def _with_db_connection(func: Callable[..., T]) -> Callable[..., T]:
+    """在线程池中执行 ORM 调用前后清理过期/失效的数据库连接"""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        from django.db import close_old_connections
+
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return wrapper
+
+
+async def run_db(func: Callable[..., T], *args, **kwargs) -> T:
+    """在 DB 线程池中执行 Django ORM 相关的同步函数"""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(_with_db_connection(func), *args, **kwargs)
+    return await loop.run_in_executor(db_executor, call)
+
+
+async def run_cpu(func: Callable[..., T], *args, **kwargs) -> T:
+    """在 CPU 线程池中执行模型推理/训练等计算密集型函数"""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(func, *args, **kwargs)
+    return await loop.run_in_executor(cpu_executor, call)
+
+
+def shutdown_executors(wait: bool = True):
+    """关闭线程池（应用退出时调用）"""
+    db_executor.shutdown(wait=wait)
+    cpu_executor.shutdown(wait=wait)
@@ -0,0 +1,182 @@
+"""
+推理微批处理调度器
+
+并发的 /predict 请求各自做 batch=1 的前向传播，吞吐量很低。调度器把请求放入队列，
+在 max_wait_ms 时间窗口内收集最多 max_batch_size 个请求：
+- 按模型 (user_id, metric, model_type) 分组，同一模型的请求合并为一次批量前向传播
+  （每个用户的模型权重不同，只有同一模型的请求才能共用一次前向传播）
+- 所有请求共用模型的 seq_length，预测天数不同的请求在批内按前缀掩码处理
+- 结果按请求拆分后回填给各自的调用方
+- 队列深度、批大小分布、排队/计算耗时等指标可通过接口导出
+
+作者: Health Management System Team
+日期: 2026-02-15
+"""
+
+import asyncio
+import os
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+from ml_models.model_loader import ModelLoader
+from api.executors import run_cpu
+
+INFER_MAX_BATCH_SIZE = int(os.getenv('API_INFER_MAX_BATCH_SIZE', '32'))
+INFER_MAX_WAIT_MS = float(os.getenv('API_INFER_MAX_WAIT_MS', '5'))
+
+
+class _PendingRequest:
+    """队列中等待推理的请求"""
+
+    __slots__ = ('key', 'payload', 'future', 'enqueued_at')
+
+    def __init__(self, key: Tuple, payload: Dict, future: asyncio.Future):
+        self.key = key
+        self.payload = payload
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class InferenceDispatcher:
+    """
+    微批处理推理调度器
+
+    在事件循环中运行一个收集协程；批量推理本身在 CPU 线程池中执行。
+    一个批次内不同模型的分组并行执行，批次完成后再收集下一批，
+    因此负载越高，单个批次越大。
+    """
+
+    def __init__(self, max_batch_size: int = INFER_MAX_BATCH_SIZE,
+                 max_wait_ms: float = INFER_MAX_WAIT_MS, model_dir: str = 'models'):
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.model_dir = model_dir
+
+        self._queue = None
+        self._worker = None
+
+        self._requests_total = 0
+        self._errors_total = 0
+        self._batches_total = 0
+        self._groups_total = 0
+        self._batch_sizes = Counter()
+        self._queue_wait_ms_total = 0.0
+        self._compute_ms_total = 0.0
+        self._in_flight = 0
+
+    def _ensure_worker(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._collect_loop())
+
+    async def predict(self, df: pd.DataFrame, user_id: int, metric: str, days: int = 7,
+                      model_type: str = 'lstm', confidence_level: float = 0.95) -> Dict:
+        """
+        提交预测请求并等待批量推理结果
+
+        Returns:
+            与 ModelLoader.predict 相同结构的预测结果
+        """
+        self._ensure_worker()
+
+        future = asyncio.get_running_loop().create_future()
+        payload = {'df': df, 'days': days, 'confidence_level': confidence_level}
+        self._queue.put_nowait(_PendingRequest((user_id, metric, model_type), payload, future))
+        self._requests_total += 1
+
+        return await future
+
+    async def _collect_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait_ms / 1000
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # 调用方已断开的请求不再计算
+            batch = [item for item in batch if not item.future.done()]
+            if not batch:
+                continue
+
+            groups: Dict[Tuple, List[_PendingRequest]] = {}
+            for item in batch:
+                groups.setdefault(item.key, []).append(item)
+
+            self._batches_total += 1
+            self._batch_sizes[len(batch)] += 1
+            await asyncio.gather(*(self._run_group(key, items) for key, items in groups.items()))
+
+    async def _run_group(self, key: Tuple, items: List[_PendingRequest]):
+        user_id, metric, model_type = key
+        started = time.perf_counter()
+        self._groups_total += 1
+        self._in_flight += len(items)
+        self._queue_wait_ms_total += sum((started - item.enqueued_at) * 1000 for item in items)
+
+        try:
+            results = await run_cpu(
+                ModelLoader.predict_batch,
+                [item.payload for item in items],
+                user_id=user_id,
+                metric=metric,
+                model_type=model_type,
+                model_dir=self.model_dir
+            )
+        except Exception as e:
+            self._errors_total += len(items)
+            for item in items:
+                if not item.future.done():
+                    item.future.set_exception(e)
+        else:
+            for item, result in zip(items, results):
+                if not item.future.done():
+                    item.future.set_result(result)
+        finally:
+            self._in_flight -= len(items)
+            self._compute_ms_total += (time.perf_counter() - started) * 1000
+
+    def get_metrics(self) -> Dict:
+        """导出队列与批处理指标"""
+        batched = sum(size * count for size, count in self._batch_sizes.items())
+        return {
+            'config': {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait_ms,
+            },
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'in_flight': self._in_flight,
+            'requests_total': self._requests_total,
+            'errors_total': self._errors_total,
+            'batches_total': self._batches_total,
+            'model_groups_total': self._groups_total,
+            'avg_batch_size': round(batched / self._batches_total, 2) if self._batches_total else 0,
+            'batch_size_histogram': {str(size): count for size, count in sorted(self._batch_sizes.items())},
+            'avg_queue_wait_ms': round(self._queue_wait_ms_total / batched, 2) if batched else 0,
+            'avg_group_compute_ms': round(self._compute_ms_total / self._groups_total, 2) if self._groups_total else 0,
+        }
+
+    async def stop(self):
+        """停止收集协程"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+
+# 进程内共享的推理调度器
+inference_dispatcher = InferenceDispatcher()
@@ -0,0 +1,190 @@
+"""
+模型训练任务队列
+
+训练一个模型可能需要数分钟，不适合在 HTTP 请求内同步完成。这里提供进程内任务队列：
+- 提交后立即返回任务ID，由有界线程池在后台执行 ModelTrainer.train_model
+- 训练过程中按 epoch 更新进度（当前轮数、训练/验证损失）
+- 相同 (user_id, metric, model_type) 的任务在排队或运行期间只保留一个
+
+作者: Health Management System Team
+日期: 2026-02-15
+"""
+
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from ml_models.model_trainer import ModelTrainer
+
+TRAIN_MAX_WORKERS = int(os.getenv('API_TRAIN_MAX_WORKERS', '2'))
+TRAIN_JOB_HISTORY = int(os.getenv('API_TRAIN_JOB_HISTORY', '200'))
+
+
+class JobStatus:
+    """任务状态"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    ACTIVE = (QUEUED, RUNNING)
+
+
+class TrainingJob:
+    """单个训练任务"""
+
+    def __init__(self, user_id: int, metric: str, model_type: str, params: Dict):
+        self.job_id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.metric = metric
+        self.model_type = model_type
+        self.params = params
+        self.status = JobStatus.QUEUED
+        self.progress = {
+            'epoch': 0,
+            'epochs': params.get('epochs'),
+            'train_loss': None,
+            'val_loss': None,
+            'best_val_loss': None,
+        }
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def key(self) -> Tuple[int, str, str]:
+        return (self.user_id, self.metric, self.model_type)
+
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            'user_id': self.user_id,
+            'metric': self.metric,
+            'model_type': self.model_type,
+            'progress': dict(self.progress),
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class TrainingJobManager:
+    """
+    进程内训练任务管理器
+
+    任务只保存在内存中，服务重启后丢失；已完成的任务最多保留 history_size 个。
+    """
+
+    def __init__(self, max_workers: int = TRAIN_MAX_WORKERS, history_size: int = TRAIN_JOB_HISTORY):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='api-train')
+        self._lock = threading.Lock()
+        self._jobs: 'OrderedDict[str, TrainingJob]' = OrderedDict()
+        self._active: Dict[Tuple[int, str, str], str] = {}
+        self.history_size = history_size
+
+    def find_active(self, user_id: int, metric: str, model_type: str) -> Optional[TrainingJob]:
+        """查找同一用户/指标/模型类型正在排队或运行的任务"""
+        with self._lock:
+            job_id = self._active.get((user_id, metric, model_type))
+            return self._jobs.get(job_id) if job_id else None
+
+    def submit(self, df: pd.DataFrame, user_id: int, metric: str, model_type: str,
+               **params) -> Tuple[TrainingJob, bool]:
+        """
+        提交训练任务
+
+        Returns:
+            (任务, 是否新建)。已有相同任务在排队或运行时返回已有任务
+        """
+        with self._lock:
+            existing_id = self._active.get((user_id, metric, model_type))
+            if existing_id:
+                return self._jobs[existing_id], False
+
+            job = TrainingJob(user_id, metric, model_type, params)
+            self._jobs[job.job_id] = job
+            self._active[job.key] = job.job_id
+            self._prune()
+
+        self._executor.submit(self._run, job, df)
+        return job, True
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """获取任务状态快照"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def list_jobs(self, user_id: Optional[int] = None) -> list:
+        """列出任务（最新的在前）"""
+        with self._lock:
+            jobs = [job for job in reversed(self._jobs.values())
+                    if user_id is None or job.user_id == user_id]
+            return [job.to_dict() for job in jobs]
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _prune(self):
+        """淘汰最早完成的任务记录（调用方需持有锁）"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.status not in JobStatus.ACTIVE]
+        excess = len(finished) - self.history_size
+        for job_id in finished[:max(excess, 0)]:
+            del self._jobs[job_id]
+
+    def _update_progress(self, job: TrainingJob, progress: Dict):
+        with self._lock:
+            job.progress.update(progress)
+
+    def _run(self, job: TrainingJob, df: pd.DataFrame):
+        with self._lock:
+            job.status = JobStatus.RUNNING
+            job.started_at = datetime.now()
+
+        try:
+            result = ModelTrainer.train_model(
+                df=df,
+                user_id=job.user_id,
+                metric=job.metric,
+                model_type=job.model_type,
+                verbose=False,  # API 模式不打印详细信息
+                progress_callback=lambda progress: self._update_progress(job, progress),
+                **job.params
+            )
+            summary = {
+                'success': result['success'],
+                'model_type': result['model_type'],
+                'metric': result['metric'],
+                'user_id': result['user_id'],
+                'metrics': result['metrics'],
+                'data_info': result['data_info'],
+                'message': f"模型训练成功！MAE: {result['metrics']['MAE']:.4f}, "
+                           f"R²: {result['metrics']['R2']:.4f}"
+            }
+            with self._lock:
+                job.result = summary
+                job.status = JobStatus.SUCCEEDED
+        except Exception as e:
+            with self._lock:
+                job.error = str(e)
+                job.status = JobStatus.FAILED
+        finally:
+            with self._lock:
+                job.finished_at = datetime.now()
+                if self._active.get(job.key) == job.job_id:
+                    del self._active[job.key]
+
+
+# 进程内共享的训练任务管理器
+training_jobs = TrainingJobManager()
@@ -67,6 +67,49 @@ async def health_check():
     }
 
 
+# 就绪检查端点（预热完成前返回 503，供负载均衡判断是否转发流量）
+@app.get("/api/v2/ready")
+async def readiness_check():
+    """就绪检查"""
+    from api.warmup import model_warmup
+    return JSONResponse(
+        status_code=200 if model_warmup.is_ready else 503,
+        content={
+            "ready": model_warmup.is_ready,
+            "timestamp": datetime.now().isoformat(),
+            **model_warmup.get_state()
+        }
+    )
+
+
+# 应用启动时在后台预热模型
+@app.on_event("startup")
+async def start_model_warmup():
+    """预加载常用模型并预热推理算子"""
+    import asyncio
+    from api.warmup import model_warmup, WARMUP_ENABLED
+    if WARMUP_ENABLED:
+        app.state.warmup_task = asyncio.create_task(model_warmup.run())
+    else:
+        model_warmup.mark_ready()
+
+
+# 应用关闭时释放后台线程池
+@app.on_event("shutdown")
+async def shutdown_background_executors():
+    """关闭 ORM / 推理 / 训练线程池"""
+    from api.executors import shutdown_executors
+    from api.inference import inference_dispatcher
+    from api.jobs import training_jobs
+    from api.warmup import model_warmup
+    from api.routes.ai_advice import advisor
+    await inference_dispatcher.stop()
+    await advisor.aclose()
+    shutdown_executors(wait=False)
+    training_jobs.shutdown(wait=False)
+    model_warmup.save_usage()
+
+
 # 根路径
 @app.get("/")
 async def root():
@@ -117,6 +117,24 @@ class AIAdviceRequest(BaseModel):
     risk_assessment: Optional[Dict] = Field(None, description="风险评估结果（可选）")
 
 
+class AIAdviceBatchItem(BaseModel):
+    """批量 AI 建议中的单个条目"""
+    item_id: str = Field(..., description="条目ID（如患者ID）")
+    user_profile: UserProfile
+    recent_data: RecentHealthData
+    risk_assessment: Optional[Dict] = Field(None, description="风险评估结果（可选）")
+
+
+class AIAdviceBatchRequest(BaseModel):
+    """批量 AI 建议请求模型"""
+    items: List[AIAdviceBatchItem] = Field(..., description="条目列表", min_length=1, max_length=5000)
+    max_concurrency: int = Field(4, description="并发数", ge=1, le=32)
+    batch_id: Optional[str] = Field(
+        None, description="批次ID，提供时记录检查点，使用同一ID重新提交会跳过已完成的条目",
+        pattern="^[A-Za-z0-9_-]{1,64}$"
+    )
+
+
 class LifestylePlan(BaseModel):
     """生活方式计划模型"""
     diet: str = Field(..., description="饮食建议")
@@ -157,6 +175,39 @@ class TrainModelResponse(BaseModel):
     message: str
 
 
+class TrainJobSubmitResponse(BaseModel):
+    """训练任务提交响应"""
+    success: bool = True
+    job_id: str = Field(..., description="任务ID")
+    status: str = Field(..., description="任务状态: queued/running/succeeded/failed")
+    deduplicated: bool = Field(False, description="是否复用了进行中的相同任务")
+    message: str
+
+
+class TrainJobProgress(BaseModel):
+    """训练进度"""
+    epoch: int = Field(0, description="已完成的轮数")
+    epochs: Optional[int] = Field(None, description="计划训练轮数")
+    train_loss: Optional[float] = None
+    val_loss: Optional[float] = None
+    best_val_loss: Optional[float] = None
+
+
+class TrainJobStatusResponse(BaseModel):
+    """训练任务状态响应"""
+    job_id: str
+    status: str = Field(..., description="任务状态: queued/running/succeeded/failed")
+    user_id: int
+    metric: str
+    model_type: str
+    progress: TrainJobProgress
+    result: Optional[TrainModelResponse] = Field(None, description="训练结果（成功后返回）")
+    error: Optional[str] = Field(None, description="失败原因")
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+
 # ==================== 通用响应模型 ====================
 
 class ErrorResponse(BaseModel):
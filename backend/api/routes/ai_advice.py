@@ -8,18 +8,28 @@ AI 建议 API 路由
 """
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+import json
 import sys
 import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from api.models.schemas import AIAdviceRequest, AIAdviceResponse
-from ai_services.deepseek_advisor import DeepSeekAdvisor
+from api.models.schemas import AIAdviceRequest, AIAdviceResponse, AIAdviceBatchRequest
+from ai_services.async_advisor import AsyncDeepSeekAdvisor
+from ai_services.batch_advisor import BatchAdviceRunner
 
 router = APIRouter()
 
-# 创建 DeepSeek 顾问实例 (默认使用 mock 模式)
-advisor = DeepSeekAdvisor(mock_mode=True, use_cache=True)
+# 批量建议检查点目录
+ADVICE_BATCH_DIR = os.getenv('ADVICE_BATCH_DIR', os.path.join('cache', 'advice_batches'))
+
+# 创建异步 DeepSeek 顾问实例 (默认使用 mock 模式，AI_ADVICE_MOCK_MODE=false 时调用真实 API)
+advisor = AsyncDeepSeekAdvisor(
+    mock_mode=os.getenv('AI_ADVICE_MOCK_MODE', 'true').lower() in ('1', 'true', 'yes'),
+    use_cache=True,
+    max_concurrency=int(os.getenv('AI_ADVICE_MAX_CONCURRENCY', '8'))
+)
 
 
 @router.post("/ai-advice", response_model=AIAdviceResponse)
@@ -59,7 +69,7 @@ async def get_ai_health_advice(request: AIAdviceRequest):
         }
         
         # 调用 AI 顾问
-        advice = advisor.get_health_advice(user_profile, recent_data, risk_assessment)
+        advice = await advisor.get_health_advice(user_profile, recent_data, risk_assessment)
         
         if not advice.get('success'):
             raise HTTPException(status_code=500, detail="生成建议失败")
@@ -72,6 +82,37 @@ async def get_ai_health_advice(request: AIAdviceRequest):
         raise HTTPException(status_code=500, detail=f"获取AI建议失败: {str(e)}")
 
 
+@router.post("/ai-advice/batch")
+async def get_batch_health_advice(request: AIAdviceBatchRequest):
+    """
+    批量获取AI健康建议
+    
+    相同的提示词只生成一次，按完成顺序以 NDJSON 流式返回，每行一个条目的结果。
+    提供 batch_id 时记录检查点，中断后用同一 batch_id 重新提交可跳过已完成的条目。
+    """
+    checkpoint_path = None
+    if request.batch_id:
+        checkpoint_path = os.path.join(ADVICE_BATCH_DIR, f'{request.batch_id}.jsonl')
+    
+    items = [
+        {
+            'item_id': item.item_id,
+            'user_profile': item.user_profile.model_dump(),
+            'recent_data': {key: values for key, values in item.recent_data.model_dump().items() if values},
+            'risk_assessment': item.risk_assessment,
+        }
+        for item in request.items
+    ]
+    runner = BatchAdviceRunner(advisor, max_concurrency=request.max_concurrency,
+                               checkpoint_path=checkpoint_path)
+    
+    async def stream():
+        async for record in runner.run(items):
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+    
+    return StreamingResponse(stream(), media_type='application/x-ndjson')
+
+
 @router.post("/ai-advice/simple")
 async def get_simple_advice(metric: str, value: float, risk_level: str = "中风险"):
     """
@@ -83,7 +124,7 @@ async def get_simple_advice(metric: str, value: float, risk_level: str = "中风
         risk_level: 风险等级
     """
     try:
-        advice = advisor.get_simple_advice(metric, value, risk_level)
+        advice = await advisor.get_simple_advice(metric, value, risk_level)
         return advice
         
     except Exception as e:
@@ -100,8 +141,22 @@ async def analyze_metric_trend(metric: str, trend_data: list):
         trend_data: 趋势数据列表
     """
     try:
-        analysis = advisor.analyze_trend(metric, trend_data)
+        analysis = await advisor.analyze_trend(metric, trend_data)
         return analysis
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"趋势分析失败: {str(e)}")
+
+
+@router.get("/ai-advice/cache/stats")
+async def get_advice_cache_stats():
+    """
+    AI 建议缓存统计
+    
+    Returns:
+        命中率、条目数、淘汰次数等
+    """
+    return {
+        "success": True,
+        **advisor.get_cache_stats()
+    }
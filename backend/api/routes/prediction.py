@@ -22,19 +22,46 @@ django.setup()
 
 from api.models.schemas import (
     PredictionRequest, PredictionResponse,
-    TrainModelRequest, TrainModelResponse,
+    TrainModelRequest,
+    TrainJobSubmitResponse, TrainJobStatusResponse,
     ErrorResponse
 )
 from ml_models.model_loader import ModelLoader
 from ml_models.model_trainer import ModelTrainer
-from measurements.models import Measurement
-from django.contrib.auth import get_user_model
-
-User = get_user_model()
+from api.executors import run_db
+from api.inference import inference_dispatcher
+from api.jobs import training_jobs
+from measurements import timeseries_cache
 
 router = APIRouter()
 
 
+def _load_metric_frame(user_id: int, metric: str) -> pd.DataFrame:
+    """
+    读取用户某项指标的历史数据（需在 DB 线程池中执行）
+    
+    从按用户的内存映射时间序列缓存读取，缓存缺失时才查询数据库重建
+    
+    Args:
+        user_id: 用户ID
+        metric: 指标名称
+        
+    Returns:
+        以 measured_at 为索引的 DataFrame
+    """
+    df = timeseries_cache.metric_frame(user_id, [metric])
+    if df is None:
+        raise HTTPException(status_code=404, detail=f"用户 {user_id} 不存在")
+    
+    if len(df) < 100:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"数据不足：仅有 {len(df)} 条记录，至少需要 100 条"
+        )
+    
+    return df
+
+
 @router.post("/predict", response_model=PredictionResponse)
 async def predict_health_metric(request: PredictionRequest):
     """
@@ -47,30 +74,11 @@ async def predict_health_metric(request: PredictionRequest):
         预测结果（包含置信区间和历史回测）
     """
     try:
-        # 验证用户
-        try:
-            user = User.objects.get(id=request.user_id)
-        except User.DoesNotExist:
-            raise HTTPException(status_code=404, detail=f"用户 {request.user_id} 不存在")
-        
-        # 获取历史数据
-        measurements = Measurement.objects.filter(user=user).order_by('measured_at')
-        
-        if measurements.count() < 100:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"数据不足：仅有 {measurements.count()} 条记录，至少需要 100 条"
-            )
-        
-        # 转换为 DataFrame
-        data = list(measurements.values('measured_at', request.metric))
-        df = pd.DataFrame(data)
-        df['measured_at'] = pd.to_datetime(df['measured_at'])
-        df = df.sort_values('measured_at')
-        df = df.set_index('measured_at')
+        # 数据库查询在线程池中执行，避免阻塞事件循环
+        df = await run_db(_load_metric_frame, request.user_id, request.metric)
         
-        # 使用模型预测
-        result = ModelLoader.predict(
+        # 交给推理调度器，与同一模型的并发请求合并为批量推理
+        result = await inference_dispatcher.predict(
             df=df,
             user_id=request.user_id,
             metric=request.metric,
@@ -90,65 +98,85 @@ async def predict_health_metric(request: PredictionRequest):
         raise HTTPException(status_code=500, detail=f"预测失败: {str(e)}")
 
 
-@router.post("/train", response_model=TrainModelResponse)
+@router.post("/train", response_model=TrainJobSubmitResponse, status_code=202)
 async def train_model(request: TrainModelRequest):
     """
-    训练预测模型
+    提交模型训练任务
+    
+    训练在后台线程池中执行，接口立即返回任务ID，
+    通过 GET /train/{job_id} 查询进度和结果。
+    相同用户/指标/模型类型的任务在进行中时直接返回已有任务。
     
     Args:
         request: 训练请求
         
     Returns:
-        训练结果
+        任务ID和状态
     """
+    if request.model_type not in ModelTrainer.SUPPORTED_MODELS:
+        raise HTTPException(status_code=400, detail=f"不支持的模型类型: {request.model_type}")
+    if request.metric not in ModelTrainer.SUPPORTED_METRICS:
+        raise HTTPException(status_code=400, detail=f"不支持的指标: {request.metric}")
+    
     try:
-        # 验证用户
-        try:
-            user = User.objects.get(id=request.user_id)
-        except User.DoesNotExist:
-            raise HTTPException(status_code=404, detail=f"用户 {request.user_id} 不存在")
-        
-        # 获取历史数据
-        measurements = Measurement.objects.filter(user=user).order_by('measured_at')
-        
-        if measurements.count() < 100:
-            raise HTTPException(
-                status_code=400,
-                detail=f"数据不足：仅有 {measurements.count()} 条记录，至少需要 100 条"
+        existing = training_jobs.find_active(request.user_id, request.metric, request.model_type)
+        if existing is None:
+            df = await run_db(_load_metric_frame, request.user_id, request.metric)
+            job, created = training_jobs.submit(
+                df,
+                user_id=request.user_id,
+                metric=request.metric,
+                model_type=request.model_type,
+                epochs=request.epochs,
+                batch_size=request.batch_size,
+                seq_length=request.seq_length
             )
-        
-        # 转换为 DataFrame
-        data = list(measurements.values('measured_at', request.metric))
-        df = pd.DataFrame(data)
-        df['measured_at'] = pd.to_datetime(df['measured_at'])
-        df = df.sort_values('measured_at')
-        df = df.set_index('measured_at')
-        
-        # 训练模型
-        result = ModelTrainer.train_model(
-            df=df,
-            user_id=request.user_id,
-            metric=request.metric,
-            model_type=request.model_type,
-            epochs=request.epochs,
-            batch_size=request.batch_size,
-            seq_length=request.seq_length,
-            verbose=False  # API 模式不打印详细信息
-        )
+        else:
+            job, created = existing, False
         
         return {
-            "success": result['success'],
-            "model_type": result['model_type'],
-            "metric": result['metric'],
-            "user_id": result['user_id'],
-            "metrics": result['metrics'],
-            "message": f"模型训练成功！MAE: {result['metrics']['MAE']:.4f}, R²: {result['metrics']['R2']:.4f}"
+            "success": True,
+            "job_id": job.job_id,
+            "status": job.status,
+            "deduplicated": not created,
+            "message": "训练任务已提交" if created else "相同的训练任务正在进行中"
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"训练失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"提交训练任务失败: {str(e)}")
+
+
+@router.get("/train/{job_id}", response_model=TrainJobStatusResponse)
+async def get_train_job(job_id: str):
+    """
+    查询训练任务状态
+    
+    Args:
+        job_id: 任务ID
+        
+    Returns:
+        任务状态、训练进度（epoch、损失）和训练结果
+    """
+    job = training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"训练任务不存在: {job_id}")
+    return job
+
+
+@router.get("/inference/metrics")
+async def get_inference_metrics():
+    """
+    推理调度器指标
+    
+    Returns:
+        队列深度、批大小分布、平均排队/计算耗时等
+    """
+    return {
+        "success": True,
+        **inference_dispatcher.get_metrics()
+    }
 
 
 @router.get("/models/{user_id}")
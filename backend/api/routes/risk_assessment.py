@@ -22,14 +22,54 @@ django.setup()
 from api.models.schemas import RiskAssessmentRequest, RiskAssessmentResponse
 from ml_models.feature_extractor import FeatureExtractor
 from ml_models.risk_assessor import RiskAssessor
-from measurements.models import Measurement
-from django.contrib.auth import get_user_model
+from api.executors import run_db, run_cpu
+from measurements import timeseries_cache
+from django.utils import timezone
 from datetime import datetime, timedelta
-
-User = get_user_model()
+from typing import Dict, List
 router = APIRouter()
 
 
+def _load_window_frame(user_id: int, metrics: List[str], time_window: int) -> pd.DataFrame:
+    """
+    读取时间窗口内的测量数据（需在 DB 线程池中执行）
+    
+    所有指标从按用户的内存映射时间序列缓存中按时间范围切片取回
+    """
+    # 获取指定时间窗口内的数据
+    end_date = timezone.now()
+    start_date = end_date - timedelta(days=time_window)
+    
+    df = timeseries_cache.metric_frame(user_id, metrics, start=start_date, end=end_date)
+    if df is None:
+        raise HTTPException(status_code=404, detail=f"用户 {user_id} 不存在")
+    
+    if len(df) < 30:
+        raise HTTPException(
+            status_code=400,
+            detail=f"数据不足：仅有 {len(df)} 条记录，至少需要 30 条"
+        )
+    
+    return df.reset_index()
+
+
+def _extract_features(df: pd.DataFrame, metrics: List[str]) -> Dict[str, float]:
+    """提取所有指标的时间序列特征（计算密集，需在 CPU 线程池中执行）"""
+    all_features = {}
+    
+    for metric in metrics:
+        values = pd.to_numeric(df[metric], errors='coerce').dropna()
+        
+        if len(values) < 10:
+            continue
+        
+        # 提取特征
+        features = FeatureExtractor.extract_all_features(values.values)
+        all_features.update({f"{metric}_{k}": v for k, v in features.items()})
+    
+    return all_features
+
+
 @router.post("/risk-assessment", response_model=RiskAssessmentResponse)
 async def assess_health_risk(request: RiskAssessmentRequest):
     """
@@ -38,44 +78,9 @@ async def assess_health_risk(request: RiskAssessmentRequest):
     基于时间序列特征提取和随机森林分类器评估风险等级
     """
     try:
-        # 验证用户
-        try:
-            user = User.objects.get(id=request.user_id)
-        except User.DoesNotExist:
-            raise HTTPException(status_code=404, detail=f"用户 {request.user_id} 不存在")
-        
-        # 获取指定时间窗口内的数据
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=request.time_window)
-        
-        measurements = Measurement.objects.filter(
-            user=user,
-            measured_at__gte=start_date,
-            measured_at__lte=end_date
-        ).order_by('measured_at')
-        
-        if measurements.count() < 30:
-            raise HTTPException(
-                status_code=400,
-                detail=f"数据不足：仅有 {measurements.count()} 条记录，至少需要 30 条"
-            )
-        
-        # 提取所有指标的特征
-        all_features = {}
-        
-        for metric in request.metrics:
-            data = list(measurements.values('measured_at', metric))
-            df = pd.DataFrame(data)
-            df[metric] = pd.to_numeric(df[metric], errors='coerce')
-            df = df.dropna(subset=[metric])
-            
-            if len(df) < 10:
-                continue
-            
-            # 提取特征
-            metric_data = df[metric].values
-            features = FeatureExtractor.extract_all_features(metric_data)
-            all_features.update({f"{metric}_{k}": v for k, v in features.items()})
+        # 数据库查询和特征提取在线程池中执行，避免阻塞事件循环
+        df = await run_db(_load_window_frame, request.user_id, request.metrics, request.time_window)
+        all_features = await run_cpu(_extract_features, df, request.metrics)
         
         if not all_features:
             raise HTTPException(status_code=400, detail="无法提取有效特征")
@@ -0,0 +1,250 @@
+"""
+模型预热
+
+新实例启动后，第一次预测需要导入 torch、从磁盘加载模型并执行首次前向传播，耗时很长。
+服务启动时在后台执行预热：
+- 建立数据库连接
+- 导入 torch，并按清单（MODEL_WARMUP_MANIFEST）或最近常用的 N 个模型（MODEL_WARMUP_TOP_N）预加载模型
+- 对每个模型执行一次与推理相同形状的空前向传播，预热算子
+预热状态通过 /api/v2/ready 单独报告，负载均衡只把流量转发给已预热的实例；
+/api/v2/health 仍只表示进程存活。
+
+清单格式（JSON）:
+    [{"user_id": 1, "metric": "blood_glucose", "model_type": "lstm"}, ...]
+或
+    {"models": [...]}
+
+作者: Health Management System Team
+日期: 2026-02-15
+"""
+
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from ml_models.model_loader import ModelLoader
+from api.executors import run_cpu, run_db
+
+WARMUP_ENABLED = os.getenv('MODEL_WARMUP_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+WARMUP_MANIFEST = os.getenv('MODEL_WARMUP_MANIFEST', '')
+WARMUP_TOP_N = int(os.getenv('MODEL_WARMUP_TOP_N', '10'))
+MODEL_USAGE_FILE = os.getenv('MODEL_USAGE_FILE', os.path.join('models', 'model_usage.json'))
+
+
+class ModelWarmup:
+    """启动预热与就绪状态"""
+
+    PENDING = 'pending'
+    WARMING = 'warming'
+    READY = 'ready'
+    FAILED = 'failed'
+
+    DB_RETRIES = 5
+
+    def __init__(self, manifest_path: str = WARMUP_MANIFEST, top_n: int = WARMUP_TOP_N,
+                 usage_file: str = MODEL_USAGE_FILE, model_dir: str = 'models'):
+        self.manifest_path = manifest_path
+        self.top_n = top_n
+        self.usage_file = usage_file
+        self.model_dir = model_dir
+
+        self.status = self.PENDING
+        self.source = None
+        self.models: List[Dict] = []
+        self.errors: List[str] = []
+        self.started_at = None
+        self.finished_at = None
+        self.duration_ms = None
+
+    @property
+    def is_ready(self) -> bool:
+        return self.status == self.READY
+
+    # ------------------------------------------------------------------
+    # 预热目标
+    # ------------------------------------------------------------------
+    def _load_manifest(self) -> List[Dict]:
+        with open(self.manifest_path, 'r') as f:
+            manifest = json.load(f)
+        if isinstance(manifest, dict):
+            manifest = manifest.get('models', [])
+        return [
+            {
+                'user_id': int(item['user_id']),
+                'metric': item['metric'],
+                'model_type': item.get('model_type', 'lstm'),
+            }
+            for item in manifest
+        ]
+
+    def _top_used(self) -> List[Dict]:
+        """按上次运行保存的使用统计取最近使用的 N 个模型；没有统计时取最近训练的 N 个模型"""
+        if self.top_n <= 0:
+            return []
+
+        if os.path.exists(self.usage_file):
+            with open(self.usage_file, 'r') as f:
+                usage = json.load(f)
+            usage.sort(key=lambda item: (item.get('last_used') or '', item.get('count', 0)), reverse=True)
+            return [
+                {'user_id': item['user_id'], 'metric': item['metric'], 'model_type': item['model_type']}
+                for item in usage[:self.top_n]
+            ]
+
+        if not os.path.isdir(self.model_dir):
+            return []
+
+        checkpoints = []
+        for filename in os.listdir(self.model_dir):
+            name, ext = os.path.splitext(filename)
+            model_type, _, rest = name.partition('_user')
+            if ext != '.pth' or model_type not in ModelLoader.SUPPORTED_MODELS:
+                continue
+            user_id, _, metric = rest.partition('_')
+            if not user_id.isdigit() or metric not in ModelLoader.SUPPORTED_METRICS:
+                continue
+            mtime = os.path.getmtime(os.path.join(self.model_dir, filename))
+            checkpoints.append((mtime, {'user_id': int(user_id), 'metric': metric, 'model_type': model_type}))
+
+        checkpoints.sort(key=lambda item: item[0], reverse=True)
+        return [target for _, target in checkpoints[:self.top_n]]
+
+    def resolve_targets(self) -> List[Dict]:
+        """确定需要预热的模型列表"""
+        if self.manifest_path:
+            self.source = 'manifest'
+            return self._load_manifest()
+        self.source = 'top_n'
+        return self._top_used()
+
+    # ------------------------------------------------------------------
+    # 预热执行
+    # ------------------------------------------------------------------
+    def _warm_model(self, target: Dict) -> Dict:
+        """加载模型并执行一次与推理相同形状的空前向传播"""
+        import torch
+
+        started = time.perf_counter()
+        trainer, _, lock = ModelLoader.get_model(
+            target['user_id'], target['metric'], target['model_type'], self.model_dir,
+            record_usage=False
+        )
+        if trainer is None:
+            raise FileNotFoundError(
+                f"模型不存在: user{target['user_id']}_{target['metric']}_{target['model_type']}"
+            )
+
+        with lock:
+            dummy = torch.zeros(
+                (ModelLoader.MC_ITERATIONS, trainer.seq_length, 1), device=trainer.device
+            )
+            with torch.no_grad():
+                trainer.model.train()  # MC Dropout 推理路径
+                trainer.model(dummy)
+                trainer.model.eval()  # 回测推理路径
+                trainer.model(dummy[:1])
+
+        return {**target, 'load_ms': round((time.perf_counter() - started) * 1000, 1)}
+
+    @staticmethod
+    def _ping_database():
+        from django.db import connection
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+    @staticmethod
+    def _import_torch():
+        import torch  # noqa: F401
+
+    async def run(self):
+        """执行预热（在启动事件中以后台任务运行）"""
+        self.status = self.WARMING
+        self.started_at = datetime.now()
+        started = time.perf_counter()
+
+        for attempt in range(self.DB_RETRIES):
+            try:
+                await run_db(self._ping_database)
+                break
+            except Exception as e:
+                if attempt == self.DB_RETRIES - 1:
+                    self.errors.append(f"数据库连接失败: {e}")
+                    self.status = self.FAILED
+                    self._finish(started)
+                    return
+                await asyncio.sleep(2 ** attempt)
+
+        try:
+            targets = self.resolve_targets()
+        except Exception as e:
+            self.errors.append(f"读取预热清单失败: {e}")
+            targets = []
+
+        if targets:
+            try:
+                await run_cpu(self._import_torch)
+            except ImportError:
+                self.errors.append("PyTorch 未安装，跳过模型预热")
+                targets = []
+
+        for target in targets:
+            try:
+                self.models.append(await run_cpu(self._warm_model, target))
+            except Exception as e:
+                self.errors.append(str(e))
+
+        self.status = self.READY
+        self._finish(started)
+
+    def _finish(self, started: float):
+        self.finished_at = datetime.now()
+        self.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    def mark_ready(self):
+        """未启用预热时直接标记为就绪"""
+        self.status = self.READY
+        self.source = 'disabled'
+        self.started_at = self.finished_at = datetime.now()
+        self.duration_ms = 0
+
+    def save_usage(self):
+        """保存模型使用统计（应用关闭时调用），供下次启动选择预热模型"""
+        usage = ModelLoader.get_usage()
+        if not usage:
+            return
+
+        if os.path.exists(self.usage_file):
+            try:
+                with open(self.usage_file, 'r') as f:
+                    previous = json.load(f)
+            except (OSError, ValueError):
+                previous = []
+            merged = {(item['model_type'], item['user_id'], item['metric']): item for item in previous}
+            for item in usage:
+                key = (item['model_type'], item['user_id'], item['metric'])
+                if key in merged:
+                    item = {**item, 'count': merged[key].get('count', 0) + item['count']}
+                merged[key] = item
+            usage = list(merged.values())
+
+        os.makedirs(os.path.dirname(self.usage_file) or '.', exist_ok=True)
+        with open(self.usage_file, 'w') as f:
+            json.dump(usage, f, ensure_ascii=False, indent=2)
+
+    def get_state(self) -> Dict:
+        return {
+            'status': self.status,
+            'source': self.source,
+            'models': self.models,
+            'errors': self.errors,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'duration_ms': self.duration_ms,
+        }
+
+
+# 进程内共享的预热状态
+model_warmup = ModelWarmup()
@@ -3,26 +3,70 @@ MySQL 数据导入脚本
 
 将 PyHealth 生成的数据导入到 Django MySQL 数据库
 使用现有的 Measurement 模型和 User 模型
+
+测量数据按块流式读取（read_csv(chunksize=...)），每块按列转换后在一个事务中批量 upsert，
+内存占用与文件大小无关；MySQL 下可选 LOAD DATA LOCAL INFILE 快速路径
 """
 
+import argparse
 import os
 import sys
+import time
+from datetime import datetime
+
 import django
 import pandas as pd
-from datetime import datetime
-from decimal import Decimal
 
 # 设置 Django 环境
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'health_management_system.settings')
 django.setup()
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
 from measurements.models import Measurement
+from measurements.services.ingest_service import (
+    delete_user_measurements, measurements_from_frame, refresh_imported_users, upsert_measurements
+)
 from users.models import Profile
 
 User = get_user_model()
 
+# 测量数据CSV中导入用到的列及类型
+MEASUREMENT_COLUMNS = {
+    'username': 'string',
+    'measured_at': 'string',
+    'blood_glucose': 'float64',
+    'heart_rate': 'float64',
+    'systolic': 'float64',
+    'diastolic': 'float64',
+    'weight_kg': 'float64',
+}
+
+# 每次从CSV读取的行数
+DEFAULT_CHUNKSIZE = 50000
+
+MEASUREMENT_NOTES = 'PyHealth generated data'
+
+
+def _fixed_utc_offset() -> str:
+    """
+    当前时区的 UTC 偏移（'+08:00' 格式），供 MySQL CONVERT_TZ 使用（无需时区表）
+    
+    Raises:
+        DatabaseError: 时区有夏令时，偏移不固定
+    """
+    tz = timezone.get_current_timezone()
+    year = timezone.now().year
+    offsets = {datetime(year, month, 1, tzinfo=tz).utcoffset() for month in (1, 7)}
+    if len(offsets) > 1:
+        raise DatabaseError(f'时区 {tz} 有夏令时，不能使用 LOAD DATA 快速路径')
+    minutes = int(offsets.pop().total_seconds() // 60)
+    sign = '+' if minutes >= 0 else '-'
+    return f'{sign}{abs(minutes) // 60:02d}:{abs(minutes) % 60:02d}'
+
 
 class DataImporter:
     """数据导入器"""
@@ -87,76 +131,145 @@ class DataImporter:
         print(f"用户导入完成: 新增 {imported_count} 个用户\n")
         return imported_count
     
-    def import_measurements(self, batch_size: int = 1000) -> int:
+    def _clear_old_measurements(self):
+        """删除已映射用户的旧测量数据（一条 DELETE）"""
+        print("  清理旧数据...")
+        deleted = delete_user_measurements(user.id for user in self.user_mapping.values())
+        if deleted:
+            print(f"  - 删除 {len(self.user_mapping)} 个用户的 {deleted} 条旧记录")
+    
+    def import_measurements(self, batch_size: int = 1000, chunksize: int = DEFAULT_CHUNKSIZE) -> int:
         """
-        批量导入测量数据
+        流式批量导入测量数据
+        
+        每次读取 chunksize 行，按列转换类型，在一个事务中按 batch_size 批量 upsert
         
         Args:
             batch_size: 批量插入大小
+            chunksize: 每块读取的行数
             
         Returns:
             导入的记录数量
         """
         print("正在导入测量数据...")
         
-        df_measurements = pd.read_csv(self.measurements_csv)
-        total_records = len(df_measurements)
+        self._clear_old_measurements()
+        
+        user_ids = {username: user.id for username, user in self.user_mapping.items()}
+        total_bytes = os.path.getsize(self.measurements_csv) or 1
         imported_count = 0
+        skipped_count = 0
+        started = time.perf_counter()
         
-        # 删除该用户的旧数据（可选）
-        print("  清理旧数据...")
-        for username in self.user_mapping.keys():
-            user = self.user_mapping[username]
-            old_count = Measurement.objects.filter(user=user).count()
-            if old_count > 0:
-                Measurement.objects.filter(user=user).delete()
-                print(f"  - 删除 {username} 的 {old_count} 条旧记录")
+        with open(self.measurements_csv, 'rb') as f:
+            reader = pd.read_csv(
+                f, encoding='utf-8-sig', usecols=list(MEASUREMENT_COLUMNS),
+                dtype=MEASUREMENT_COLUMNS, chunksize=chunksize
+            )
+            for chunk in reader:
+                measurements, skipped = measurements_from_frame(chunk, user_ids, notes=MEASUREMENT_NOTES)
+                with transaction.atomic():
+                    written = upsert_measurements(measurements, batch_size=batch_size)
+                
+                imported_count += len(written)
+                skipped_count += skipped
+                elapsed = time.perf_counter() - started
+                # 读取位置以解析器的缓冲为单位，进度为近似值
+                progress = min(f.tell() / total_bytes, 1.0)
+                print(f"  ✓ 已导入 {imported_count} 条记录 ({progress*100:.1f}%), "
+                      f"{imported_count / elapsed:.0f} 条/秒")
         
-        # 批量插入
-        measurements_to_create = []
+        if skipped_count:
+            print(f"  ! 警告: {skipped_count} 条记录找不到用户或时间无效, 已跳过")
         
-        for idx, row in df_measurements.iterrows():
-            username = row['username']
-            user = self.user_mapping.get(username)
-            
-            if user is None:
-                print(f"  ! 警告: 找不到用户 {username}, 跳过记录")
-                continue
-            
-            # 转换数据类型
-            measured_at = pd.to_datetime(row['measured_at'])
-            
-            measurement = Measurement(
-                user=user,
-                measured_at=measured_at,
-                blood_glucose=Decimal(str(round(row['blood_glucose'], 1))),
-                heart_rate=int(row['heart_rate']),
-                systolic=int(row['systolic']),
-                diastolic=int(row['diastolic']),
-                weight_kg=Decimal(str(round(row['weight_kg'], 1))),
-                notes=f'PyHealth generated data'
-            )
-            
-            measurements_to_create.append(measurement)
-            
-            # 批量插入
-            if len(measurements_to_create) >= batch_size:
-                Measurement.objects.bulk_create(measurements_to_create)
-                imported_count += len(measurements_to_create)
-                print(f"  ✓ 已导入 {imported_count}/{total_records} 条记录 "
-                      f"({imported_count/total_records*100:.1f}%)")
-                measurements_to_create = []
-        
-        # 插入剩余数据
-        if measurements_to_create:
-            Measurement.objects.bulk_create(measurements_to_create)
-            imported_count += len(measurements_to_create)
-        
-        print(f"测量数据导入完成: 共 {imported_count} 条记录\n")
+        # 批量 upsert 不触发信号，导入后重建每日汇总、刷新评分快照并使缓存失效
+        refresh_imported_users(user.id for user in self.user_mapping.values())
+        
+        elapsed = time.perf_counter() - started
+        print(f"测量数据导入完成: 共 {imported_count} 条记录, 用时 {elapsed:.1f} 秒 "
+              f"({imported_count / max(elapsed, 1e-9):.0f} 条/秒)\n")
         return imported_count
     
-    def run(self):
-        """执行完整的导入流程"""
+    def load_data_infile(self) -> int:
+        """
+        MySQL 快速路径：LOAD DATA LOCAL INFILE 由服务器直接解析CSV
+        
+        用户名在服务器端换成用户ID，测量时间从当前时区换算为 UTC；
+        同一用户同一时刻的记录按唯一约束覆盖（REPLACE）。需要客户端开启 local_infile
+        （DATABASES['default']['OPTIONS']['local_infile'] = True）且服务器允许 local_infile。
+        
+        Returns:
+            写入的记录数量
+            
+        Raises:
+            DatabaseError: 数据库不是 MySQL、当前时区有夏令时或 LOAD DATA 被拒绝
+        """
+        if connection.vendor != 'mysql':
+            raise DatabaseError('LOAD DATA 只支持 MySQL')
+        
+        print("正在通过 LOAD DATA LOCAL INFILE 导入测量数据...")
+        
+        header = pd.read_csv(self.measurements_csv, encoding='utf-8-sig', nrows=0).columns
+        missing = set(MEASUREMENT_COLUMNS) - set(header)
+        if missing:
+            raise DatabaseError(f'测量数据文件缺少列: {", ".join(sorted(missing))}')
+        # 不导入的列读入占位变量
+        variables = ', '.join(f'@{column}' if column in MEASUREMENT_COLUMNS else '@unused' for column in header)
+        
+        if settings.USE_TZ:
+            offset = _fixed_utc_offset()
+            measured_at = f"CONVERT_TZ(@measured_at, '{offset}', '+00:00')"
+            now = 'UTC_TIMESTAMP(6)'
+        else:
+            measured_at = '@measured_at'
+            now = 'NOW(6)'
+        
+        quote = connection.ops.quote_name
+        # 最后一列可能带 Windows 换行的 \r；空串为缺失值
+        metrics = ',\n'.join(
+            f"    {quote(column)} = NULLIF(TRIM(TRAILING '\\r' FROM @{column}), '')"
+            for column in ('blood_glucose', 'heart_rate', 'systolic', 'diastolic', 'weight_kg')
+        )
+        sql = (
+            f"LOAD DATA LOCAL INFILE %s REPLACE INTO TABLE {quote(Measurement._meta.db_table)}\n"
+            "CHARACTER SET utf8mb4\n"
+            "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"'\n"
+            "LINES TERMINATED BY '\\n'\n"
+            "IGNORE 1 LINES\n"
+            f"({variables})\n"
+            "SET\n"
+            f"    user_id = (SELECT id FROM {quote(User._meta.db_table)} WHERE username = @username),\n"
+            f"    measured_at = {measured_at},\n"
+            f"{metrics},\n"
+            "    notes = %s,\n"
+            f"    created_at = {now},\n"
+            f"    updated_at = {now}"
+        )
+        
+        self._clear_old_measurements()
+        
+        started = time.perf_counter()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, [os.path.abspath(self.measurements_csv), MEASUREMENT_NOTES])
+            # REPLACE 覆盖的行计两次，不超过数据行数
+            affected = cursor.rowcount
+        
+        refresh_imported_users(user.id for user in self.user_mapping.values())
+        
+        elapsed = time.perf_counter() - started
+        print(f"测量数据导入完成: 影响 {affected} 行, 用时 {elapsed:.1f} 秒 "
+              f"({affected / max(elapsed, 1e-9):.0f} 行/秒)\n")
+        return affected
+    
+    def run(self, batch_size: int = 1000, chunksize: int = DEFAULT_CHUNKSIZE, load_data: bool = False):
+        """
+        执行完整的导入流程
+        
+        Args:
+            batch_size: 批量插入大小
+            chunksize: 每块读取的行数
+            load_data: 优先使用 MySQL LOAD DATA LOCAL INFILE，不可用时回退到分块导入
+        """
         print("=" * 60)
         print("PyHealth 数据导入工具")
         print("=" * 60)
@@ -177,7 +290,14 @@ class DataImporter:
         user_count = self.import_users()
         
         # 导入测量数据
-        measurement_count = self.import_measurements()
+        measurement_count = None
+        if load_data:
+            try:
+                measurement_count = self.load_data_infile()
+            except DatabaseError as e:
+                print(f"  ! LOAD DATA 不可用 ({e}), 改用分块导入\n")
+        if measurement_count is None:
+            measurement_count = self.import_measurements(batch_size=batch_size, chunksize=chunksize)
         
         print("=" * 60)
         print("导入完成！")
@@ -189,15 +309,18 @@ class DataImporter:
 
 
 if __name__ == '__main__':
-    # 默认路径
-    users_csv = 'data_generation/output/users.csv'
-    measurements_csv = 'data_generation/output/measurements.csv'
-    
-    # 支持命令行参数
-    if len(sys.argv) > 1:
-        users_csv = sys.argv[1]
-    if len(sys.argv) > 2:
-        measurements_csv = sys.argv[2]
+    parser = argparse.ArgumentParser(description='导入 PyHealth 生成的用户和测量数据')
+    parser.add_argument('users_csv', nargs='?', default='data_generation/output/users.csv',
+                        help='用户信息CSV文件路径')
+    parser.add_argument('measurements_csv', nargs='?', default='data_generation/output/measurements.csv',
+                        help='测量数据CSV文件路径')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help=f'每块读取的行数 (默认: {DEFAULT_CHUNKSIZE})')
+    parser.add_argument('--batch-size', type=int, default=1000,
+                        help='批量插入大小 (默认: 1000)')
+    parser.add_argument('--load-data', action='store_true',
+                        help='MySQL 下使用 LOAD DATA LOCAL INFILE 快速导入测量数据')
+    args = parser.parse_args()
     
-    importer = DataImporter(users_csv, measurements_csv)
-    importer.run()
+    importer = DataImporter(args.users_csv, args.measurements_csv)
+    importer.run(batch_size=args.batch_size, chunksize=args.chunksize, load_data=args.load_data)
@@ -13,18 +13,42 @@ PyHealth 2.0 风格的医疗数据生成器
 日期: 2026-02-15
 """
 
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
-import random
+
+# 早中晚的测量时刻
+MEASUREMENT_HOURS = np.array([7, 8, 9, 14, 15, 19, 20, 21])
+
+# 用户数不超过该值时逐个打印用户信息，否则只打印批次进度
+VERBOSE_USER_LIMIT = 20
+
+# 多进程时每个任务生成的用户数上限
+USERS_PER_TASK = 100
+
+
+def _generate_user_batch(num_records: int, random_seed: int, start_date: datetime,
+                         user_ids: List[int]) -> List[Tuple[Dict, pd.DataFrame]]:
+    """工作进程入口：生成一批用户的配置和时间序列（模块级函数，可被 pickle）"""
+    generator = PyHealthDataGenerator(num_users=0, records_per_user=num_records, random_seed=random_seed)
+    results = []
+    for user_id in user_ids:
+        profile = generator.generate_user_profile(user_id)
+        results.append((profile, generator.generate_time_series_for_user(profile, start_date)))
+    return results
 
 
 class PyHealthDataGenerator:
     """
     PyHealth 2.0 风格的医疗数据生成器
     
-    生成 10 个用户 × 1000 条记录的时间序列健康数据
+    生成 10 个用户 × 1000 条记录的时间序列健康数据。
+    每个用户的随机数来自由 (random_seed, user_id) 派生的独立随机流，
+    所以同一种子下某个用户的数据与用户总数、生成顺序和进程数无关
     """
     
     # 医学正常范围定义
@@ -61,12 +85,17 @@ class PyHealthDataGenerator:
         self.records_per_user = records_per_user
         self.random_seed = random_seed
         
-        # 设置随机种子
-        np.random.seed(random_seed)
-        random.seed(random_seed)
-        
         # 用户配置文件
         self.user_profiles = []
+    
+    def _user_rng(self, user_id: int, stream: int) -> np.random.Generator:
+        """
+        某用户的独立随机数生成器
+        
+        stream 0 用于个人信息，1 用于时间序列，两者可以分别调用而互不影响
+        """
+        seed_sequence = np.random.SeedSequence(self.random_seed, spawn_key=(user_id, stream))
+        return np.random.default_rng(seed_sequence)
         
     def generate_user_profile(self, user_id: int) -> Dict:
         """
@@ -78,55 +107,53 @@ class PyHealthDataGenerator:
         Returns:
             用户配置字典
         """
+        rng = self._user_rng(user_id, 0)
+        
         # 生成性别
-        gender = random.choice(['M', 'F'])
+        gender = str(rng.choice(['M', 'F']))
         
         # 生成姓名
-        surname = random.choice(self.SURNAMES)
-        if gender == 'M':
-            given_name = ''.join(random.sample(self.GIVEN_NAMES_MALE, 2))
-        else:
-            given_name = ''.join(random.sample(self.GIVEN_NAMES_FEMALE, 2))
+        surname = str(rng.choice(self.SURNAMES))
+        given_names = self.GIVEN_NAMES_MALE if gender == 'M' else self.GIVEN_NAMES_FEMALE
+        given_name = ''.join(rng.choice(given_names, size=2, replace=False))
         full_name = f"{surname}{given_name}"
         
         # 生成年龄 (18-80岁)
-        age = random.randint(18, 80)
+        age = int(rng.integers(18, 81))
         
         # 生成身高 (cm)
         if gender == 'M':
-            height_cm = round(random.normalvariate(172, 7), 1)
-            height_cm = max(155, min(195, height_cm))
+            height_cm = float(np.clip(round(rng.normal(172, 7), 1), 155, 195))
         else:
-            height_cm = round(random.normalvariate(160, 6), 1)
-            height_cm = max(145, min(180, height_cm))
+            height_cm = float(np.clip(round(rng.normal(160, 6), 1), 145, 180))
         
         # 生成理想体重 (使用BMI在正常范围 18.5-24)
-        ideal_bmi = random.uniform(20, 23)
+        ideal_bmi = rng.uniform(20, 23)
         ideal_weight = round(ideal_bmi * (height_cm / 100) ** 2, 1)
         
         # 生成血型
-        blood_type = random.choices(self.BLOOD_TYPES, weights=self.BLOOD_TYPE_WEIGHTS)[0]
+        blood_type = str(rng.choice(self.BLOOD_TYPES, p=self.BLOOD_TYPE_WEIGHTS))
         
         # 生成基础生理指标 (作为该用户的"正常值")
         # 年龄越大，指标可能偏高
         age_factor = (age - 18) / 62  # 0-1之间
         
-        base_blood_glucose = 4.5 + age_factor * 0.8 + random.uniform(-0.3, 0.3)
-        base_heart_rate = 70 + random.uniform(-8, 8)
-        base_systolic = 100 + age_factor * 15 + random.uniform(-5, 5)
-        base_diastolic = 70 + age_factor * 8 + random.uniform(-3, 3)
+        base_blood_glucose = 4.5 + age_factor * 0.8 + rng.uniform(-0.3, 0.3)
+        base_heart_rate = 70 + rng.uniform(-8, 8)
+        base_systolic = 100 + age_factor * 15 + rng.uniform(-5, 5)
+        base_diastolic = 70 + age_factor * 8 + rng.uniform(-3, 3)
         
         # 决定是否有慢性疾病 (年龄越大概率越高)
-        has_hypertension = random.random() < (age_factor * 0.3)
-        has_diabetes = random.random() < (age_factor * 0.2)
+        has_hypertension = bool(rng.random() < (age_factor * 0.3))
+        has_diabetes = bool(rng.random() < (age_factor * 0.2))
         
         # 如果有疾病，调整基础值
         if has_hypertension:
-            base_systolic += random.uniform(10, 25)
-            base_diastolic += random.uniform(5, 15)
+            base_systolic += rng.uniform(10, 25)
+            base_diastolic += rng.uniform(5, 15)
         
         if has_diabetes:
-            base_blood_glucose += random.uniform(1.5, 3.0)
+            base_blood_glucose += rng.uniform(1.5, 3.0)
         
         profile = {
             'user_id': user_id,
@@ -140,10 +167,10 @@ class PyHealthDataGenerator:
             'has_hypertension': has_hypertension,
             'has_diabetes': has_diabetes,
             'base_values': {
-                'blood_glucose': base_blood_glucose,
-                'heart_rate': base_heart_rate,
-                'systolic': base_systolic,
-                'diastolic': base_diastolic,
+                'blood_glucose': float(base_blood_glucose),
+                'heart_rate': float(base_heart_rate),
+                'systolic': float(base_systolic),
+                'diastolic': float(base_diastolic),
                 'weight_kg': ideal_weight,
             }
         }
@@ -154,6 +181,8 @@ class PyHealthDataGenerator:
         """
         为单个用户生成时间序列数据
         
+        一次抽取整个序列的噪声数组，按列计算各项指标（每条记录的分布与逐条生成时相同）
+        
         Args:
             profile: 用户配置
             start_date: 开始日期
@@ -161,131 +190,128 @@ class PyHealthDataGenerator:
         Returns:
             DataFrame containing time series data
         """
-        records = []
+        rng = self._user_rng(profile['user_id'], 1)
+        n = self.records_per_user
         base_values = profile['base_values']
         
         # 生成长期趋势 (用于模拟体重变化等)
-        weight_trend = np.random.choice(['stable', 'gain', 'loss'], p=[0.6, 0.25, 0.15])
-        
-        for i in range(self.records_per_user):
-            # 计算当前日期时间 (每天1-3次测量)
-            days_offset = i // 2  # 平均每天2次
-            hours = random.choice([7, 8, 9, 14, 15, 19, 20, 21])  # 早中晚
-            minutes = random.randint(0, 59)
-            
-            measured_at = start_date + timedelta(days=days_offset, hours=hours, minutes=minutes)
-            
-            # 计算当前天数进度 (0-1)
-            progress = i / self.records_per_user
-            
-            # 生成各项指标
-            # 1. 血糖 (考虑餐前餐后)
-            is_fasting = hours < 10  # 早上测量视为空腹
-            glucose_base = base_values['blood_glucose']
-            if not is_fasting:
-                glucose_base += random.uniform(0.5, 1.5)  # 餐后升高
-            
-            # 添加日常波动和长期趋势
-            daily_noise = np.random.normal(0, 0.3)
-            long_term_trend = 0
-            if profile['has_diabetes']:
-                long_term_trend = progress * random.uniform(-0.5, 0.3)  # 可能改善也可能恶化
-            
-            blood_glucose = glucose_base + daily_noise + long_term_trend
-            blood_glucose = round(max(3.0, min(15.0, blood_glucose)), 1)  # 限制在合理范围
-            
-            # 2. 心率 (考虑时间和活动)
-            hr_base = base_values['heart_rate']
-            time_factor = 5 if hours > 18 else 0  # 晚上可能略高
-            activity_noise = np.random.normal(0, 5)
-            
-            heart_rate = hr_base + time_factor + activity_noise
-            heart_rate = int(max(45, min(130, heart_rate)))
-            
-            # 3. 血压 (收缩压和舒张压有关联)
-            sys_base = base_values['systolic']
-            dia_base = base_values['diastolic']
-            
-            # 血压在一天内有波动
-            time_bp_factor = 0
-            if 6 <= hours < 12:
-                time_bp_factor = random.uniform(0, 5)  # 早上略高
-            elif hours >= 20:
-                time_bp_factor = random.uniform(-5, 0)  # 晚上略低
-            
-            bp_noise = np.random.normal(0, 4)
-            long_term_bp = 0
-            if profile['has_hypertension']:
-                long_term_bp = progress * random.uniform(-5, 2)  # 治疗可能改善
-            
-            systolic = sys_base + time_bp_factor + bp_noise + long_term_bp
-            systolic = int(max(80, min(200, systolic)))
-            
-            # 舒张压与收缩压相关
-            diastolic = dia_base + time_bp_factor * 0.5 + bp_noise * 0.5 + long_term_bp * 0.5
-            diastolic = int(max(50, min(120, diastolic)))
-            
-            # 4. 体重 (长期趋势)
-            weight_base = base_values['weight_kg']
-            
-            if weight_trend == 'gain':
-                weight_change = progress * random.uniform(2, 8)
-            elif weight_trend == 'loss':
-                weight_change = -progress * random.uniform(2, 6)
-            else:
-                weight_change = np.sin(progress * 4 * np.pi) * random.uniform(0.5, 1.5)  # 周期波动
-            
-            daily_weight_noise = np.random.normal(0, 0.3)
-            weight_kg = weight_base + weight_change + daily_weight_noise
-            weight_kg = round(max(40, min(150, weight_kg)), 1)
-            
-            # 组装记录
-            record = {
-                'user_id': profile['user_id'],
-                'username': profile['username'],
-                'measured_at': measured_at,
-                'blood_glucose': blood_glucose,
-                'heart_rate': heart_rate,
-                'systolic': systolic,
-                'diastolic': diastolic,
-                'weight_kg': weight_kg,
-            }
-            
-            records.append(record)
-        
-        df = pd.DataFrame(records)
-        df = df.sort_values('measured_at').reset_index(drop=True)
+        weight_trend = rng.choice(['stable', 'gain', 'loss'], p=[0.6, 0.25, 0.15])
+        
+        # 测量时间 (平均每天2次，早中晚随机)
+        index = np.arange(n)
+        days_offset = index // 2
+        hours = rng.choice(MEASUREMENT_HOURS, size=n)
+        minutes = rng.integers(0, 60, size=n)
+        offset_minutes = days_offset * 1440 + hours * 60 + minutes
+        
+        # 当前进度 (0-1)
+        progress = index / n
+        
+        # 1. 血糖 (早上测量视为空腹，其余为餐后)
+        postprandial = np.where(hours >= 10, rng.uniform(0.5, 1.5, size=n), 0.0)
+        long_term_trend = 0.0
+        if profile['has_diabetes']:
+            long_term_trend = progress * rng.uniform(-0.5, 0.3, size=n)  # 可能改善也可能恶化
+        blood_glucose = base_values['blood_glucose'] + postprandial + rng.normal(0, 0.3, size=n) + long_term_trend
+        blood_glucose = np.round(np.clip(blood_glucose, 3.0, 15.0), 1)  # 限制在合理范围
+        
+        # 2. 心率 (晚上可能略高)
+        heart_rate = base_values['heart_rate'] + np.where(hours > 18, 5, 0) + rng.normal(0, 5, size=n)
+        heart_rate = np.clip(heart_rate, 45, 130).astype(int)
+        
+        # 3. 血压 (早上略高、晚上略低；舒张压与收缩压相关)
+        time_bp_factor = np.select(
+            [(hours >= 6) & (hours < 12), hours >= 20],
+            [rng.uniform(0, 5, size=n), rng.uniform(-5, 0, size=n)],
+            default=0.0
+        )
+        bp_noise = rng.normal(0, 4, size=n)
+        long_term_bp = 0.0
+        if profile['has_hypertension']:
+            long_term_bp = progress * rng.uniform(-5, 2, size=n)  # 治疗可能改善
+        bp_offset = time_bp_factor + bp_noise + long_term_bp
+        systolic = np.clip(base_values['systolic'] + bp_offset, 80, 200).astype(int)
+        diastolic = np.clip(base_values['diastolic'] + bp_offset * 0.5, 50, 120).astype(int)
+        
+        # 4. 体重 (长期趋势)
+        if weight_trend == 'gain':
+            weight_change = progress * rng.uniform(2, 8, size=n)
+        elif weight_trend == 'loss':
+            weight_change = -progress * rng.uniform(2, 6, size=n)
+        else:
+            weight_change = np.sin(progress * 4 * np.pi) * rng.uniform(0.5, 1.5, size=n)  # 周期波动
+        weight_kg = base_values['weight_kg'] + weight_change + rng.normal(0, 0.3, size=n)
+        weight_kg = np.round(np.clip(weight_kg, 40, 150), 1)
+        
+        # 同一天内两次测量的时刻是随机的，按时间排序
+        order = np.argsort(offset_minutes, kind='stable')
+        df = pd.DataFrame({
+            'user_id': np.full(n, profile['user_id']),
+            'username': np.full(n, profile['username'], dtype=object),
+            'measured_at': pd.Timestamp(start_date) + pd.to_timedelta(offset_minutes[order], unit='m'),
+            'blood_glucose': blood_glucose[order],
+            'heart_rate': heart_rate[order],
+            'systolic': systolic[order],
+            'diastolic': diastolic[order],
+            'weight_kg': weight_kg[order],
+        })
         
         return df
     
-    def generate_all_data(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    def generate_all_data(self, workers: Optional[int] = 1) -> Tuple[pd.DataFrame, pd.DataFrame]:
         """
         生成所有用户的数据
         
+        Args:
+            workers: 工作进程数，1 为在当前进程中生成，None 或 0 为 CPU 核数。
+                同一种子下结果与进程数无关
+        
         Returns:
             (用户信息DataFrame, 测量数据DataFrame)
         """
-        print(f"开始生成数据: {self.num_users} 个用户 × {self.records_per_user} 条记录")
+        workers = workers or os.cpu_count() or 1
+        workers = max(1, min(workers, self.num_users))
+        print(f"开始生成数据: {self.num_users} 个用户 × {self.records_per_user} 条记录"
+              f" ({workers} 个进程)")
         print("=" * 60)
         
-        all_measurements = []
-        all_users = []
-        
         start_date = datetime(2024, 1, 1)  # 数据起始日期
+        user_ids = list(range(1, self.num_users + 1))
+        verbose = self.num_users <= VERBOSE_USER_LIMIT
+        
+        results = {}
+        if workers == 1:
+            for user_id in user_ids:
+                profile = self.generate_user_profile(user_id)
+                results[user_id] = (profile, self.generate_time_series_for_user(profile, start_date))
+                if not verbose and user_id % USERS_PER_TASK == 0:
+                    print(f"  已生成 {user_id}/{self.num_users} 个用户")
+        else:
+            # 任务数约为进程数的 4 倍，兼顾负载均衡和进程间传输开销
+            batch_size = max(1, min(USERS_PER_TASK, -(-self.num_users // (workers * 4))))
+            batches = [user_ids[i:i + batch_size] for i in range(0, len(user_ids), batch_size)]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(_generate_user_batch, self.records_per_user,
+                                    self.random_seed, start_date, batch)
+                    for batch in batches
+                ]
+                for future in as_completed(futures):
+                    for profile, user_data in future.result():
+                        results[profile['user_id']] = (profile, user_data)
+                    if not verbose:
+                        print(f"  已生成 {len(results)}/{self.num_users} 个用户")
         
-        for i in range(1, self.num_users + 1):
-            print(f"[{i}/{self.num_users}] 生成用户 user{i:02d} 的数据...")
-            
-            # 生成用户配置
-            profile = self.generate_user_profile(i)
+        all_measurements = []
+        all_users = []
+        self.user_profiles = []
+        for user_id in user_ids:
+            profile, user_data = results[user_id]
             self.user_profiles.append(profile)
-            
-            # 生成时间序列数据
-            user_data = self.generate_time_series_for_user(profile, start_date)
             all_measurements.append(user_data)
             
             # 保存用户信息
-            user_info = {
+            all_users.append({
                 'user_id': profile['user_id'],
                 'username': profile['username'],
                 'full_name': profile['full_name'],
@@ -295,14 +321,14 @@ class PyHealthDataGenerator:
                 'blood_type': profile['blood_type'],
                 'has_hypertension': profile['has_hypertension'],
                 'has_diabetes': profile['has_diabetes'],
-            }
-            all_users.append(user_info)
+            })
             
-            print(f"  ✓ 生成 {len(user_data)} 条记录")
-            print(f"    个人信息: {profile['full_name']}, {profile['age']}岁, "
-                  f"{profile['gender']}, 血型{profile['blood_type']}")
-            print(f"    健康状况: 高血压={profile['has_hypertension']}, "
-                  f"糖尿病={profile['has_diabetes']}")
+            if verbose:
+                print(f"[{user_id}/{self.num_users}] 用户 {profile['username']}: 生成 {len(user_data)} 条记录")
+                print(f"    个人信息: {profile['full_name']}, {profile['age']}岁, "
+                      f"{profile['gender']}, 血型{profile['blood_type']}")
+                print(f"    健康状况: 高血压={profile['has_hypertension']}, "
+                      f"糖尿病={profile['has_diabetes']}")
         
         # 合并所有数据
         df_measurements = pd.concat(all_measurements, ignore_index=True)
@@ -1,23 +1,47 @@
+import argparse
 import os
 import sys
 import django
 from datetime import datetime, timedelta
 import random
-from decimal import Decimal
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'health_management_system.settings')
 django.setup()
 
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
 from users.models import Profile
 from measurements.models import Measurement, SleepLog, MoodLog
+from measurements.live_stats import rolling_statistics
+from measurements.report_cache import invalidate_user
+from measurements.services.ingest_service import upsert_measurements
+from measurements.services.snapshot_service import schedule_refresh
+from measurements.signals import measurements_bulk_created
 
 User = get_user_model()
 
+# 数据起始日期
+START_DATE = datetime(2025, 3, 1)
+# 默认天数（2025-03-01 至 2025-12-31）
+DEFAULT_DAYS = 306
+# bulk_create 每条 INSERT 的行数
+DEFAULT_BATCH_SIZE = 2000
+# 用户数不超过该值时逐个打印进度
+VERBOSE_USER_LIMIT = 20
+
 
 class HealthDataGenerator:
-    def __init__(self):
+    def __init__(self, days=DEFAULT_DAYS, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Args:
+            days: 从 START_DATE 起生成的天数
+            batch_size: bulk_create 每批写入的行数
+        """
+        self.days = days
+        self.batch_size = batch_size
         self.user_profiles = []
         self._init_user_profiles()
 
@@ -185,23 +209,67 @@ class HealthDataGenerator:
             },
         ]
 
+    def scale_profiles(self, num_users):
+        """
+        调整用户配置数量：前10个为预设用户，其余以预设用户为模板、在基础指标上随机浮动
+        """
+        templates = self.user_profiles[:10]
+        profiles = templates[:num_users]
+        for i in range(len(profiles) + 1, num_users + 1):
+            template = templates[(i - 1) % len(templates)]
+            username = f'user{i:03d}'
+            profiles.append({
+                **template,
+                'user_id': f'{i:03d}',
+                'username': username,
+                'email': f'{username}@example.com',
+                'age': max(18, min(80, template['age'] + random.randint(-5, 5))),
+                'weight_baseline_kg': round(self._generate_measurement_value(template['weight_baseline_kg'], 0.05), 1),
+                'base_systolic': round(self._generate_measurement_value(template['base_systolic'], 0.05)),
+                'base_diastolic': round(self._generate_measurement_value(template['base_diastolic'], 0.05)),
+                'base_glucose': round(self._generate_measurement_value(template['base_glucose'], 0.05), 1),
+                'base_heart_rate': round(self._generate_measurement_value(template['base_heart_rate'], 0.05)),
+            })
+        self.user_profiles = profiles
+
     def create_users(self):
         print("开始创建用户...")
-        created_users = []
         
+        # 已存在的用户名/邮箱跳过（用户名和邮箱唯一）
+        usernames = [profile['username'] for profile in self.user_profiles]
+        emails = [profile['email'] for profile in self.user_profiles]
+        existing_usernames = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        existing_emails = set(User.objects.filter(email__in=emails).values_list('email', flat=True))
+        
+        # 所有用户密码相同，只计算一次哈希
+        password = make_password('password123')
+        new_profiles = []
         for profile in self.user_profiles:
-            try:
-                user = User.objects.create_user(
+            if profile['username'] in existing_usernames or profile['email'] in existing_emails:
+                print(f"  ✗ 创建用户失败 {profile['username']}: 用户名或邮箱已存在")
+                continue
+            new_profiles.append(profile)
+        
+        with transaction.atomic():
+            User.objects.bulk_create([
+                User(
                     username=profile['username'],
                     email=profile['email'],
-                    password='password123',
+                    password=password,
                     first_name=profile['name'][0],
                     last_name=profile['name'][1:],
                     role='user'
                 )
-                
-                user_profile = Profile.objects.create(
-                    user=user,
+                for profile in new_profiles
+            ], batch_size=self.batch_size)
+            
+            # MySQL 的 bulk_create 不回填主键，按用户名重新查询
+            users_by_name = User.objects.in_bulk(
+                [profile['username'] for profile in new_profiles], field_name='username'
+            )
+            Profile.objects.bulk_create([
+                Profile(
+                    user=users_by_name[profile['username']],
                     age=profile['age'],
                     gender=profile['gender'],
                     blood_type=profile['blood_type'],
@@ -209,11 +277,16 @@ class HealthDataGenerator:
                     weight_baseline_kg=profile['weight_baseline_kg'],
                     bio=f"用户编号: {profile['user_id']}, 疾病史: {', '.join(profile['conditions'])}"
                 )
-                
-                created_users.append(user)
+                for profile in new_profiles
+            ], batch_size=self.batch_size)
+        
+        # bulk_create 不触发 post_save，手动更新实时统计中的用户数
+        rolling_statistics.adjust_total_users(len(new_profiles))
+        
+        created_users = [users_by_name[profile['username']] for profile in new_profiles]
+        if len(created_users) <= VERBOSE_USER_LIMIT:
+            for profile in new_profiles:
                 print(f"  ✓ 创建用户: {profile['name']} ({profile['username']})")
-            except Exception as e:
-                print(f"  ✗ 创建用户失败 {profile['username']}: {e}")
         
         print(f"成功创建 {len(created_users)} 个用户\n")
         return created_users
@@ -316,26 +389,25 @@ class HealthDataGenerator:
     def generate_measurements(self, users):
         print("开始生成健康测量数据...")
         
-        start_date = datetime(2025, 3, 1)
-        end_date = datetime(2025, 12, 31)
-        total_days = (end_date - start_date).days + 1
-        
         measurement_times = [
             (8, 0),    # 早上8点
             (14, 0),   # 下午2点
             (20, 0),   # 晚上8点
         ]
         
+        profiles = {profile['username']: profile for profile in self.user_profiles}
+        verbose = len(users) <= VERBOSE_USER_LIMIT
         total_measurements = 0
         
-        for user in users:
-            profile = next(p for p in self.user_profiles if p['username'] == user.username)
+        for index, user in enumerate(users, 1):
+            profile = profiles[user.username]
+            measurements = []
             
-            for day_offset in range(total_days):
-                current_date = start_date + timedelta(days=day_offset)
+            for day_offset in range(self.days):
+                current_date = START_DATE + timedelta(days=day_offset)
                 
                 for hour, minute in measurement_times:
-                    measured_at = datetime.combine(current_date, datetime.min.time()) + timedelta(hours=hour, minutes=minute)
+                    measured_at = timezone.make_aware(current_date + timedelta(hours=hour, minutes=minute))
                     time_of_day = self._get_time_of_day_factor(hour)
                     
                     weight = self._generate_weight(profile, day_offset)
@@ -343,19 +415,26 @@ class HealthDataGenerator:
                     glucose = self._generate_blood_glucose(profile, time_of_day)
                     heart_rate = self._generate_heart_rate(profile, time_of_day)
                     
-                    measurement = Measurement.objects.create(
+                    measurements.append(Measurement(
                         user=user,
                         measured_at=measured_at,
-                        weight_kg=Decimal(str(weight)),
+                        weight_kg=weight,
                         systolic=systolic,
                         diastolic=diastolic,
-                        blood_glucose=Decimal(str(glucose)),
+                        blood_glucose=glucose,
                         heart_rate=heart_rate
-                    )
-                    
-                    total_measurements += 1
+                    ))
             
-            print(f"  ✓ 生成用户 {user.username} 的测量数据")
+            # 每个用户一个事务：批量写入，并一次性更新每日汇总和评分快照
+            with transaction.atomic():
+                upsert_measurements(measurements, batch_size=self.batch_size)
+                measurements_bulk_created.send(sender=Measurement, user_id=user.id, measurements=measurements)
+            total_measurements += len(measurements)
+            
+            if verbose:
+                print(f"  ✓ 生成用户 {user.username} 的测量数据")
+            elif index % 100 == 0:
+                print(f"  ✓ 已生成 {index}/{len(users)} 个用户的测量数据")
         
         print(f"成功生成 {total_measurements} 条健康测量记录\n")
         return total_measurements
@@ -363,18 +442,16 @@ class HealthDataGenerator:
     def generate_sleep_logs(self, users):
         print("开始生成睡眠记录...")
         
-        start_date = datetime(2025, 3, 1)
-        end_date = datetime(2025, 12, 31)
-        total_days = (end_date - start_date).days + 1
-        
+        verbose = len(users) <= VERBOSE_USER_LIMIT
         total_sleep_logs = 0
         
-        for user in users:
+        for index, user in enumerate(users, 1):
             # 为每个用户设置基础睡眠时间（8-9小时）
             base_sleep_hours = random.uniform(8, 9)
+            sleep_logs = []
             
-            for day_offset in range(total_days):
-                sleep_date = start_date + timedelta(days=day_offset)
+            for day_offset in range(self.days):
+                sleep_date = START_DATE + timedelta(days=day_offset)
                 
                 # 计算睡眠时间，基础上有小波动
                 sleep_hours = base_sleep_hours + random.uniform(-0.5, 0.5)
@@ -396,7 +473,7 @@ class HealthDataGenerator:
                 # 通常在22:00-23:30之间入睡
                 sleep_hour = random.randint(22, 23)
                 sleep_minute = random.randint(0, 30)
-                start_time = datetime.combine(sleep_date, datetime.min.time()) + timedelta(hours=sleep_hour, minutes=sleep_minute)
+                start_time = timezone.make_aware(sleep_date + timedelta(hours=sleep_hour, minutes=sleep_minute))
                 
                 # 起床时间 = 入睡时间 + 睡眠时长
                 end_time = start_time + timedelta(minutes=sleep_minutes)
@@ -409,19 +486,26 @@ class HealthDataGenerator:
                 else:
                     quality_rating = random.randint(3, 5)
                 
-                # 创建睡眠记录
-                sleep_log = SleepLog.objects.create(
+                sleep_logs.append(SleepLog(
                     user=user,
                     sleep_date=sleep_date.date(),
                     start_time=start_time,
                     end_time=end_time,
                     duration_minutes=sleep_minutes,
                     quality_rating=quality_rating
-                )
-                
-                total_sleep_logs += 1
+                ))
             
-            print(f"  ✓ 生成用户 {user.username} 的睡眠记录")
+            # bulk_create 不触发 post_save，在同一事务中调度快照刷新并清除报告缓存
+            with transaction.atomic():
+                SleepLog.objects.bulk_create(sleep_logs, batch_size=self.batch_size)
+                schedule_refresh(user.id, START_DATE.date())
+                invalidate_user(user.id)
+            total_sleep_logs += len(sleep_logs)
+            
+            if verbose:
+                print(f"  ✓ 生成用户 {user.username} 的睡眠记录")
+            elif index % 100 == 0:
+                print(f"  ✓ 已生成 {index}/{len(users)} 个用户的睡眠记录")
         
         print(f"成功生成 {total_sleep_logs} 条睡眠记录\n")
         return total_sleep_logs
@@ -429,18 +513,34 @@ class HealthDataGenerator:
     def generate_mood_logs(self, users):
         print("开始生成心情记录...")
         
-        start_date = datetime(2025, 3, 1)
-        end_date = datetime(2025, 12, 31)
-        total_days = (end_date - start_date).days + 1
-        
+        end_date = START_DATE + timedelta(days=self.days - 1)
+        verbose = len(users) <= VERBOSE_USER_LIMIT
         total_mood_logs = 0
         
-        for user in users:
+        for index, user in enumerate(users, 1):
             # 为每个用户设置基础心情评分（6-8分）
             base_mood_rating = random.randint(6, 8)
             
-            for day_offset in range(total_days):
-                log_date = start_date + timedelta(days=day_offset)
+            # 一次读取前一天睡眠质量的查找表（同一天有多条时取最新的一条）
+            sleep_quality = dict(
+                SleepLog.objects.filter(
+                    user=user,
+                    sleep_date__gte=START_DATE.date(),
+                    sleep_date__lte=end_date.date()
+                ).order_by('sleep_date', 'id').values_list('sleep_date', 'quality_rating')
+            )
+            # (user, log_date) 唯一，已有记录的日期跳过
+            existing_dates = set(
+                MoodLog.objects.filter(
+                    user=user, log_date__gte=START_DATE.date(), log_date__lte=end_date.date()
+                ).values_list('log_date', flat=True)
+            )
+            mood_logs = []
+            
+            for day_offset in range(self.days):
+                log_date = START_DATE + timedelta(days=day_offset)
+                if log_date.date() in existing_dates:
+                    continue
                 
                 # 计算心情评分，基础上有小波动
                 mood_rating = base_mood_rating + random.randint(-1, 1)
@@ -460,39 +560,50 @@ class HealthDataGenerator:
                 # 检查前一天的睡眠质量，影响当天的心情
                 if day_offset > 0:
                     prev_date = log_date - timedelta(days=1)
-                    prev_sleep = SleepLog.objects.filter(
-                        user=user,
-                        sleep_date=prev_date.date()
-                    ).first()
+                    prev_quality = sleep_quality.get(prev_date.date())
                     
-                    if prev_sleep:
+                    if prev_quality is not None:
                         # 睡眠质量好，心情+1
-                        if prev_sleep.quality_rating >= 8:
+                        if prev_quality >= 8:
                             mood_rating = min(10, mood_rating + 1)
                         # 睡眠质量差，心情-1
-                        elif prev_sleep.quality_rating <= 4:
+                        elif prev_quality <= 4:
                             mood_rating = max(1, mood_rating - 1)
                 
-                # 创建心情记录
-                mood_log = MoodLog.objects.create(
+                mood_logs.append(MoodLog(
                     user=user,
                     log_date=log_date.date(),
                     mood_rating=mood_rating
-                )
-                
-                total_mood_logs += 1
+                ))
+            
+            with transaction.atomic():
+                MoodLog.objects.bulk_create(mood_logs, batch_size=self.batch_size)
+                schedule_refresh(user.id, START_DATE.date())
+                invalidate_user(user.id)
+            total_mood_logs += len(mood_logs)
             
-            print(f"  ✓ 生成用户 {user.username} 的心情记录")
+            if verbose:
+                print(f"  ✓ 生成用户 {user.username} 的心情记录")
+            elif index % 100 == 0:
+                print(f"  ✓ 已生成 {index}/{len(users)} 个用户的心情记录")
         
         print(f"成功生成 {total_mood_logs} 条心情记录\n")
         return total_mood_logs
 
-    def generate_all_data(self):
+    def generate_all_data(self, num_users=10):
+        """
+        创建用户并生成测量、睡眠和心情记录
+
+        Args:
+            num_users: 用户数量，超过10个时以预设用户为模板生成
+        """
         print("=" * 60)
         print("健康数据生成器")
         print("=" * 60)
+        print(f"用户数: {num_users}, 天数: {self.days}, 批量大小: {self.batch_size}")
         print()
         
+        self.scale_profiles(num_users)
         users = self.create_users()
         if not users:
             print("错误：未能创建用户")
@@ -520,7 +631,7 @@ class HealthDataGenerator:
         print()
         
         # 获取所有现有用户
-        users = User.objects.filter(role='user')
+        users = list(User.objects.filter(role='user'))
         if not users:
             print("错误：未找到用户，请先运行完整的数据生成")
             return
@@ -540,6 +651,20 @@ class HealthDataGenerator:
 
 
 if __name__ == '__main__':
-    generator = HealthDataGenerator()
-    # 只生成睡眠和心情记录
-    generator.generate_only_sleep_and_mood()
+    parser = argparse.ArgumentParser(description='生成模拟健康数据')
+    parser.add_argument('--full', action='store_true',
+                        help='创建用户并生成测量、睡眠和心情记录（默认只为现有用户生成睡眠和心情记录）')
+    parser.add_argument('--users', type=int, default=10,
+                        help='--full 时创建的用户数量 (默认: 10)')
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS,
+                        help=f'从 {START_DATE.date()} 起生成的天数 (默认: {DEFAULT_DAYS})')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'bulk_create 每批写入的行数 (默认: {DEFAULT_BATCH_SIZE})')
+    args = parser.parse_args()
+    
+    generator = HealthDataGenerator(days=args.days, batch_size=args.batch_size)
+    if args.full:
+        generator.generate_all_data(num_users=args.users)
+    else:
+        # 只生成睡眠和心情记录
+        generator.generate_only_sleep_and_mood()
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Measurement, MedicationRecord, SleepLog, MoodLog
+from .models import Measurement, MedicationRecord, SleepLog, MoodLog, HealthScoreSnapshot, MeasurementDaily
 
 
 @admin.register(Measurement)
@@ -48,3 +48,21 @@ class MoodLogAdmin(admin.ModelAdmin):
     search_fields = ('user__username', 'notes')
     date_hierarchy = 'log_date'
     ordering = ('-log_date',)
+
+
+@admin.register(HealthScoreSnapshot)
+class HealthScoreSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('user', 'snapshot_date', 'evaluation_period_days', 'overall_score', 'overall_status')
+    list_filter = ('overall_status', 'snapshot_date')
+    search_fields = ('user__username',)
+    date_hierarchy = 'snapshot_date'
+    ordering = ('-snapshot_date',)
+
+
+@admin.register(MeasurementDaily)
+class MeasurementDailyAdmin(admin.ModelAdmin):
+    list_display = ('user', 'date', 'measurement_count', 'systolic_count', 'heart_rate_count', 'updated_at')
+    list_filter = ('date',)
+    search_fields = ('user__username',)
+    date_hierarchy = 'date'
+    ordering = ('-date',)
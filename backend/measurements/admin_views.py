@@ -1,19 +1,123 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework import permissions
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from django.contrib.auth import get_user_model
-from django.db.models import Q, Count, Avg, Max, Min, StdDev
-from .models import Measurement
+from django.db import transaction
+from django.db.models import Q, OuterRef, Subquery
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Measurement, MeasurementDaily
+from .services.rollup_service import ROLLUP_METRICS, metric_summary_by_user
+from .views import build_health_statistics
 from datetime import datetime, timedelta
+import csv
+import json
+import numpy as np
 
 User = get_user_model()
 
+# 流式导出每批读取的行数
+EXPORT_CHUNK_SIZE = 2000
+
+MEASUREMENT_EXPORT_FIELDS = [
+    'id', 'user_id', 'username', 'user_role', 'measured_at',
+    'weight_kg', 'systolic', 'diastolic', 'heart_rate', 'blood_glucose',
+]
+
+
+def _measurement_row(measurement):
+    """单条测量记录的导出字段（user 需已 select_related）"""
+    return {
+        'id': measurement.id,
+        'user_id': measurement.user_id,
+        'username': measurement.user.username,
+        'user_role': measurement.user.role,
+        'measured_at': measurement.measured_at,
+        'weight_kg': float(measurement.weight_kg) if measurement.weight_kg is not None else None,
+        'systolic': measurement.systolic,
+        'diastolic': measurement.diastolic,
+        'heart_rate': measurement.heart_rate,
+        'blood_glucose': float(measurement.blood_glucose) if measurement.blood_glucose is not None else None,
+    }
+
+
+def _iter_measurements(measurements, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    按 (user_id, -measured_at, -id) 分批读取测量记录
+
+    每批以上一批最后一行为游标做 keyset 查询，内存占用与总行数无关。
+    MySQL 驱动会把整个结果集缓存在客户端，单独使用 .iterator() 并不能流式读取，因此分批查询。
+    """
+    measurements = measurements.select_related('user').only(
+        'id', 'user_id', 'measured_at', 'weight_kg', 'systolic', 'diastolic',
+        'heart_rate', 'blood_glucose', 'user__username', 'user__role'
+    ).order_by('user_id', '-measured_at', '-id')
+
+    last = None
+    while True:
+        batch = measurements
+        if last is not None:
+            batch = batch.filter(
+                Q(user_id__gt=last.user_id)
+                | Q(user_id=last.user_id, measured_at__lt=last.measured_at)
+                | Q(user_id=last.user_id, measured_at=last.measured_at, id__lt=last.id)
+            )
+        rows = list(batch[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1]
+
+
+class _Echo:
+    """csv.writer 的伪文件对象：write 直接返回写入的内容"""
+
+    def write(self, value):
+        return value
+
+
+def _stream_measurements(measurements, stream_format):
+    """NDJSON / CSV 流式响应"""
+    filename = f"measurements_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+    if stream_format == 'csv':
+        writer = csv.writer(_Echo())
+
+        def generate():
+            # BOM 便于 Excel 正确识别中文
+            yield '\ufeff' + writer.writerow(MEASUREMENT_EXPORT_FIELDS)
+            for measurement in _iter_measurements(measurements):
+                row = _measurement_row(measurement)
+                row['measured_at'] = row['measured_at'].isoformat()
+                yield writer.writerow(['' if row[field] is None else row[field] for field in MEASUREMENT_EXPORT_FIELDS])
+
+        response = StreamingHttpResponse(generate(), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    else:
+        def generate():
+            for measurement in _iter_measurements(measurements):
+                row = _measurement_row(measurement)
+                row['measured_at'] = row['measured_at'].isoformat()
+                yield json.dumps(row, ensure_ascii=False) + '\n'
+
+        response = StreamingHttpResponse(generate(), content_type='application/x-ndjson; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.ndjson"'
+
+    # 禁止反向代理缓冲，尽快输出首字节
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def all_measurements(request):
     """
     获取所有用户的测量数据（医生和管理员专用）
+    查询参数:
+    - user_id / start_date / end_date: 过滤条件
+    - stream: ndjson 或 csv 时以流式响应导出（内存占用恒定，适合大数据量），默认返回 JSON
     """
     user = request.user
     
@@ -26,6 +130,10 @@ def all_measurements(request):
     metric_type = request.query_params.get('metric_type', None)
     start_date = request.query_params.get('start_date', None)
     end_date = request.query_params.get('end_date', None)
+    stream_format = request.query_params.get('stream', None)
+    
+    if stream_format and stream_format not in ('ndjson', 'csv'):
+        return Response({'error': 'stream 只能是 ndjson 或 csv'}, status=400)
     
     # 构建查询
     measurements = Measurement.objects.all()
@@ -39,24 +147,14 @@ def all_measurements(request):
     if end_date:
         measurements = measurements.filter(measured_at__lte=end_date)
     
+    if stream_format:
+        return _stream_measurements(measurements, stream_format)
+    
     # 按用户和时间排序
-    measurements = measurements.order_by('user_id', '-measured_at')
+    measurements = measurements.select_related('user').order_by('user_id', '-measured_at')
     
     # 序列化数据
-    data = []
-    for measurement in measurements:
-        data.append({
-            'id': measurement.id,
-            'user_id': measurement.user_id,
-            'username': measurement.user.username,
-            'user_role': measurement.user.role,
-            'measured_at': measurement.measured_at,
-            'weight_kg': float(measurement.weight_kg),
-            'systolic': measurement.systolic,
-            'diastolic': measurement.diastolic,
-            'heart_rate': measurement.heart_rate,
-            'blood_glucose': float(measurement.blood_glucose),
-        })
+    data = [_measurement_row(measurement) for measurement in measurements]
     
     return Response({
         'count': len(data),
@@ -76,56 +174,35 @@ def health_statistics_all(request):
     if not (user.is_admin_user or user.is_doctor_user):
         return Response({'error': '权限不足'}, status=403)
     
-    # 获取所有用户的统计数据
-    users_stats = []
+    # 获取所有用户的统计数据：按用户分组读取每日汇总，最新测量通过子查询批量获取
+    summaries = metric_summary_by_user(MeasurementDaily.objects.all())
+    users = User.objects.filter(id__in=MeasurementDaily.objects.values('user_id')).annotate(
+        latest_measurement_id=Subquery(
+            Measurement.objects.filter(user_id=OuterRef('pk')).order_by('-measured_at').values('pk')[:1]
+        )
+    ).order_by('id')
+    users = list(users)
+    latest_measurements = Measurement.objects.in_bulk([u.latest_measurement_id for u in users])
     
-    for user_obj in User.objects.all():
-        measurements = Measurement.objects.filter(user=user_obj)
+    users_stats = []
+    for user_obj in users:
+        latest = latest_measurements.get(user_obj.latest_measurement_id)
+        if latest is None or user_obj.id not in summaries:
+            continue
+        summary = summaries[user_obj.id]
+        stats = {
+            'user_id': user_obj.id,
+            'username': user_obj.username,
+            'user_role': user_obj.role,
+            'total_measurements': summary['measurement_count'],
+            'latest_measurement': latest.measured_at,
+            **build_health_statistics(summary, latest)
+        }
         
-        if measurements.exists():
-            stats = {
-                'user_id': user_obj.id,
-                'username': user_obj.username,
-                'user_role': user_obj.role,
-                'total_measurements': measurements.count(),
-                'latest_measurement': measurements.latest('measured_at').measured_at,
-                'weight': {
-                    'latest': float(measurements.latest('measured_at').weight_kg),
-                    'average': float(measurements.aggregate(Avg('weight_kg'))['weight_kg__avg']),
-                    'max': float(measurements.aggregate(Max('weight_kg'))['weight_kg__max']),
-                    'min': float(measurements.aggregate(Min('weight_kg'))['weight_kg__min']),
-                    'std_dev': float(measurements.aggregate(StdDev('weight_kg'))['weight_kg__stddev'] or 0)
-                },
-                'blood_pressure': {
-                    'latest_systolic': int(measurements.latest('measured_at').systolic),
-                    'latest_diastolic': int(measurements.latest('measured_at').diastolic),
-                    'avg_systolic': float(measurements.aggregate(Avg('systolic'))['systolic__avg']),
-                    'avg_diastolic': float(measurements.aggregate(Avg('diastolic'))['diastolic__avg']),
-                    'max_systolic': int(measurements.aggregate(Max('systolic'))['systolic__max']),
-                    'max_diastolic': int(measurements.aggregate(Max('diastolic'))['diastolic__max']),
-                    'min_systolic': int(measurements.aggregate(Min('systolic'))['systolic__min']),
-                    'min_diastolic': int(measurements.aggregate(Min('diastolic'))['diastolic__min'])
-                },
-                'heart_rate': {
-                    'latest': int(measurements.latest('measured_at').heart_rate),
-                    'average': float(measurements.aggregate(Avg('heart_rate'))['heart_rate__avg']),
-                    'max': int(measurements.aggregate(Max('heart_rate'))['heart_rate__max']),
-                    'min': int(measurements.aggregate(Min('heart_rate'))['heart_rate__min']),
-                    'std_dev': float(measurements.aggregate(StdDev('heart_rate'))['heart_rate__stddev'] or 0)
-                },
-                'blood_glucose': {
-                    'latest': float(measurements.latest('measured_at').blood_glucose),
-                    'average': float(measurements.aggregate(Avg('blood_glucose'))['blood_glucose__avg']),
-                    'max': float(measurements.aggregate(Max('blood_glucose'))['blood_glucose__max']),
-                    'min': float(measurements.aggregate(Min('blood_glucose'))['blood_glucose__min']),
-                    'std_dev': float(measurements.aggregate(StdDev('blood_glucose'))['blood_glucose__stddev'] or 0)
-                }
-            }
-            
-            # 添加健康状态评估
-            stats['health_status'] = assess_health_status(stats)
-            
-            users_stats.append(stats)
+        # 添加健康状态评估
+        stats['health_status'] = assess_health_status(stats)
+        
+        users_stats.append(stats)
     
     return Response({
         'total_users': len(users_stats),
@@ -266,52 +343,219 @@ def health_alerts_all(request):
     })
 
 
+def _least_squares_trends(groups, x, y, counts, sums, n_groups):
+    """
+    按用户向量化计算最小二乘斜率
+
+    Args:
+        groups: 每行所属用户的下标（行按用户、日期排序）
+        x: 日期偏移（天）
+        y: 当天均值
+        counts / sums: 当天读数个数和总和
+        n_groups: 用户数
+
+    Returns:
+        (斜率, 最新日均值, 读数均值, 读数个数)；少于两天数据的用户斜率为 NaN
+    """
+    n = np.bincount(groups, minlength=n_groups).astype(float)
+    sx = np.bincount(groups, weights=x, minlength=n_groups)
+    sy = np.bincount(groups, weights=y, minlength=n_groups)
+    sxx = np.bincount(groups, weights=x * x, minlength=n_groups)
+    sxy = np.bincount(groups, weights=x * y, minlength=n_groups)
+    denominator = n * sxx - sx * sx
+
+    latest = np.full(n_groups, np.nan)
+    if len(groups):
+        last_rows = np.flatnonzero(np.r_[groups[1:] != groups[:-1], True])
+        latest[groups[last_rows]] = y[last_rows]
+
+    total_count = np.bincount(groups, weights=counts, minlength=n_groups)
+    total_sum = np.bincount(groups, weights=sums, minlength=n_groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where((n >= 2) & (denominator > 0), (n * sxy - sx * sy) / denominator, np.nan)
+        average = total_sum / total_count
+    return slope, latest, average, total_count
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def health_trends_analysis(request):
     """
     健康趋势分析（医生和管理员专用）
+    查询参数:
+    - days: 时间窗口（默认 30）
+    - users: 只分析指定用户，逗号分隔的用户ID或用户名
+    - page / page_size: 按用户名分页（默认每页 50，最多 200）；不传时返回全部用户
+
+    trend 为每日均值对日期的最小二乘斜率（每天变化量），latest 为最近一天的均值。
     """
+    from django.core.paginator import Paginator
+
     user = request.user
     
     # 检查权限
     if not (user.is_admin_user or user.is_doctor_user):
         return Response({'error': '权限不足'}, status=403)
     
-    # 获取时间范围
-    days = int(request.query_params.get('days', 30))
-    start_date = datetime.now() - timedelta(days=days)
+    try:
+        days = int(request.query_params.get('days', 30))
+        page_size = min(int(request.query_params.get('page_size', 50)), 200)
+    except ValueError:
+        return Response({'error': 'days 和 page_size 必须是整数'}, status=400)
+    if days < 1 or page_size < 1:
+        return Response({'error': 'days 和 page_size 必须大于 0'}, status=400)
+    
+    # 获取时间范围（按本地日期，读取每日汇总）
+    start_date = timezone.localdate() - timedelta(days=days)
+    daily = MeasurementDaily.objects.filter(date__gte=start_date)
+    
+    # 窗口内有数据的用户（可按 users 过滤），按用户名排序后分页
+    users = User.objects.filter(id__in=daily.values('user_id'))
+    selected = [item.strip() for item in request.query_params.get('users', '').split(',') if item.strip()]
+    if selected:
+        ids = [int(item) for item in selected if item.isdigit()]
+        users = users.filter(Q(id__in=ids) | Q(username__in=selected))
+    users = users.order_by('username').values_list('id', 'username')
+    
+    paginate = 'page' in request.query_params or 'page_size' in request.query_params
+    if paginate:
+        paginator = Paginator(users, page_size)
+        page_obj = paginator.get_page(request.query_params.get('page', 1))
+        user_rows = list(page_obj)
+        daily = daily.filter(user_id__in=[user_id for user_id, _ in user_rows])
+    else:
+        user_rows = list(users)
+        if selected:
+            daily = daily.filter(user_id__in=[user_id for user_id, _ in user_rows])
+    
+    # 一条查询取出所有指标的每日计数和总和
+    fields = []
+    for metric in ROLLUP_METRICS:
+        fields += [f'{metric}_count', f'{metric}_sum']
+    rows = list(daily.order_by('user_id', 'date').values_list('user_id', 'date', *fields))
+    
+    user_ids = np.array(sorted(user_id for user_id, _ in user_rows), dtype=np.int64)
+    usernames = dict(user_rows)
+    if rows:
+        row_users = np.array([row[0] for row in rows], dtype=np.int64)
+        values = np.array([row[2:] for row in rows], dtype=float)
+        offsets = (
+            np.array([row[1] for row in rows], dtype='datetime64[D]') - np.datetime64(start_date, 'D')
+        ).astype(float)
+        known = np.isin(row_users, user_ids)
+        row_users, values, offsets = row_users[known], values[known], offsets[known]
+    else:
+        row_users, values, offsets = np.zeros(0, dtype=np.int64), np.zeros((0, len(fields))), np.zeros(0)
+    groups = np.searchsorted(user_ids, row_users)
     
-    # 获取所有用户的趋势数据
     trends_data = {}
+    for i, metric in enumerate(ROLLUP_METRICS):
+        counts, sums = values[:, 2 * i], values[:, 2 * i + 1]
+        present = counts > 0
+        slope, latest, average, total = _least_squares_trends(
+            groups[present], offsets[present], sums[present] / counts[present],
+            counts[present], sums[present], len(user_ids)
+        )
+        # 至少两天的数据才计算趋势
+        trends_data[metric] = {
+            usernames[int(user_ids[k])]: {
+                'trend': float(slope[k]),
+                'latest': float(latest[k]),
+                'average': float(average[k]),
+                'count': int(total[k])
+            }
+            for k in sorted(np.flatnonzero(~np.isnan(slope)), key=lambda k: usernames[int(user_ids[k])])
+        }
     
-    for metric in ['weight_kg', 'systolic', 'diastolic', 'heart_rate', 'blood_glucose']:
-        measurements = Measurement.objects.filter(
-            measured_at__gte=start_date
-        ).values('user__username', metric).order_by('measured_at')
-        
-        # 按用户分组
-        user_data = {}
-        for measurement in measurements:
-            username = measurement['user__username']
-            if username not in user_data:
-                user_data[username] = []
-            user_data[username].append(float(measurement[metric]))
-        
-        # 计算趋势
-        trends_data[metric] = {}
-        for username, values in user_data.items():
-            if len(values) >= 2:
-                # 简单线性趋势
-                trend = (values[-1] - values[0]) / len(values)
-                trends_data[metric][username] = {
-                    'trend': trend,
-                    'latest': values[-1],
-                    'average': sum(values) / len(values),
-                    'count': len(values)
-                }
-    
-    return Response(trends_data)
+    if not paginate:
+        return Response(trends_data)
+    
+    next_link, previous_link = _page_links(request, page_obj)
+    return Response({
+        'results': trends_data,
+        'count': paginator.count,
+        'page': page_obj.number,
+        'num_pages': paginator.num_pages,
+        'days': days,
+        'next': next_link,
+        'previous': previous_link,
+    })
+
+
+def _page_links(request, page_obj):
+    """上一页/下一页链接：保留当前请求的其他查询参数（order、days、page_size、users 等），只替换 page"""
+    url = request.build_absolute_uri()
+    next_link = replace_query_param(url, 'page', page_obj.next_page_number()) if page_obj.has_next() else None
+    previous_link = (
+        replace_query_param(url, 'page', page_obj.previous_page_number()) if page_obj.has_previous() else None
+    )
+    return next_link, previous_link
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def population_health_scores(request):
+    """
+    全体用户健康评分排名（医生和管理员专用）
+    查询参数:
+    - days: 评估时间窗口（默认 30）
+    - order: asc（默认，评分最低的在前）或 desc
+    - page / page_size: 分页（默认每页 20，最多 200）
+    """
+    from django.core.paginator import Paginator
+    from .population_scoring import PopulationHealthScorer
+
+    user = request.user
+
+    # 检查权限
+    if not (user.is_admin_user or user.is_doctor_user):
+        return Response({'error': '权限不足'}, status=403)
+
+    try:
+        days = int(request.query_params.get('days', 30))
+        page_size = min(int(request.query_params.get('page_size', 20)), 200)
+    except ValueError:
+        return Response({'error': 'days 和 page_size 必须是整数'}, status=400)
+    if days < 1 or page_size < 1:
+        return Response({'error': 'days 和 page_size 必须大于 0'}, status=400)
+
+    order = request.query_params.get('order', 'asc')
+    if order not in ('asc', 'desc'):
+        return Response({'error': 'order 只能是 asc 或 desc'}, status=400)
+
+    # 整体向量化评分后排序，只为当前页构建结果
+    ranking = PopulationHealthScorer(days=days).rank(descending=(order == 'desc'))
+    paginator = Paginator(ranking, page_size)
+    page_obj = paginator.get_page(request.query_params.get('page', 1))
+    next_link, previous_link = _page_links(request, page_obj)
+
+    return Response({
+        'results': list(page_obj),
+        'count': paginator.count,
+        'page': page_obj.number,
+        'num_pages': paginator.num_pages,
+        'evaluation_period_days': days,
+        'next': next_link,
+        'previous': previous_link,
+    })
+
+
+def _parse_measured_at(value, default):
+    """
+    请求中的 measured_at（ISO 字符串或 datetime）-> 带时区的 datetime
+
+    不带时区时按当前时区解释；未提供时返回 default。
+    """
+    if value in (None, ''):
+        return default
+    if isinstance(value, str):
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(f'无效的测量时间: {value}')
+        value = parsed
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
 
 
 @api_view(['POST', 'PUT', 'DELETE'])
@@ -331,15 +575,18 @@ def measurement_management(request, measurement_id=None):
         data = request.data
         try:
             user_obj = User.objects.get(id=data['user_id'])
-            measurement = Measurement.objects.create(
-                user=user_obj,
-                weight_kg=data['weight_kg'],
-                systolic=data['systolic'],
-                diastolic=data['diastolic'],
-                heart_rate=data['heart_rate'],
-                blood_glucose=data['blood_glucose'],
-                measured_at=data.get('measured_at', datetime.now())
-            )
+            measured_at = _parse_measured_at(data.get('measured_at'), timezone.now())
+            # 信号中的汇总/快照更新失败时测量记录一并回滚
+            with transaction.atomic():
+                measurement = Measurement.objects.create(
+                    user=user_obj,
+                    weight_kg=data['weight_kg'],
+                    systolic=data['systolic'],
+                    diastolic=data['diastolic'],
+                    heart_rate=data['heart_rate'],
+                    blood_glucose=data['blood_glucose'],
+                    measured_at=measured_at
+                )
             return Response({'id': measurement.id, 'message': '创建成功'})
         except Exception as e:
             return Response({'error': str(e)}, status=400)
@@ -355,9 +602,10 @@ def measurement_management(request, measurement_id=None):
             measurement.diastolic = data.get('diastolic', measurement.diastolic)
             measurement.heart_rate = data.get('heart_rate', measurement.heart_rate)
             measurement.blood_glucose = data.get('blood_glucose', measurement.blood_glucose)
-            measurement.measured_at = data.get('measured_at', measurement.measured_at)
+            measurement.measured_at = _parse_measured_at(data.get('measured_at'), measurement.measured_at)
             
-            measurement.save()
+            with transaction.atomic():
+                measurement.save()
             return Response({'message': '更新成功'})
         except Measurement.DoesNotExist:
             return Response({'error': '测量数据不存在'}, status=404)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MeasurementsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'measurements'
+
+    def ready(self):
+        # 注册信号处理（增量统计等）
+        from . import signals  # noqa: F401
@@ -8,7 +8,6 @@ from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
 from datetime import datetime, timedelta
-from django.db.models import Count, Avg
 
 User = get_user_model()
 
@@ -106,39 +105,10 @@ class AdminStreamConsumer(AsyncWebsocketConsumer):
     
     @database_sync_to_async
     def get_system_statistics(self):
-        """获取系统统计数据"""
-        from .models import Measurement, MedicationRecord, SleepLog, MoodLog
+        """获取系统统计数据（读取内存中的滚动统计，首次或定期重建时才访问数据库）"""
+        from .live_stats import rolling_statistics
         
-        # 活跃用户数（最近24小时有记录的用户）
-        day_ago = datetime.now() - timedelta(days=1)
-        active_users = Measurement.objects.filter(
-            measured_at__gte=day_ago
-        ).values('user').distinct().count()
-        
-        # 总用户数
-        total_users = User.objects.filter(role='user').count()
-        
-        # 今日新增测量记录
-        today = datetime.now().date()
-        today_measurements = Measurement.objects.filter(
-            measured_at__date=today
-        ).count()
-        
-        # 平均健康评分（简化版本）
-        recent_measurements = Measurement.objects.filter(
-            measured_at__gte=day_ago
-        )
-        
-        avg_systolic = recent_measurements.aggregate(Avg('systolic'))['systolic__avg'] or 0
-        avg_heart_rate = recent_measurements.aggregate(Avg('heart_rate'))['heart_rate__avg'] or 0
-        
-        return {
-            'active_users': active_users,
-            'total_users': total_users,
-            'today_measurements': today_measurements,
-            'avg_systolic': round(avg_systolic, 1),
-            'avg_heart_rate': round(avg_heart_rate, 1),
-        }
+        return rolling_statistics.snapshot()
     
     @database_sync_to_async
     def get_health_alerts(self):
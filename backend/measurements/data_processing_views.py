@@ -453,19 +453,7 @@ class DataProcessingViewSet(viewsets.ViewSet):
                     total_removed += 1
                     all_details.append("删除空记录")
         
-        # 2. 删除重复记录
-        measurements = Measurement.objects.filter(user=user).order_by('measured_at')
-        seen = set()
-        
-        for measurement in measurements:
-            key = (measurement.measured_at, measurement.weight_kg, measurement.systolic, measurement.diastolic)
-            
-            if key in seen:
-                measurement.delete()
-                total_removed += 1
-                all_details.append(f"删除重复记录: {measurement.measured_at}")
-            else:
-                seen.add(key)
+        # 2. 重复记录：(user, measured_at) 有唯一约束，写入时即 upsert，无需再扫描删除
         
         # 3. 修复缺失值
         measurements = Measurement.objects.filter(user=user)
@@ -707,25 +695,14 @@ class DataProcessingViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['post'])
     def remove_duplicates(self, request):
         """删除重复记录"""
-        user = request.user
         data_type = request.data.get('type', 'measurements')
         
         duplicates_removed = 0
         details = []
         
         if data_type == 'measurements':
-            measurements = Measurement.objects.filter(user=user).order_by('measured_at')
-            seen = set()
-            
-            for measurement in measurements:
-                key = (measurement.measured_at, measurement.weight_kg, measurement.systolic, measurement.diastolic)
-                
-                if key in seen:
-                    measurement.delete()
-                    duplicates_removed += 1
-                    details.append(f"删除重复记录: {measurement.measured_at}")
-                else:
-                    seen.add(key)
+            # (user, measured_at) 有唯一约束，写入时即 upsert，数据库中不会存在重复的测量记录
+            details.append('测量记录由唯一约束保证不重复，无需清理')
         
         return Response({
             'message': f'删除了 {duplicates_removed} 条重复记录',
@@ -57,12 +57,9 @@ def forecast_metric(user_id: int, metric: str, horizon: int = 30) -> Dict:
     if not 1 <= horizon <= 90:
         raise ValueError(f"Horizon must be between 1 and 90 days, got {horizon}")
     
-    # Import Measurement model here to avoid circular imports
-    from measurements.models import Measurement
-    
     # Fetch historical data
     try:
-        historical_data = _fetch_historical_data(user_id, metric, Measurement)
+        historical_data = _fetch_historical_data(user_id, metric)
     except Exception as e:
         logger.error(f"Error fetching historical data for user {user_id}, metric {metric}: {e}")
         raise RuntimeError(f"Failed to fetch historical data: {e}")
@@ -143,45 +140,31 @@ def forecast_metric(user_id: int, metric: str, horizon: int = 30) -> Dict:
         raise RuntimeError(f"Forecasting failed: {e}")
 
 
-def _fetch_historical_data(user_id: int, metric: str, Measurement) -> pd.DataFrame:
+def _fetch_historical_data(user_id: int, metric: str) -> pd.DataFrame:
     """
     Fetch and prepare historical measurement data for forecasting.
     
+    Reads the daily rollup (MeasurementDaily), so the cost grows with the
+    number of days rather than the number of raw readings.
+    
     Args:
         user_id: User ID
         metric: Metric field name
-        Measurement: Measurement model class
     
     Returns:
-        DataFrame with 'date' and 'value' columns, sorted by date
+        DataFrame with 'date' and 'value' columns (daily mean), sorted by date
     """
-    # Build query to get measurements with non-null values for the metric
-    filter_kwargs = {f'{metric}__isnull': False}
-    
-    measurements = Measurement.objects.filter(
-        user_id=user_id,
-        **filter_kwargs
-    ).order_by('measured_at').values('measured_at', metric)
-    
-    # Convert to DataFrame
-    df = pd.DataFrame(list(measurements))
+    # Import rollup service here to avoid circular imports
+    from measurements.services.rollup_service import daily_series
     
-    if df.empty:
-        return df
+    series = daily_series(user_id, metric)
+    if not series:
+        return pd.DataFrame()
     
-    # Rename columns for consistency
-    df.columns = ['date', 'value']
-    
-    # Convert to appropriate types
-    df['date'] = pd.to_datetime(df['date'])
-    df['value'] = pd.to_numeric(df['value'], errors='coerce')
-    
-    # Remove any NaN values that might have crept in
-    df = df.dropna()
-    
-    # Aggregate multiple measurements on the same day (take mean)
-    df = df.groupby(df['date'].dt.date).agg({'value': 'mean'}).reset_index()
-    df['date'] = pd.to_datetime(df['date'])
+    df = pd.DataFrame({
+        'date': pd.to_datetime([day['date'] for day in series]),
+        'value': [day['avg'] for day in series],
+    })
     
     return df
 
@@ -592,10 +575,8 @@ def validate_forecast_quality(user_id: int, metric: str, test_days: int = 7) ->
     Returns:
         Dictionary with validation metrics (MAE, RMSE, MAPE)
     """
-    from measurements.models import Measurement
-    
     # Fetch all historical data
-    df = _fetch_historical_data(user_id, metric, Measurement)
+    df = _fetch_historical_data(user_id, metric)
     
     if len(df) < test_days + 5:
         raise RuntimeError(f"Insufficient data for validation (need at least {test_days + 5} points)")
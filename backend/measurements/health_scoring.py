@@ -6,7 +6,7 @@ Returns normalized scores (0-100) for various health indicators plus an overall
 
 import numpy as np
 from typing import Dict, List, Tuple, Optional
-from datetime import timedelta
+from datetime import date, datetime, time, timedelta
 from django.utils import timezone  # 使用 timezone 而不是 datetime
 from django.contrib.auth import get_user_model
 from measurements.models import Measurement, SleepLog, MoodLog
@@ -75,18 +75,22 @@ class HealthScoringService:
     Service for calculating health scores based on user measurements.
     """
     
-    def __init__(self, user_id: int, days: int = 30):
+    def __init__(self, user_id: int, days: int = 30, as_of: Optional[date] = None):
         """
         Initialize scoring service for a user.
         
         Args:
             user_id: User ID to score
             days: Number of days to consider for scoring (default: 30)
+            as_of: Score the window ending with this day instead of now
+                   (used to build historical snapshots)
         """
         self.user_id = user_id
         self.days = days
-        self.user = User.objects.get(id=user_id)
+        self.as_of = as_of
+        self.user = User.objects.select_related('profile').get(id=user_id)
         self.config = HealthScoringConfig()
+        self._window = None
         
     def calculate_bmi(self, weight_kg: float, height_cm: float) -> float:
         """Calculate BMI from weight and height."""
@@ -135,17 +139,73 @@ class HealthScoringService:
             ratio = min(distance / range_width, 1.0)
             return max(60.0 - ratio * 60.0, 0.0)
     
+    def get_window_end(self) -> datetime:
+        """End of the scoring window: now, or the end of the as_of day."""
+        if self.as_of is None:
+            return timezone.now()
+        return timezone.make_aware(datetime.combine(self.as_of + timedelta(days=1), time.min))
+
     def get_recent_measurements(self) -> List[Measurement]:
         """Get recent measurements for the user."""
-        start_date = timezone.now() - timedelta(days=self.days)
-        return Measurement.objects.filter(
+        end = self.get_window_end()
+        measurements = Measurement.objects.filter(
             user_id=self.user_id,
-            measured_at__gte=start_date
-        ).order_by('-measured_at')
+            measured_at__gte=end - timedelta(days=self.days)
+        )
+        if self.as_of is not None:
+            measurements = measurements.filter(measured_at__lt=end)
+        return measurements.order_by('-measured_at')
     
+    def _load_window(self) -> Dict[str, np.ndarray]:
+        """
+        Load the scoring window once into arrays.
+
+        One query each for measurements, sleep logs and mood logs; every
+        dimension is then scored from memory. Measurement columns are
+        float arrays ordered newest first, with NaN for missing values.
+        """
+        if self._window is not None:
+            return self._window
+
+        columns = ('weight_kg', 'systolic', 'diastolic', 'blood_glucose', 'heart_rate')
+        rows = list(self.get_recent_measurements().values_list(*columns))
+        window = {
+            column: np.array(
+                [np.nan if row[i] is None else float(row[i]) for row in rows],
+                dtype=float
+            )
+            for i, column in enumerate(columns)
+        }
+
+        # 将 datetime 转换为 date 类型
+        start_date = (self.get_window_end() - timedelta(days=self.days)).date()
+        sleep_logs = SleepLog.objects.filter(user_id=self.user_id, sleep_date__gte=start_date)
+        mood_logs = MoodLog.objects.filter(user_id=self.user_id, log_date__gte=start_date)
+        if self.as_of is not None:
+            sleep_logs = sleep_logs.filter(sleep_date__lte=self.as_of)
+            mood_logs = mood_logs.filter(log_date__lte=self.as_of)
+
+        window['sleep_hours'] = np.array([
+            minutes / 60.0
+            for minutes in sleep_logs.values_list('duration_minutes', flat=True)[:14]  # Last 2 weeks
+        ], dtype=float)
+        window['mood_rating'] = np.array(list(
+            mood_logs.values_list('mood_rating', flat=True)[:14]  # Last 2 weeks
+        ), dtype=float)
+
+        self._window = window
+        return window
+
+    def _latest_values(self, *columns: str, limit: Optional[int] = None) -> List[np.ndarray]:
+        """Most recent rows where all given columns are present, newest first."""
+        window = self._load_window()
+        present = np.ones(len(window[columns[0]]), dtype=bool)
+        for column in columns:
+            present &= ~np.isnan(window[column])
+        return [window[column][present][:limit] for column in columns]
+
     def score_bmi(self) -> Dict:
         """Score BMI based on recent measurements and profile."""
-        measurements = self.get_recent_measurements()
         profile = getattr(self.user, 'profile', None)
         
         if not profile or not profile.height_cm:
@@ -158,8 +218,8 @@ class HealthScoringService:
             }
         
         # Get latest weight
-        weight_measurement = measurements.filter(weight_kg__isnull=False).first()
-        if not weight_measurement:
+        weights, = self._latest_values('weight_kg', limit=1)
+        if not weights.size:
             return {
                 'score': None,
                 'value': None,
@@ -168,7 +228,7 @@ class HealthScoringService:
                 'suggestions': ['请记录您的体重数据']
             }
         
-        bmi = self.calculate_bmi(float(weight_measurement.weight_kg), float(profile.height_cm))
+        bmi = self.calculate_bmi(float(weights[0]), float(profile.height_cm))
         config = self.config.METRICS['bmi']
         score = self.score_metric_in_range(bmi, config['optimal_range'], config['acceptable_range'])
         
@@ -185,13 +245,11 @@ class HealthScoringService:
     
     def score_blood_pressure(self) -> Dict:
         """Score blood pressure based on recent measurements."""
-        measurements = self.get_recent_measurements()
-        bp_measurements = measurements.filter(
-            systolic__isnull=False, 
-            diastolic__isnull=False
-        )[:10]  # Last 10 measurements
+        systolic, diastolic = self._latest_values(
+            'systolic', 'diastolic', limit=10
+        )  # Last 10 measurements
         
-        if not bp_measurements:
+        if not systolic.size:
             return {
                 'score': None,
                 'value': None,
@@ -201,8 +259,8 @@ class HealthScoringService:
             }
         
         # Average recent blood pressure
-        avg_systolic = np.mean([m.systolic for m in bp_measurements])
-        avg_diastolic = np.mean([m.diastolic for m in bp_measurements])
+        avg_systolic = np.mean(systolic)
+        avg_diastolic = np.mean(diastolic)
         
         config = self.config.METRICS['blood_pressure']
         
@@ -233,10 +291,9 @@ class HealthScoringService:
     
     def score_heart_rate(self) -> Dict:
         """Score heart rate based on recent measurements."""
-        measurements = self.get_recent_measurements()
-        hr_measurements = measurements.filter(heart_rate__isnull=False)[:10]
+        heart_rates, = self._latest_values('heart_rate', limit=10)
         
-        if not hr_measurements:
+        if not heart_rates.size:
             return {
                 'score': None,
                 'value': None,
@@ -245,7 +302,7 @@ class HealthScoringService:
                 'suggestions': ['请记录您的心率数据']
             }
         
-        avg_hr = np.mean([m.heart_rate for m in hr_measurements])
+        avg_hr = np.mean(heart_rates)
         config = self.config.METRICS['heart_rate']
         score = self.score_metric_in_range(avg_hr, config['optimal_range'], config['acceptable_range'])
         
@@ -261,10 +318,9 @@ class HealthScoringService:
     
     def score_blood_glucose(self) -> Dict:
         """Score blood glucose based on recent measurements."""
-        measurements = self.get_recent_measurements()
-        glucose_measurements = measurements.filter(blood_glucose__isnull=False)[:10]
+        glucose, = self._latest_values('blood_glucose', limit=10)
         
-        if not glucose_measurements:
+        if not glucose.size:
             return {
                 'score': None,
                 'value': None,
@@ -273,7 +329,7 @@ class HealthScoringService:
                 'suggestions': ['请记录您的血糖数据']
             }
         
-        avg_glucose = np.mean([float(m.blood_glucose) for m in glucose_measurements])
+        avg_glucose = np.mean(glucose)
         config = self.config.METRICS['blood_glucose']
         score = self.score_metric_in_range(avg_glucose, config['optimal_range'], config['acceptable_range'])
         
@@ -289,14 +345,9 @@ class HealthScoringService:
 
     def score_sleep_quality(self) -> Dict:
         """Score sleep quality based on recent sleep logs."""
-        # 将 datetime 转换为 date 类型
-        start_date = (timezone.now() - timedelta(days=self.days)).date()
-        sleep_logs = SleepLog.objects.filter(
-            user_id=self.user_id,
-            sleep_date__gte=start_date
-        )[:14]  # Last 2 weeks
+        sleep_hours = self._load_window()['sleep_hours']
 
-        if not sleep_logs:
+        if not sleep_hours.size:
             return {
                 'score': None,
                 'value': None,
@@ -306,7 +357,7 @@ class HealthScoringService:
             }
 
         # Average sleep duration in hours
-        avg_sleep_hours = np.mean([log.duration_minutes / 60.0 for log in sleep_logs])
+        avg_sleep_hours = np.mean(sleep_hours)
         config = self.config.METRICS['sleep_quality']
         score = self.score_metric_in_range(avg_sleep_hours, config['optimal_range'], config['acceptable_range'])
 
@@ -322,14 +373,9 @@ class HealthScoringService:
 
     def score_mood_index(self) -> Dict:
         """Score mood based on recent mood logs."""
-        # 将 datetime 转换为 date 类型
-        start_date = (timezone.now() - timedelta(days=self.days)).date()
-        mood_logs = MoodLog.objects.filter(
-            user_id=self.user_id,
-            log_date__gte=start_date
-        )[:14]  # Last 2 weeks
+        mood_ratings = self._load_window()['mood_rating']
 
-        if not mood_logs:
+        if not mood_ratings.size:
             return {
                 'score': None,
                 'value': None,
@@ -338,7 +384,7 @@ class HealthScoringService:
                 'suggestions': ['请记录您的每日心情']
             }
 
-        avg_mood = np.mean([log.mood_rating for log in mood_logs])
+        avg_mood = np.mean(mood_ratings)
         config = self.config.METRICS['mood_index']
         score = self.score_metric_in_range(avg_mood, config['optimal_range'], config['acceptable_range'])
 
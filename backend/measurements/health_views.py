@@ -18,6 +18,8 @@ from .serializers import (
     MoodLogSerializer
 )
 from .services.scoring_service import HealthScoringService
+from .report_cache import ReportCache
+from .pagination import SleepLogPagination, MoodLogPagination
 
 User = get_user_model()
 
@@ -35,9 +37,10 @@ class MedicationRecordViewSet(viewsets.ModelViewSet):
 
 
 class SleepLogViewSet(viewsets.ModelViewSet):
-    """睡眠记录视图集"""
+    """睡眠记录视图集（列表支持 ?cursor= 游标分页）"""
     serializer_class = SleepLogSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = SleepLogPagination
     
     def get_queryset(self):
         return SleepLog.objects.filter(user=self.request.user)
@@ -66,9 +69,10 @@ class SleepLogViewSet(viewsets.ModelViewSet):
 
 
 class MoodLogViewSet(viewsets.ModelViewSet):
-    """情绪记录视图集"""
+    """情绪记录视图集（列表支持 ?cursor= 游标分页）"""
     serializer_class = MoodLogSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = MoodLogPagination
     
     def get_queryset(self):
         return MoodLog.objects.filter(user=self.request.user)
@@ -128,6 +132,12 @@ def health_report(request, user_id=None):
                 status=status.HTTP_404_NOT_FOUND
             )
     
+    # 数据未变化时返回 304 或缓存的报告
+    report_cache = ReportCache(request, 'health_views.health_report', user.id)
+    cached = report_cache.cached_response()
+    if cached is not None:
+        return cached
+    
     # 获取用户最新的健康数据
     latest_measurement = Measurement.objects.filter(user=user).order_by('-measured_at').first()
     
@@ -175,7 +185,7 @@ def health_report(request, user_id=None):
     report['generated_at'] = datetime.now().isoformat()
     report['latest_measurement_at'] = latest_measurement.measured_at.isoformat()
     
-    return Response(report)
+    return report_cache.respond(report)
 
 
 @api_view(['GET'])
@@ -0,0 +1,217 @@
+"""
+管理员实时仪表板的滚动统计
+替换本地内容：以增量计数器和时间分桶环形缓冲区维护最近24小时的统计数据，
+WebSocket 每次推送只需读取内存，不再随测量表规模扫描数据库
+"""
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+User = get_user_model()
+
+
+class _Bucket:
+    """单个时间桶：记录该时间段内的测量数、用户分布和指标累加和"""
+
+    __slots__ = ('count', 'users', 'systolic_sum', 'systolic_count',
+                 'heart_rate_sum', 'heart_rate_count')
+
+    def __init__(self):
+        self.count = 0
+        self.users = Counter()
+        self.systolic_sum = 0.0
+        self.systolic_count = 0
+        self.heart_rate_sum = 0.0
+        self.heart_rate_count = 0
+
+    def is_empty(self):
+        return self.count == 0
+
+
+class RollingStatistics:
+    """
+    最近 window 秒内的滚动统计
+
+    - 测量记录按 measured_at 落入固定宽度的时间桶
+    - 新增/删除测量时增量更新对应桶以及窗口内的汇总值
+    - 读取时先淘汰过期的桶，再直接返回内存中的汇总结果
+    - 每隔 resync_interval 秒从数据库全量重建一次，纠正其他进程写入造成的偏差
+    """
+
+    def __init__(self, window_seconds: int = 24 * 3600, bucket_seconds: int = 300,
+                 resync_interval: int = 600):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.resync_interval = resync_interval
+
+        self._lock = threading.RLock()
+        self._buckets = {}  # bucket index -> _Bucket
+        self._users = Counter()  # 窗口内每个用户的测量数
+        self._systolic_sum = 0.0
+        self._systolic_count = 0
+        self._heart_rate_sum = 0.0
+        self._heart_rate_count = 0
+        self._total_users = 0
+        self._loaded_at = None
+
+    # ------------------------------------------------------------------
+    # 时间桶工具
+    # ------------------------------------------------------------------
+    def _bucket_index(self, dt) -> int:
+        return int(dt.timestamp()) // self.bucket_seconds
+
+    @staticmethod
+    def _as_aware(value):
+        """字符串或不带时区的时间转为带时区的 datetime（按当前时区解释），无法解析时返回 None"""
+        if isinstance(value, str):
+            value = parse_datetime(value)
+        if value is not None and timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value
+
+    def _cutoff_index(self, now=None) -> int:
+        now = now or timezone.now()
+        return self._bucket_index(now - timedelta(seconds=self.window_seconds))
+
+    def _expire(self, now=None):
+        """淘汰窗口之外的时间桶，并从汇总值中扣除"""
+        cutoff = self._cutoff_index(now)
+        expired = [index for index in self._buckets if index < cutoff]
+        for index in expired:
+            bucket = self._buckets.pop(index)
+            self._users.subtract(bucket.users)
+            self._systolic_sum -= bucket.systolic_sum
+            self._systolic_count -= bucket.systolic_count
+            self._heart_rate_sum -= bucket.heart_rate_sum
+            self._heart_rate_count -= bucket.heart_rate_count
+        if expired:
+            self._users = +self._users  # 去掉计数为0的用户
+
+    def _apply(self, user_id, measured_at, systolic, heart_rate, sign: int):
+        """将一条测量记录计入(sign=1)或移出(sign=-1)滚动窗口"""
+        measured_at = self._as_aware(measured_at)
+        if measured_at is None:
+            return
+        index = self._bucket_index(measured_at)
+        if index < self._cutoff_index():
+            return
+
+        bucket = self._buckets.get(index)
+        if bucket is None:
+            if sign < 0:
+                return
+            bucket = self._buckets[index] = _Bucket()
+
+        bucket.count += sign
+        bucket.users[user_id] += sign
+        self._users[user_id] += sign
+        if bucket.users[user_id] <= 0:
+            del bucket.users[user_id]
+        if self._users[user_id] <= 0:
+            del self._users[user_id]
+
+        if systolic is not None:
+            bucket.systolic_sum += sign * float(systolic)
+            bucket.systolic_count += sign
+            self._systolic_sum += sign * float(systolic)
+            self._systolic_count += sign
+        if heart_rate is not None:
+            bucket.heart_rate_sum += sign * float(heart_rate)
+            bucket.heart_rate_count += sign
+            self._heart_rate_sum += sign * float(heart_rate)
+            self._heart_rate_count += sign
+
+        if bucket.is_empty():
+            del self._buckets[index]
+
+    # ------------------------------------------------------------------
+    # 数据库同步
+    # ------------------------------------------------------------------
+    def _needs_resync(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.resync_interval
+
+    def resync(self):
+        """从数据库重建窗口内的全部时间桶"""
+        from .models import Measurement
+
+        now = timezone.now()
+        start = now - timedelta(seconds=self.window_seconds)
+        rows = Measurement.objects.filter(measured_at__gte=start).values_list(
+            'user_id', 'measured_at', 'systolic', 'heart_rate'
+        )
+        total_users = User.objects.filter(role='user').count()
+
+        with self._lock:
+            self._buckets = {}
+            self._users = Counter()
+            self._systolic_sum = 0.0
+            self._systolic_count = 0
+            self._heart_rate_sum = 0.0
+            self._heart_rate_count = 0
+            for user_id, measured_at, systolic, heart_rate in rows.iterator(chunk_size=2000):
+                self._apply(user_id, measured_at, systolic, heart_rate, 1)
+            self._total_users = total_users
+            self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        if self._needs_resync():
+            self.resync()
+
+    # ------------------------------------------------------------------
+    # 写入钩子（由 signals 调用）
+    # ------------------------------------------------------------------
+    def add(self, user_id, measured_at, systolic=None, heart_rate=None):
+        with self._lock:
+            if self._loaded_at is None:
+                return  # 尚未加载，首次读取时会从数据库重建
+            self._apply(user_id, measured_at, systolic, heart_rate, 1)
+
+    def remove(self, user_id, measured_at, systolic=None, heart_rate=None):
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            self._apply(user_id, measured_at, systolic, heart_rate, -1)
+
+    def adjust_total_users(self, delta: int):
+        with self._lock:
+            if self._loaded_at is not None:
+                self._total_users = max(self._total_users + delta, 0)
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+    def snapshot(self) -> dict:
+        """返回与 AdminStreamConsumer.get_system_statistics 相同结构的统计数据"""
+        self._ensure_loaded()
+
+        now = timezone.now()
+        local_now = timezone.localtime(now)
+        day_start = local_now.replace(hour=0, minute=0, second=0, microsecond=0)
+        day_start_index = self._bucket_index(day_start)
+        day_end_index = self._bucket_index(day_start + timedelta(days=1))
+
+        with self._lock:
+            self._expire(now)
+            today_measurements = sum(
+                bucket.count for index, bucket in self._buckets.items()
+                if day_start_index <= index < day_end_index
+            )
+            avg_systolic = self._systolic_sum / self._systolic_count if self._systolic_count else 0
+            avg_heart_rate = self._heart_rate_sum / self._heart_rate_count if self._heart_rate_count else 0
+
+            return {
+                'active_users': len(self._users),
+                'total_users': self._total_users,
+                'today_measurements': today_measurements,
+                'avg_systolic': round(avg_systolic, 1),
+                'avg_heart_rate': round(avg_heart_rate, 1),
+            }
+
+
+# 进程内共享的滚动统计实例
+rolling_statistics = RollingStatistics()
@@ -0,0 +1,150 @@
+import json
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from measurements.models import Measurement, MeasurementDaily, SleepLog, MoodLog, HealthScoreSnapshot
+from measurements.services.rollup_service import _summary_aggregates
+
+
+class Command(BaseCommand):
+    help = '对高频查询执行 EXPLAIN，标记全表扫描和额外排序（支持 MySQL / PostgreSQL / SQLite）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user-id',
+            type=int,
+            help='用于生成查询的用户ID（默认取第一个有测量数据的用户）'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='查询时间窗口（天）'
+        )
+        parser.add_argument(
+            '--show-plans',
+            action='store_true',
+            help='输出完整执行计划'
+        )
+        parser.add_argument(
+            '--fail-on-scan',
+            action='store_true',
+            help='发现全表扫描时以非零状态退出（用于 CI）'
+        )
+
+    def get_queries(self, user_id, days):
+        """高频查询（与视图/服务中的查询保持一致）"""
+        start = timezone.now() - timedelta(days=days)
+        start_date = timezone.localdate(start)
+        # 管理员趋势分页时只读取当前页用户的汇总
+        page_user_ids = list(
+            MeasurementDaily.objects.filter(date__gte=start_date).order_by('user_id')
+            .values_list('user_id', flat=True).distinct()[:20]
+        )
+
+        return [
+            ('用户时间窗口（评分/报告）',
+             Measurement.objects.filter(user_id=user_id, measured_at__gte=start).order_by('-measured_at')),
+            ('用户最新测量',
+             Measurement.objects.filter(user_id=user_id).order_by('-measured_at')[:1]),
+            ('用户测量列表（分页）',
+             Measurement.objects.filter(user_id=user_id).order_by('-measured_at', '-id')[:50]),
+            ('单指标每日序列（预测/趋势）',
+             MeasurementDaily.objects.filter(user_id=user_id, systolic_count__gt=0).order_by('date')
+             .values('date', 'systolic_count', 'systolic_sum', 'systolic_min', 'systolic_max', 'systolic_sumsq')),
+            ('用户汇总统计（统计）',
+             MeasurementDaily.objects.filter(user_id=user_id, date__gte=start_date).order_by()
+             .values('user_id').annotate(**_summary_aggregates(['systolic', 'heart_rate']))),
+            ('全体用户时间范围（实时统计）',
+             Measurement.objects.filter(measured_at__gte=start).values_list('user_id', 'measured_at')),
+            ('全体用户趋势（管理员，分页）',
+             MeasurementDaily.objects.filter(date__gte=start_date, user_id__in=page_user_ids)
+             .order_by('user_id', 'date').values_list('user_id', 'date', 'systolic_count', 'systolic_sum')),
+            ('用户睡眠记录',
+             SleepLog.objects.filter(user_id=user_id, sleep_date__gte=start_date).order_by('-sleep_date')),
+            ('用户情绪记录',
+             MoodLog.objects.filter(user_id=user_id, log_date__gte=start_date).order_by('-log_date')),
+            ('评分快照历史',
+             HealthScoreSnapshot.objects.filter(user_id=user_id, snapshot_date__gte=start_date)
+             .order_by('snapshot_date')),
+        ]
+
+    def explain(self, queryset):
+        """返回 (执行计划文本, 全表扫描的表, 是否额外排序)"""
+        vendor = connection.vendor
+
+        if vendor == 'mysql':
+            plan = queryset.explain(format='json')
+            data = json.loads(plan)
+            scans, sorts = [], False
+
+            def walk(node):
+                nonlocal sorts
+                if isinstance(node, dict):
+                    if node.get('access_type') == 'ALL':
+                        scans.append(node.get('table_name', '?'))
+                    if node.get('using_filesort'):
+                        sorts = True
+                    for value in node.values():
+                        walk(value)
+                elif isinstance(node, list):
+                    for value in node:
+                        walk(value)
+
+            walk(data)
+            return plan, scans, sorts
+
+        plan = queryset.explain()
+        if vendor == 'postgresql':
+            scans = re.findall(r'Seq Scan on (\w+)', plan)
+            sorts = bool(re.search(r'^\s*(->\s*)?Sort\b', plan, re.MULTILINE))
+        elif vendor == 'sqlite':
+            # SCAN（包括 SCAN ... USING INDEX）都是遍历整张表/整个索引，SEARCH 才是按索引定位
+            scans = re.findall(r'\bSCAN (\w+)', plan)
+            sorts = 'TEMP B-TREE FOR ORDER BY' in plan
+        else:
+            scans, sorts = [], False
+        return plan, scans, sorts
+
+    def handle(self, *args, **options):
+        user_id = options['user_id']
+        if user_id is None:
+            user_id = Measurement.objects.order_by().values_list('user_id', flat=True).first()
+            if user_id is None:
+                raise CommandError('没有测量数据，请通过 --user-id 指定用户')
+
+        self.stdout.write(f'数据库: {connection.vendor}，用户: {user_id}，时间窗口: {options["days"]} 天\n')
+
+        full_scans = []
+        for name, queryset in self.get_queries(user_id, options['days']):
+            plan, scans, sorts = self.explain(queryset)
+
+            if scans:
+                status = self.style.ERROR(f'全表扫描: {", ".join(sorted(set(scans)))}')
+                full_scans.append(name)
+            elif sorts:
+                status = self.style.WARNING('使用索引，但需要额外排序')
+            else:
+                status = self.style.SUCCESS('使用索引')
+            self.stdout.write(f'[{name}] {status}')
+
+            if options['show_plans'] or scans:
+                self.stdout.write(f'  SQL: {queryset.query}')
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
+
+        self.stdout.write('')
+        if not full_scans:
+            self.stdout.write(self.style.SUCCESS('所有高频查询均使用索引'))
+            return
+
+        self.stdout.write(self.style.WARNING(
+            f'{len(full_scans)} 个查询存在全表扫描（数据量很小时优化器也可能选择全表扫描，'
+            f'请在接近生产规模的数据上确认）'
+        ))
+        if options['fail_on_scan']:
+            raise CommandError('发现全表扫描: ' + '、'.join(full_scans))
@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from measurements.models import HealthScoreSnapshot
+from measurements.services.snapshot_service import SNAPSHOT_DAYS, refresh_snapshot
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = '回填/刷新每日健康评分快照（可由定时任务每天运行：--days-back 1 刷新所有用户当天的快照）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days-back',
+            type=int,
+            default=90,
+            help='回填最近多少天的快照（含今天）'
+        )
+        parser.add_argument(
+            '--window',
+            type=int,
+            default=SNAPSHOT_DAYS,
+            help='评分评估窗口（天）'
+        )
+        parser.add_argument(
+            '--user-id',
+            type=int,
+            help='只回填指定用户（默认所有普通用户）'
+        )
+        parser.add_argument(
+            '--skip-existing',
+            action='store_true',
+            help='跳过已存在的快照（今天的快照总会刷新）'
+        )
+
+    def handle(self, *args, **options):
+        days_back = options['days_back']
+        window = options['window']
+
+        if days_back < 1 or window < 1:
+            self.stdout.write(self.style.ERROR('--days-back 和 --window 必须大于 0'))
+            return
+
+        users = User.objects.filter(role='user')
+        if options['user_id']:
+            users = User.objects.filter(id=options['user_id'])
+            if not users.exists():
+                self.stdout.write(self.style.ERROR(f"用户 {options['user_id']} 不存在"))
+                return
+
+        today = timezone.localdate()
+        dates = [today - timedelta(days=offset) for offset in range(days_back - 1, -1, -1)]
+
+        created = 0
+        skipped = 0
+        for user_id in users.order_by('id').values_list('id', flat=True):
+            existing = set()
+            if options['skip_existing']:
+                existing = set(HealthScoreSnapshot.objects.filter(
+                    user_id=user_id,
+                    evaluation_period_days=window,
+                    snapshot_date__gte=dates[0]
+                ).values_list('snapshot_date', flat=True))
+
+            for snapshot_date in dates:
+                if snapshot_date in existing and snapshot_date != today:
+                    skipped += 1
+                    continue
+                refresh_snapshot(user_id, snapshot_date, window)
+                created += 1
+
+            self.stdout.write(f'用户 {user_id}: 已处理 {len(dates)} 天')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'回填完成: 写入 {created} 个快照，跳过 {skipped} 个已有快照'
+        ))
@@ -1,20 +1,34 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
-import pandas as pd
+from django.db import connections
+from django.db.models import Max, Min
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import django
 import os
+import time
+
+from measurements.models import Measurement
+from measurements.services.export_service import (
+    EXPORT_CHUNK_SIZE, export_partition, partition_path, resolve_format
+)
 
 User = get_user_model()
 
 
 class Command(BaseCommand):
-    help = '导出用户健康数据为CSV格式'
+    help = '导出用户健康数据（CSV 或列式格式），支持全部用户按分区多进程导出'
 
     def add_arguments(self, parser):
         parser.add_argument(
             '--user-id',
             type=int,
-            required=True,
-            help='用户ID'
+            action='append',
+            help='用户ID（可重复指定多个）'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='导出所有有测量数据的用户'
         )
         parser.add_argument(
             '--output-dir',
@@ -22,43 +36,128 @@ class Command(BaseCommand):
             default='exported_data',
             help='输出目录'
         )
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'parquet', 'feather', 'npz'],
+            default='csv',
+            help='导出格式；parquet/feather 需要 pyarrow，不可用时改为压缩 NPZ (默认: csv)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='导出进程数 (默认: 1)'
+        )
+        parser.add_argument(
+            '--users-per-file',
+            type=int,
+            default=200,
+            help='每个分区文件包含的用户数 (默认: 200)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help=f'每次从数据库读取的行数 (默认: {EXPORT_CHUNK_SIZE})'
+        )
 
     def handle(self, *args, **options):
-        user_id = options['user_id']
+        user_ids = options['user_id'] or []
         output_dir = options['output_dir']
-        
+        chunk_size = options['chunk_size']
+
+        if not user_ids and not options['all']:
+            raise CommandError('请指定 --user-id 或 --all')
+
+        fmt = resolve_format(options['format'])
+        if fmt != options['format']:
+            self.stdout.write(self.style.WARNING(
+                f'{options["format"]} 需要 pyarrow，未安装，改为导出压缩 NPZ'
+            ))
+
         os.makedirs(output_dir, exist_ok=True)
-        
-        try:
-            user = User.objects.get(id=user_id)
-        except User.DoesNotExist:
-            self.stdout.write(self.style.ERROR(f'用户 {user_id} 不存在'))
+
+        # 单个用户保持原来的输出文件名和列
+        if len(user_ids) == 1 and not options['all']:
+            self._export_single_user(user_ids[0], output_dir, fmt, chunk_size)
             return
-        
-        from measurements.models import Measurement
-        
-        measurements = Measurement.objects.filter(user=user).order_by('measured_at')
-        data = list(measurements.values(
-            'measured_at',
-            'weight_kg',
-            'systolic',
-            'diastolic',
-            'heart_rate',
-            'blood_glucose',
-            'notes'
+
+        if options['all']:
+            user_ids = list(
+                Measurement.objects.order_by('user_id').values_list('user_id', flat=True).distinct()
+            )
+        else:
+            existing = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+            for missing in sorted(set(user_ids) - existing):
+                self.stdout.write(self.style.ERROR(f'用户 {missing} 不存在'))
+            user_ids = sorted(existing)
+
+        if not user_ids:
+            self.stdout.write(self.style.WARNING('没有可导出的用户'))
+            return
+
+        per_file = max(1, options['users_per_file'])
+        partitions = [user_ids[i:i + per_file] for i in range(0, len(user_ids), per_file)]
+        workers = max(1, min(options['workers'], len(partitions)))
+        self.stdout.write(
+            f'导出 {len(user_ids)} 个用户，{len(partitions)} 个分区，格式 {fmt}，{workers} 个进程'
+        )
+
+        tasks = [
+            (partition, partition_path(output_dir, index, fmt), fmt, chunk_size)
+            for index, partition in enumerate(partitions)
+        ]
+        started = time.perf_counter()
+        total_rows = 0
+        files = 0
+
+        if workers == 1:
+            results = (export_partition(*task) for task in tasks)
+            for done, result in enumerate(results, 1):
+                total_rows, files = self._report(result, done, len(tasks), total_rows, files, started)
+        else:
+            # 子进程各自建立数据库连接，不能共用父进程的连接
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as executor:
+                futures = [executor.submit(export_partition, *task) for task in tasks]
+                for done, future in enumerate(as_completed(futures), 1):
+                    total_rows, files = self._report(
+                        future.result(), done, len(tasks), total_rows, files, started
+                    )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'数据已导出到: {output_dir}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'总记录数: {total_rows}，文件数: {files}，用时 {elapsed:.1f} 秒 '
+            f'({total_rows / max(elapsed, 1e-9):.0f} 条/秒)'
         ))
-        
-        if not data:
+
+    def _report(self, result, done, total, total_rows, files, started):
+        """打印一个分区的导出进度，返回累计的记录数和文件数"""
+        total_rows += result['rows']
+        files += 1 if result['path'] else 0
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"  ✓ [{done}/{total}] {result['users']} 个用户 {result['rows']} 条 "
+            f"({total_rows / max(elapsed, 1e-9):.0f} 条/秒)"
+        )
+        return total_rows, files
+
+    def _export_single_user(self, user_id, output_dir, fmt, chunk_size):
+        if not User.objects.filter(id=user_id).exists():
+            self.stdout.write(self.style.ERROR(f'用户 {user_id} 不存在'))
+            return
+
+        output_file = os.path.join(output_dir, f'user_{user_id}_health_data.{fmt}')
+        result = export_partition([user_id], output_file, fmt, chunk_size, include_user_id=False)
+
+        if not result['rows']:
             self.stdout.write(self.style.WARNING(f'用户 {user_id} 没有测量数据'))
             return
-        
-        df = pd.DataFrame(data)
-        df['measured_at'] = pd.to_datetime(df['measured_at'])
-        df = df.sort_values('measured_at')
-        
-        output_file = os.path.join(output_dir, f'user_{user_id}_health_data.csv')
-        df.to_csv(output_file, index=False, encoding='utf-8-sig')
-        
+
+        span = Measurement.objects.filter(user_id=user_id).aggregate(
+            first=Min('measured_at'), last=Max('measured_at')
+        )
         self.stdout.write(self.style.SUCCESS(f'数据已导出到: {output_file}'))
-        self.stdout.write(self.style.SUCCESS(f'总记录数: {len(df)}'))
-        self.stdout.write(self.style.SUCCESS(f'时间范围: {df["measured_at"].min()} 到 {df["measured_at"].max()}'))
+        self.stdout.write(self.style.SUCCESS(f'总记录数: {result["rows"]}'))
+        self.stdout.write(self.style.SUCCESS(f'时间范围: {span["first"]} 到 {span["last"]}'))
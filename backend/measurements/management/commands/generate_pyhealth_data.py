@@ -9,12 +9,14 @@ Django 管理命令：生成 PyHealth 数据
 
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
-from measurements.models import Measurement
+from django.db import transaction
+from measurements.services.ingest_service import (
+    delete_user_measurements, measurements_from_frame, refresh_imported_users, upsert_measurements
+)
 from users.models import Profile
 import sys
 import os
-from decimal import Decimal
-import pandas as pd
+import time
 
 # 添加 data_generation 模块到路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
@@ -57,6 +59,12 @@ class Command(BaseCommand):
             default=42,
             help='随机种子 (默认: 42)'
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='生成数据的进程数，0 表示使用全部 CPU 核 (默认: 1)'
+        )
     
     def handle(self, *args, **options):
         num_users = options['users']
@@ -64,6 +72,7 @@ class Command(BaseCommand):
         no_import = options['no_import']
         output_dir = options['output_dir']
         seed = options['seed']
+        workers = options['workers']
         
         self.stdout.write(self.style.SUCCESS('=' * 70))
         self.stdout.write(self.style.SUCCESS('PyHealth 数据生成工具'))
@@ -75,6 +84,7 @@ class Command(BaseCommand):
         self.stdout.write(f'  每用户记录数: {records_per_user}')
         self.stdout.write(f'  总记录数: {num_users * records_per_user}')
         self.stdout.write(f'  随机种子: {seed}')
+        self.stdout.write(f'  进程数: {workers or "全部CPU核"}')
         self.stdout.write(f'  输出目录: {output_dir}\n')
         
         generator = PyHealthDataGenerator(
@@ -83,7 +93,7 @@ class Command(BaseCommand):
             random_seed=seed
         )
         
-        df_users, df_measurements = generator.generate_all_data()
+        df_users, df_measurements = generator.generate_all_data(workers=workers)
         generator.save_to_csv(df_users, df_measurements, output_dir)
         
         if no_import:
@@ -128,54 +138,33 @@ class Command(BaseCommand):
         
         # 清理旧数据
         self.stdout.write('\n清理旧测量数据...')
-        for username, user in user_mapping.items():
-            old_count = Measurement.objects.filter(user=user).count()
-            if old_count > 0:
-                Measurement.objects.filter(user=user).delete()
-                self.stdout.write(f"  - 删除 {username} 的 {old_count} 条旧记录")
+        deleted = delete_user_measurements(user.id for user in user_mapping.values())
+        if deleted:
+            self.stdout.write(f"  - 删除 {len(user_mapping)} 个用户的 {deleted} 条旧记录")
         
-        # 批量导入测量数据
+        # 批量导入测量数据：按块做列式转换，每块一个事务
         self.stdout.write('\n导入测量数据...')
-        measurements_to_create = []
-        batch_size = 1000
+        user_ids = {username: user.id for username, user in user_mapping.items()}
+        chunk_size = 50000
         imported_count = 0
         total_records = len(df_measurements)
+        started = time.perf_counter()
         
-        for idx, row in df_measurements.iterrows():
-            username = row['username']
-            user = user_mapping.get(username)
-            
-            if user is None:
-                continue
-            
-            measured_at = pd.to_datetime(row['measured_at'])
-            
-            measurement = Measurement(
-                user=user,
-                measured_at=measured_at,
-                blood_glucose=Decimal(str(round(row['blood_glucose'], 1))),
-                heart_rate=int(row['heart_rate']),
-                systolic=int(row['systolic']),
-                diastolic=int(row['diastolic']),
-                weight_kg=Decimal(str(round(row['weight_kg'], 1))),
-                notes='PyHealth generated data'
+        for offset in range(0, total_records, chunk_size):
+            chunk = df_measurements.iloc[offset:offset + chunk_size]
+            measurements, _ = measurements_from_frame(chunk, user_ids, notes='PyHealth generated data')
+            with transaction.atomic():
+                written = upsert_measurements(measurements)
+            imported_count += len(written)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"  ✓ 进度: {imported_count}/{total_records} "
+                f"({imported_count/total_records*100:.1f}%), {imported_count / elapsed:.0f} 条/秒"
             )
-            
-            measurements_to_create.append(measurement)
-            
-            if len(measurements_to_create) >= batch_size:
-                Measurement.objects.bulk_create(measurements_to_create)
-                imported_count += len(measurements_to_create)
-                self.stdout.write(
-                    f"  ✓ 进度: {imported_count}/{total_records} "
-                    f"({imported_count/total_records*100:.1f}%)"
-                )
-                measurements_to_create = []
         
-        # 插入剩余数据
-        if measurements_to_create:
-            Measurement.objects.bulk_create(measurements_to_create)
-            imported_count += len(measurements_to_create)
+        # 批量 upsert 不触发信号，导入后重建每日汇总、刷新评分快照并使缓存失效
+        self.stdout.write('\n重建每日测量汇总和健康评分快照...')
+        refresh_imported_users(user.id for user in user_mapping.values())
         
         self.stdout.write(self.style.SUCCESS('\n' + '=' * 70))
         self.stdout.write(self.style.SUCCESS('导入完成！'))
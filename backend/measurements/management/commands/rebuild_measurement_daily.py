@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from measurements.models import Measurement, MeasurementDaily
+from measurements.services.rollup_service import rebuild_user
+
+
+class Command(BaseCommand):
+    help = '从原始测量数据重建每日测量汇总（批量导入后或汇总与原始数据不一致时运行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user-id',
+            type=int,
+            help='只重建指定用户（默认所有有测量数据的用户）'
+        )
+
+    def handle(self, *args, **options):
+        if options['user_id']:
+            user_ids = [options['user_id']]
+        else:
+            user_ids = list(
+                Measurement.objects.order_by('user_id').values_list('user_id', flat=True).distinct()
+            )
+            # 已没有测量数据的用户的残留汇总
+            stale, _ = MeasurementDaily.objects.exclude(
+                user_id__in=Measurement.objects.values('user_id')
+            ).delete()
+            if stale:
+                self.stdout.write(f'删除 {stale} 行无对应测量的汇总')
+
+        total_days = 0
+        for user_id in user_ids:
+            with transaction.atomic():
+                days = rebuild_user(user_id)
+            total_days += days
+            self.stdout.write(f'用户 {user_id}: {days} 天')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'重建完成: {len(user_ids)} 个用户，共 {total_days} 行每日汇总'
+        ))
@@ -0,0 +1,80 @@
+# Generated by Django 4.2.28 on 2026-10-19 08:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('measurements', '0002_remove_sleeplog_user_delete_moodlog_delete_sleeplog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SleepLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sleep_date', models.DateField(help_text='睡眠日期')),
+                ('start_time', models.DateTimeField(help_text='入睡时间')),
+                ('end_time', models.DateTimeField(help_text='起床时间')),
+                ('duration_minutes', models.IntegerField(help_text='睡眠时长（分钟）')),
+                ('quality_rating', models.IntegerField(blank=True, help_text='睡眠质量评分 (1-10)', null=True)),
+                ('notes', models.TextField(blank=True, help_text='备注')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sleep_logs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': '睡眠记录',
+                'verbose_name_plural': '睡眠记录',
+                'ordering': ['-sleep_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MoodLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('log_date', models.DateField(help_text='记录日期')),
+                ('mood_rating', models.IntegerField(help_text='心情评分 (1-10，1=很差，10=很好)')),
+                ('notes', models.TextField(blank=True, help_text='心情备注')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mood_logs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': '心情记录',
+                'verbose_name_plural': '心情记录',
+                'ordering': ['-log_date'],
+                'unique_together': {('user', 'log_date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='HealthScoreSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('snapshot_date', models.DateField(help_text='快照日期（评估窗口截止日）')),
+                ('evaluation_period_days', models.IntegerField(default=30, help_text='评估窗口（天）')),
+                ('overall_score', models.FloatField(blank=True, help_text='综合评分', null=True)),
+                ('overall_status', models.CharField(help_text='综合状态', max_length=20)),
+                ('bmi_score', models.FloatField(blank=True, null=True)),
+                ('blood_pressure_score', models.FloatField(blank=True, null=True)),
+                ('heart_rate_score', models.FloatField(blank=True, null=True)),
+                ('blood_glucose_score', models.FloatField(blank=True, null=True)),
+                ('sleep_quality_score', models.FloatField(blank=True, null=True)),
+                ('mood_index_score', models.FloatField(blank=True, null=True)),
+                ('report', models.JSONField(help_text='完整评分报告')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='health_score_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': '健康评分快照',
+                'verbose_name_plural': '健康评分快照',
+                'ordering': ['-snapshot_date'],
+                'unique_together': {('user', 'snapshot_date', 'evaluation_period_days')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.28 on 2026-10-19 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('measurements', '0003_sleeplog_moodlog_healthscoresnapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='measurement',
+            index=models.Index(fields=['user', 'measured_at'], name='meas_user_measured_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='measurement',
+            index=models.Index(fields=['measured_at', 'user'], name='meas_measured_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sleeplog',
+            index=models.Index(fields=['user', 'sleep_date'], name='sleep_user_date_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.28 on 2026-10-19 08:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_rollups(apps, schema_editor):
+    from measurements.services.rollup_service import rebuild_user
+
+    Measurement = apps.get_model('measurements', 'Measurement')
+    MeasurementDaily = apps.get_model('measurements', 'MeasurementDaily')
+    user_ids = Measurement.objects.order_by().values_list('user_id', flat=True).distinct()
+    for user_id in list(user_ids):
+        rebuild_user(user_id, measurement_model=Measurement, daily_model=MeasurementDaily)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('measurements', '0004_measurement_sleeplog_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MeasurementDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='日期（本地时区）')),
+                ('measurement_count', models.IntegerField(default=0, help_text='当天测量记录数')),
+                ('weight_kg_count', models.IntegerField(default=0, help_text='体重读数个数')),
+                ('weight_kg_sum', models.FloatField(default=0)),
+                ('weight_kg_min', models.FloatField(blank=True, null=True)),
+                ('weight_kg_max', models.FloatField(blank=True, null=True)),
+                ('weight_kg_sumsq', models.FloatField(default=0, help_text='体重平方和')),
+                ('systolic_count', models.IntegerField(default=0, help_text='收缩压读数个数')),
+                ('systolic_sum', models.FloatField(default=0)),
+                ('systolic_min', models.FloatField(blank=True, null=True)),
+                ('systolic_max', models.FloatField(blank=True, null=True)),
+                ('systolic_sumsq', models.FloatField(default=0, help_text='收缩压平方和')),
+                ('diastolic_count', models.IntegerField(default=0, help_text='舒张压读数个数')),
+                ('diastolic_sum', models.FloatField(default=0)),
+                ('diastolic_min', models.FloatField(blank=True, null=True)),
+                ('diastolic_max', models.FloatField(blank=True, null=True)),
+                ('diastolic_sumsq', models.FloatField(default=0, help_text='舒张压平方和')),
+                ('heart_rate_count', models.IntegerField(default=0, help_text='心率读数个数')),
+                ('heart_rate_sum', models.FloatField(default=0)),
+                ('heart_rate_min', models.FloatField(blank=True, null=True)),
+                ('heart_rate_max', models.FloatField(blank=True, null=True)),
+                ('heart_rate_sumsq', models.FloatField(default=0, help_text='心率平方和')),
+                ('blood_glucose_count', models.IntegerField(default=0, help_text='血糖读数个数')),
+                ('blood_glucose_sum', models.FloatField(default=0)),
+                ('blood_glucose_min', models.FloatField(blank=True, null=True)),
+                ('blood_glucose_max', models.FloatField(blank=True, null=True)),
+                ('blood_glucose_sumsq', models.FloatField(default=0, help_text='血糖平方和')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='measurement_daily', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': '每日测量汇总',
+                'verbose_name_plural': '每日测量汇总',
+                'ordering': ['-date'],
+                'unique_together': {('user', 'date')},
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
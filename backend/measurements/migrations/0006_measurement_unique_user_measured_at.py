@@ -0,0 +1,47 @@
+# Generated by Django 4.2.28 on 2026-10-19 08:54
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicate_measurements(apps, schema_editor):
+    """同一用户同一时刻的重复测量只保留最新写入的一条（id 最大），并重建受影响用户的每日汇总"""
+    from measurements.services.rollup_service import rebuild_user
+
+    Measurement = apps.get_model('measurements', 'Measurement')
+    MeasurementDaily = apps.get_model('measurements', 'MeasurementDaily')
+
+    duplicates = (
+        Measurement.objects.order_by().values('user_id', 'measured_at')
+        .annotate(total=Count('id'), keep_id=Max('id'))
+        .filter(total__gt=1)
+    )
+    affected_users = set()
+    for group in list(duplicates):
+        Measurement.objects.filter(
+            user_id=group['user_id'], measured_at=group['measured_at']
+        ).exclude(id=group['keep_id']).delete()
+        affected_users.add(group['user_id'])
+
+    for user_id in affected_users:
+        rebuild_user(user_id, measurement_model=Measurement, daily_model=MeasurementDaily)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('measurements', '0005_measurementdaily'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_measurements, migrations.RunPython.noop),
+        # 先建唯一约束再删除旧索引，保证 user_id 外键始终有可用索引（MySQL）
+        migrations.AddConstraint(
+            model_name='measurement',
+            constraint=models.UniqueConstraint(fields=('user', 'measured_at'), name='uniq_measurement_user_measured_at'),
+        ),
+        migrations.RemoveIndex(
+            model_name='measurement',
+            name='meas_user_measured_idx',
+        ),
+    ]
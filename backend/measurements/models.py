@@ -19,6 +19,15 @@ class Measurement(models.Model):
 
     class Meta:
         ordering = ['-measured_at']
+        constraints = [
+            # 同一用户同一时刻只有一条测量：设备重传/重复导入走 upsert，不会产生重复记录；
+            # 其唯一索引同时服务按用户 + 时间范围/排序的查询（评分、报告、列表、预测）
+            models.UniqueConstraint(fields=['user', 'measured_at'], name='uniq_measurement_user_measured_at'),
+        ]
+        indexes = [
+            # 跨用户的时间范围查询（实时统计、趋势分析），包含 user_id 以便按用户分组时覆盖
+            models.Index(fields=['measured_at', 'user'], name='meas_measured_user_idx'),
+        ]
         verbose_name = "健康测量"
         verbose_name_plural = "健康测量"
 
@@ -65,6 +74,9 @@ class SleepLog(models.Model):
     
     class Meta:
         ordering = ['-sleep_date']
+        indexes = [
+            models.Index(fields=['user', 'sleep_date'], name='sleep_user_date_idx'),
+        ]
         verbose_name = "睡眠记录"
         verbose_name_plural = "睡眠记录"
     
@@ -99,3 +111,81 @@ class MoodLog(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - {self.log_date} (评分: {self.mood_rating})"
+
+
+class HealthScoreSnapshot(models.Model):
+    """
+    Daily health score snapshot per user.
+    Stores the overall and per-dimension scores produced by HealthScoringService
+    for a given day, so reports and score-over-time charts do not rescore raw rows.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='health_score_snapshots')
+    snapshot_date = models.DateField(help_text="快照日期（评估窗口截止日）")
+    evaluation_period_days = models.IntegerField(default=30, help_text="评估窗口（天）")
+    overall_score = models.FloatField(null=True, blank=True, help_text="综合评分")
+    overall_status = models.CharField(max_length=20, help_text="综合状态")
+    bmi_score = models.FloatField(null=True, blank=True)
+    blood_pressure_score = models.FloatField(null=True, blank=True)
+    heart_rate_score = models.FloatField(null=True, blank=True)
+    blood_glucose_score = models.FloatField(null=True, blank=True)
+    sleep_quality_score = models.FloatField(null=True, blank=True)
+    mood_index_score = models.FloatField(null=True, blank=True)
+    report = models.JSONField(help_text="完整评分报告")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-snapshot_date']
+        unique_together = [['user', 'snapshot_date', 'evaluation_period_days']]
+        verbose_name = "健康评分快照"
+        verbose_name_plural = "健康评分快照"
+
+    def __str__(self):
+        return f"{self.user.username} - {self.snapshot_date} ({self.overall_score})"
+
+
+class MeasurementDaily(models.Model):
+    """
+    Daily rollup of measurements per user.
+    Keeps count, sum, min, max and sum of squares for each metric per local day,
+    maintained on write, so charts, forecasts and statistics read one row per day
+    instead of every raw reading (mean and standard deviation derive from these).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='measurement_daily')
+    date = models.DateField(help_text="日期（本地时区）")
+    measurement_count = models.IntegerField(default=0, help_text="当天测量记录数")
+    weight_kg_count = models.IntegerField(default=0, help_text="体重读数个数")
+    weight_kg_sum = models.FloatField(default=0)
+    weight_kg_min = models.FloatField(null=True, blank=True)
+    weight_kg_max = models.FloatField(null=True, blank=True)
+    weight_kg_sumsq = models.FloatField(default=0, help_text="体重平方和")
+    systolic_count = models.IntegerField(default=0, help_text="收缩压读数个数")
+    systolic_sum = models.FloatField(default=0)
+    systolic_min = models.FloatField(null=True, blank=True)
+    systolic_max = models.FloatField(null=True, blank=True)
+    systolic_sumsq = models.FloatField(default=0, help_text="收缩压平方和")
+    diastolic_count = models.IntegerField(default=0, help_text="舒张压读数个数")
+    diastolic_sum = models.FloatField(default=0)
+    diastolic_min = models.FloatField(null=True, blank=True)
+    diastolic_max = models.FloatField(null=True, blank=True)
+    diastolic_sumsq = models.FloatField(default=0, help_text="舒张压平方和")
+    heart_rate_count = models.IntegerField(default=0, help_text="心率读数个数")
+    heart_rate_sum = models.FloatField(default=0)
+    heart_rate_min = models.FloatField(null=True, blank=True)
+    heart_rate_max = models.FloatField(null=True, blank=True)
+    heart_rate_sumsq = models.FloatField(default=0, help_text="心率平方和")
+    blood_glucose_count = models.IntegerField(default=0, help_text="血糖读数个数")
+    blood_glucose_sum = models.FloatField(default=0)
+    blood_glucose_min = models.FloatField(null=True, blank=True)
+    blood_glucose_max = models.FloatField(null=True, blank=True)
+    blood_glucose_sumsq = models.FloatField(default=0, help_text="血糖平方和")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-date']
+        unique_together = [['user', 'date']]
+        verbose_name = "每日测量汇总"
+        verbose_name_plural = "每日测量汇总"
+
+    def __str__(self):
+        return f"{self.user.username} - {self.date} ({self.measurement_count}条)"
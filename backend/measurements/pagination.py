@@ -0,0 +1,197 @@
+"""
+测量/睡眠/情绪列表的分页
+替换本地内容：基于 (时间字段, id) 的 keyset（游标）分页，翻到深页时不再扫描 OFFSET 之前的所有行，
+也不需要 COUNT(*)；不带 cursor 参数时保持原有的页码分页（兼容旧客户端），count=false 时跳过计数
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    混合分页：
+
+    - 游标模式：?cursor=（首页传空值）或 ?pagination=cursor，按 (ordering_field, id) 做 keyset 查询，
+      响应中的 next/previous 为带游标的链接
+    - 页码模式（默认）：?page=N，与 PageNumberPagination 的响应格式一致
+
+    两种模式都支持 ?page_size=N，?count=false 时不计算总数（游标模式默认不计数，?count=true 开启）。
+    排序方向取自查询集当前的排序（视图的 ordering / OrderingFilter）。
+    """
+
+    ordering_field = 'measured_at'
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_query_param = 'page'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+
+    def __init__(self):
+        self.request = None
+        self.page = []
+        self.count = None
+        self.use_cursor = False
+        self.next_link = None
+        self.previous_link = None
+
+    # ------------------------------------------------------------------
+    # 参数
+    # ------------------------------------------------------------------
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def _want_count(self, request, default: bool) -> bool:
+        value = request.query_params.get(self.count_query_param)
+        if value is None:
+            return default
+        return value.lower() not in ('0', 'false', 'no')
+
+    def _is_descending(self, queryset) -> bool:
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        return bool(ordering) and ordering[0] == f'-{self.ordering_field}'
+
+    # ------------------------------------------------------------------
+    # 游标编码
+    # ------------------------------------------------------------------
+    def _encode_cursor(self, instance, reverse: bool) -> str:
+        value = getattr(instance, self.ordering_field)
+        payload = {'v': value.isoformat(), 'id': instance.pk, 'r': int(reverse)}
+        raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    def _decode_cursor(self, queryset, token: str):
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            payload = json.loads(raw)
+            field = queryset.model._meta.get_field(self.ordering_field)
+            return field.to_python(payload['v']), int(payload['id']), bool(payload.get('r'))
+        except (ValueError, KeyError, TypeError, DjangoValidationError):
+            raise ValidationError({self.cursor_query_param: '无效的游标'})
+
+    # ------------------------------------------------------------------
+    # 分页
+    # ------------------------------------------------------------------
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.use_cursor = (
+            self.cursor_query_param in request.query_params
+            or request.query_params.get('pagination') == 'cursor'
+        )
+        if self.use_cursor:
+            return self._paginate_cursor(queryset, request)
+        return self._paginate_offset(queryset, request)
+
+    def _paginate_cursor(self, queryset, request):
+        page_size = self.get_page_size(request)
+        descending = self._is_descending(queryset)
+        field = self.ordering_field
+
+        if self._want_count(request, default=False):
+            self.count = queryset.count()
+
+        token = request.query_params.get(self.cursor_query_param)
+        reverse = False
+        if token:
+            value, pk, reverse = self._decode_cursor(queryset, token)
+            # 向后翻页（previous）时沿相反方向查询，再把结果倒回来
+            forward = descending != reverse
+            if forward:
+                queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+            else:
+                queryset = queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk}))
+
+        scan_descending = descending != reverse
+        prefix = '-' if scan_descending else ''
+        rows = list(queryset.order_by(f'{prefix}{field}', f'{prefix}pk')[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        self.page = rows
+        self.next_link = None
+        self.previous_link = None
+        if rows:
+            url = remove_query_param(request.build_absolute_uri(), self.page_query_param)
+            # 正向翻页：有更多数据才有 next；从游标处开始的页才有 previous
+            if (has_more and not reverse) or reverse:
+                self.next_link = replace_query_param(
+                    url, self.cursor_query_param, self._encode_cursor(rows[-1], reverse=False))
+            if token and (not reverse or has_more):
+                self.previous_link = replace_query_param(
+                    url, self.cursor_query_param, self._encode_cursor(rows[0], reverse=True))
+        return rows
+
+    def _paginate_offset(self, queryset, request):
+        page_size = self.get_page_size(request)
+        try:
+            page_number = int(request.query_params.get(self.page_query_param, 1))
+        except (TypeError, ValueError):
+            raise NotFound('无效的页码')
+        if page_number < 1:
+            raise NotFound('无效的页码')
+
+        if self._want_count(request, default=True):
+            self.count = queryset.count()
+            if page_number > 1 and (page_number - 1) * page_size >= self.count:
+                raise NotFound('无效的页码')
+
+        offset = (page_number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        has_more = len(rows) > page_size
+        self.page = rows[:page_size]
+
+        url = request.build_absolute_uri()
+        self.next_link = replace_query_param(url, self.page_query_param, page_number + 1) if has_more else None
+        if page_number == 1:
+            self.previous_link = None
+        elif page_number == 2:
+            self.previous_link = remove_query_param(url, self.page_query_param)
+        else:
+            self.previous_link = replace_query_param(url, self.page_query_param, page_number - 1)
+        return self.page
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict()
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['next'] = self.next_link
+        payload['previous'] = self.previous_link
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'count': {'type': 'integer', 'example': 123},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class MeasurementPagination(KeysetPagination):
+    ordering_field = 'measured_at'
+
+
+class SleepLogPagination(KeysetPagination):
+    ordering_field = 'sleep_date'
+
+
+class MoodLogPagination(KeysetPagination):
+    ordering_field = 'log_date'
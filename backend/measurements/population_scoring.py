@@ -0,0 +1,283 @@
+"""
+Population Health Scoring
+Vectorized counterpart of HealthScoringService for ranking many users at once.
+Loads the scoring window for the whole population with one query per table and
+applies the range-scoring rules as NumPy piecewise functions over per-user arrays.
+"""
+
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from datetime import timedelta
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from measurements.models import Measurement, SleepLog, MoodLog
+from measurements.health_scoring import HealthScoringConfig
+
+User = get_user_model()
+
+
+def score_in_range(values: np.ndarray, optimal_range: Tuple[float, float],
+                   acceptable_range: Tuple[float, float]) -> np.ndarray:
+    """
+    Vectorized HealthScoringService.score_metric_in_range.
+
+    NaN values (missing data) stay NaN.
+    """
+    values = np.asarray(values, dtype=float)
+    opt_min, opt_max = optimal_range
+    acc_min, acc_max = acceptable_range
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        below_acceptable = np.maximum(
+            60.0 - np.minimum((acc_min - values) / (acc_min - acc_min * 0.5), 1.0) * 60.0, 0.0
+        )
+        above_acceptable = np.maximum(
+            60.0 - np.minimum((values - acc_max) / (acc_max * 0.5), 1.0) * 60.0, 0.0
+        )
+        scores = np.select(
+            [
+                (values >= opt_min) & (values <= opt_max),
+                (values >= acc_min) & (values < opt_min),
+                (values > opt_max) & (values <= acc_max),
+                values < acc_min,
+                values > acc_max,
+            ],
+            [
+                100.0,
+                60.0 + (values - acc_min) / (opt_min - acc_min) * 40.0,
+                100.0 - (values - opt_max) / (acc_max - opt_max) * 40.0,
+                below_acceptable,
+                above_acceptable,
+            ],
+            default=np.nan
+        )
+    return scores
+
+
+def _latest_mean(groups: np.ndarray, values: np.ndarray, n_groups: int,
+                 limit: Optional[int] = None, present: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Per-group mean of the first `limit` present values.
+
+    Rows must be sorted by group, newest first within each group. Groups
+    without any present value get NaN.
+    """
+    if present is None:
+        present = ~np.isnan(values)
+    if not len(groups):
+        return np.full(n_groups, np.nan)
+
+    # Rank of each present row within its group (1-based)
+    running = np.cumsum(present)
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    before = np.zeros(n_groups, dtype=running.dtype)
+    before[groups[starts]] = running[starts] - present[starts]
+    rank = running - before[groups]
+
+    keep = present if limit is None else present & (rank <= limit)
+    sums = np.bincount(groups[keep], weights=values[keep], minlength=n_groups)
+    counts = np.bincount(groups[keep], minlength=n_groups)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def overall_status(score: Optional[float]) -> str:
+    """Overall status label, as in HealthScoringService.calculate_overall_score."""
+    if score is None:
+        return 'insufficient_data'
+    if score >= 80:
+        return 'excellent'
+    if score >= 60:
+        return 'good'
+    return 'needs_attention'
+
+
+class PopulationScores:
+    """
+    Scores for a population, sorted by overall score.
+
+    Supports len() and slicing, so it can be handed to django Paginator
+    directly; records are only built for the requested slice.
+    """
+
+    def __init__(self, user_ids: np.ndarray, usernames: List[str],
+                 dimensions: Dict[str, np.ndarray], values: Dict[str, np.ndarray],
+                 overall: np.ndarray, order: np.ndarray):
+        self.user_ids = user_ids
+        self.usernames = usernames
+        self.dimensions = dimensions
+        self.values = values
+        self.overall = overall
+        self.order = order
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self._record(i) for i in self.order[item]]
+        return self._record(self.order[item])
+
+    @staticmethod
+    def _clean(value):
+        return None if np.isnan(value) else round(float(value), 1)
+
+    def _record(self, i: int) -> Dict:
+        dimensions = {}
+        for metric, scores in self.dimensions.items():
+            if metric == 'blood_pressure':
+                value = None
+                if not np.isnan(self.values['systolic'][i]):
+                    value = {
+                        'systolic': self._clean(self.values['systolic'][i]),
+                        'diastolic': self._clean(self.values['diastolic'][i]),
+                    }
+            else:
+                value = self._clean(self.values[metric][i])
+            dimensions[metric] = {'score': self._clean(scores[i]), 'value': value}
+
+        # Status from the unrounded score, as HealthScoringService does
+        raw_overall = None if np.isnan(self.overall[i]) else float(self.overall[i])
+        return {
+            'user_id': int(self.user_ids[i]),
+            'username': self.usernames[i],
+            'overall_score': self._clean(self.overall[i]),
+            'overall_status': overall_status(raw_overall),
+            'dimensions': dimensions,
+        }
+
+
+class PopulationHealthScorer:
+    """
+    Scores every user in a queryset with the HealthScoringService rules.
+
+    Each dimension uses the same window as the per-user service: latest weight
+    for BMI, mean of the last 10 readings for blood pressure, heart rate and
+    glucose, and mean of the last 14 sleep/mood logs.
+    """
+
+    def __init__(self, days: int = 30, users=None):
+        """
+        Args:
+            days: Number of days to consider for scoring (default: 30)
+            users: User queryset to score (default: all regular users)
+        """
+        self.days = days
+        self.users = users if users is not None else User.objects.filter(role='user')
+        self.config = HealthScoringConfig()
+
+    def _load_values(self) -> Tuple[np.ndarray, List[str], Dict[str, np.ndarray]]:
+        """Load per-user window values (NaN where missing), one query per table."""
+        user_rows = list(self.users.order_by('id').values_list('id', 'username', 'profile__height_cm'))
+        user_ids = np.array([row[0] for row in user_rows], dtype=np.int64)
+        usernames = [row[1] for row in user_rows]
+        heights = np.array([np.nan if row[2] is None else float(row[2]) for row in user_rows], dtype=float)
+        n_users = len(user_ids)
+
+        def group_index(ids):
+            return np.searchsorted(user_ids, np.asarray(ids, dtype=np.int64))
+
+        now = timezone.now()
+        start = now - timedelta(days=self.days)
+        start_date = start.date()
+
+        columns = ('weight_kg', 'systolic', 'diastolic', 'blood_glucose', 'heart_rate')
+        rows = list(
+            Measurement.objects.filter(user__in=self.users, measured_at__gte=start)
+            .order_by('user_id', '-measured_at')
+            .values_list('user_id', *columns)
+        )
+        groups = group_index([row[0] for row in rows])
+        raw = {
+            column: np.array([np.nan if row[i + 1] is None else float(row[i + 1]) for row in rows], dtype=float)
+            for i, column in enumerate(columns)
+        }
+
+        values = {}
+        weight = _latest_mean(groups, raw['weight_kg'], n_users, limit=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values['bmi'] = np.where(heights > 0, weight / (heights / 100.0) ** 2, np.nan)
+
+        bp_present = ~np.isnan(raw['systolic']) & ~np.isnan(raw['diastolic'])
+        values['systolic'] = _latest_mean(groups, raw['systolic'], n_users, limit=10, present=bp_present)
+        values['diastolic'] = _latest_mean(groups, raw['diastolic'], n_users, limit=10, present=bp_present)
+        values['heart_rate'] = _latest_mean(groups, raw['heart_rate'], n_users, limit=10)
+        values['blood_glucose'] = _latest_mean(groups, raw['blood_glucose'], n_users, limit=10)
+
+        sleep = list(
+            SleepLog.objects.filter(user__in=self.users, sleep_date__gte=start_date)
+            .order_by('user_id', '-sleep_date')
+            .values_list('user_id', 'duration_minutes')
+        )
+        values['sleep_quality'] = _latest_mean(
+            group_index([row[0] for row in sleep]),
+            np.array([row[1] / 60.0 for row in sleep], dtype=float),
+            n_users, limit=14
+        )
+
+        mood = list(
+            MoodLog.objects.filter(user__in=self.users, log_date__gte=start_date)
+            .order_by('user_id', '-log_date')
+            .values_list('user_id', 'mood_rating')
+        )
+        values['mood_index'] = _latest_mean(
+            group_index([row[0] for row in mood]),
+            np.array([row[1] for row in mood], dtype=float),
+            n_users, limit=14
+        )
+
+        return user_ids, usernames, values
+
+    def score_values(self, values: Dict[str, np.ndarray]) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """
+        Score a population matrix.
+
+        Args:
+            values: Per-user arrays for bmi, systolic, diastolic, heart_rate,
+                    blood_glucose, sleep_quality and mood_index (NaN = missing)
+
+        Returns:
+            (dimension scores, overall scores); NaN where there is no data
+        """
+        metrics = self.config.METRICS
+
+        dimensions = {}
+        for metric in ('bmi', 'heart_rate', 'blood_glucose', 'sleep_quality', 'mood_index'):
+            dimensions[metric] = score_in_range(
+                values[metric], metrics[metric]['optimal_range'], metrics[metric]['acceptable_range']
+            )
+        bp = metrics['blood_pressure']
+        dimensions['blood_pressure'] = (
+            score_in_range(values['systolic'], bp['systolic_optimal'], bp['systolic_acceptable'])
+            + score_in_range(values['diastolic'], bp['diastolic_optimal'], bp['diastolic_acceptable'])
+        ) / 2
+        # The per-user service weights the rounded dimension scores
+        dimensions = {metric: np.round(scores, 1) for metric, scores in dimensions.items()}
+
+        names = list(dimensions)
+        matrix = np.column_stack([dimensions[name] for name in names])
+        weights = np.array([metrics[name]['weight'] for name in names])
+        available = ~np.isnan(matrix)
+
+        weighted_sum = np.where(available, matrix, 0.0) @ weights
+        total_weight = available @ weights
+        with np.errstate(divide='ignore', invalid='ignore'):
+            overall = np.where(total_weight > 0, weighted_sum / total_weight, np.nan)
+
+        return dimensions, overall
+
+    def rank(self, descending: bool = False) -> PopulationScores:
+        """
+        Score and sort the population by overall score.
+
+        Args:
+            descending: Highest scores first (default: lowest first, i.e. users
+                        needing attention at the top). Users without data go last.
+        """
+        user_ids, usernames, values = self._load_values()
+        dimensions, overall = self.score_values(values)
+
+        key = -overall if descending else overall
+        order = np.lexsort((user_ids, key, np.isnan(overall)))
+        return PopulationScores(user_ids, usernames, dimensions, values, overall, order)
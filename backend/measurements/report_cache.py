@@ -0,0 +1,167 @@
+"""
+健康报告响应缓存与条件请求
+替换本地内容：报告的 ETag 由用户最新数据的时间戳和记录数（测量、睡眠、情绪、档案）派生，
+客户端携带 If-None-Match / If-Modified-Since 且数据未变化时返回 304；
+报告体按 ETag 缓存在 Django cache 中，数据写入提交后清除该用户的数据版本。
+多进程部署需要共享的缓存后端（如 Redis）才能让失效立即对所有进程生效，
+默认的进程内缓存下其他进程最多在 REPORT_CACHE_TIMEOUT 秒后看到新数据
+"""
+import hashlib
+from datetime import datetime
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import Measurement, SleepLog, MoodLog
+from users.models import Profile
+
+User = get_user_model()
+
+# 报告体和数据版本的缓存时间（秒）
+REPORT_CACHE_TIMEOUT = getattr(settings, 'REPORT_CACHE_TIMEOUT', 600)
+
+_VERSION_KEY = 'health_report:version:{user_id}'
+_BODY_KEY = 'health_report:body:{etag}'
+
+
+def _latest_and_count(model, user_field: str = 'user_id'):
+    """按用户聚合的最新 updated_at 和记录数子查询"""
+    rows = model.objects.filter(**{user_field: OuterRef('pk')}).order_by().values(user_field)
+    return (
+        Subquery(rows.annotate(latest=Max('updated_at')).values('latest')[:1]),
+        Subquery(rows.annotate(total=Count('pk')).values('total')[:1]),
+    )
+
+
+def get_data_version(user_id: int) -> Optional[Dict]:
+    """
+    用户报告相关数据的版本：各表最新 updated_at 和记录数
+
+    一条查询计算（每张表两个子查询），结果缓存到下一次写入或超时。
+
+    Returns:
+        {'fingerprint': str, 'last_modified': datetime 或 None}，用户不存在时返回 None
+    """
+    key = _VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is not None:
+        return version
+
+    annotations = {}
+    for name, model in (('measurement', Measurement), ('sleep', SleepLog), ('mood', MoodLog)):
+        annotations[f'{name}_latest'], annotations[f'{name}_count'] = _latest_and_count(model)
+    annotations['profile_latest'] = Subquery(
+        Profile.objects.filter(user_id=OuterRef('pk')).values('updated_at')[:1]
+    )
+
+    row = User.objects.filter(pk=user_id).annotate(**annotations).values(*annotations).first()
+    if row is None:
+        return None
+
+    timestamps = [value for name, value in row.items() if name.endswith('_latest') and value]
+    fingerprint = '|'.join(
+        f"{name}={value.isoformat() if isinstance(value, datetime) else value}"
+        for name, value in sorted(row.items())
+    )
+    version = {
+        'fingerprint': fingerprint,
+        'last_modified': max(timestamps) if timestamps else None,
+    }
+    cache.set(key, version, REPORT_CACHE_TIMEOUT)
+    return version
+
+
+def invalidate_user(user_id: int):
+    """数据写入提交后清除用户的数据版本（报告体按 ETag 缓存，版本变化后自然失效）"""
+    transaction.on_commit(lambda: cache.delete(_VERSION_KEY.format(user_id=user_id)))
+
+
+class ReportCache:
+    """
+    单个报告响应的条件请求处理
+
+    用法（在权限检查之后）:
+        report_cache = ReportCache(request, 'health_report', user_id, {'days': days})
+        cached = report_cache.cached_response()
+        if cached is not None:
+            return cached
+        ...
+        return report_cache.respond(report)
+    """
+
+    def __init__(self, request, name: str, user_id: int, params: Optional[Dict] = None):
+        self.request = request
+        self.version = get_data_version(user_id)
+        self.etag = None
+        self.last_modified = None
+
+        if self.version is not None:
+            # 报告窗口相对于当天，日期变化时报告也会变化
+            raw = '|'.join([
+                name, str(user_id), timezone.localdate().isoformat(),
+                repr(sorted((params or {}).items())), self.version['fingerprint'],
+            ])
+            self.etag = quote_etag(hashlib.sha1(raw.encode('utf-8')).hexdigest())
+            if self.version['last_modified'] is not None:
+                self.last_modified = self.version['last_modified']
+
+    def _add_headers(self, response: Response) -> Response:
+        if self.etag:
+            response['ETag'] = self.etag
+        if self.last_modified is not None:
+            response['Last-Modified'] = http_date(self.last_modified.timestamp())
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def _not_modified(self) -> bool:
+        if self.etag is None:
+            return False
+
+        if_none_match = self.request.headers.get('If-None-Match')
+        if if_none_match:
+            candidates = [tag.strip() for tag in if_none_match.split(',')]
+            return '*' in candidates or self.etag in candidates or f'W/{self.etag}' in candidates
+
+        if_modified_since = self.request.headers.get('If-Modified-Since')
+        if if_modified_since and self.last_modified is not None:
+            since = parse_http_date_safe(if_modified_since)
+            # Last-Modified 精度为秒；当天日期变化也会改变报告，只在同一天内有效
+            today_start = timezone.make_aware(
+                datetime.combine(timezone.localdate(), datetime.min.time())
+            )
+            return (
+                since is not None
+                and int(self.last_modified.timestamp()) <= since
+                and since >= int(today_start.timestamp())
+            )
+        return False
+
+    def cached_response(self) -> Optional[Response]:
+        """数据未变化时返回 304，有缓存的报告体时直接返回，否则返回 None"""
+        if self.etag is None:
+            return None
+
+        if self._not_modified():
+            return self._add_headers(Response(status=status.HTTP_304_NOT_MODIFIED))
+
+        body = cache.get(_BODY_KEY.format(etag=self.etag))
+        if body is not None:
+            return self._add_headers(Response(body, status=status.HTTP_200_OK))
+        return None
+
+    def respond(self, data, status_code: int = status.HTTP_200_OK) -> Response:
+        """返回报告并缓存（只缓存成功的报告）"""
+        response = Response(data, status=status_code)
+        if self.etag is None or status_code != status.HTTP_200_OK:
+            return response
+
+        cache.set(_BODY_KEY.format(etag=self.etag), data, REPORT_CACHE_TIMEOUT)
+        return self._add_headers(response)
@@ -32,8 +32,28 @@ class MeasurementSerializer(serializers.ModelSerializer):
             if systolic <= diastolic:
                 raise serializers.ValidationError("收缩压必须大于舒张压")
         
+        # 修改测量时间时不能与同一用户的其他记录冲突（(user, measured_at) 唯一）
+        measured_at = data.get('measured_at')
+        if self.instance is not None and measured_at and measured_at != self.instance.measured_at:
+            if Measurement.objects.filter(
+                user_id=self.instance.user_id, measured_at=measured_at
+            ).exclude(pk=self.instance.pk).exists():
+                raise serializers.ValidationError({'measured_at': '该时间已有测量记录'})
+        
         return data
     
+    def create(self, validated_data):
+        # 同一用户同一时刻的记录按 upsert 处理，设备/客户端重试不会产生重复记录
+        if 'user' not in validated_data:
+            return super().create(validated_data)
+        user = validated_data.pop('user')
+        measurement, _ = Measurement.objects.update_or_create(
+            user=user,
+            measured_at=validated_data.pop('measured_at'),
+            defaults=validated_data
+        )
+        return measurement
+    
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # 延迟导入 User queryset 避免循环 import（如果需要）
@@ -0,0 +1,150 @@
+"""
+测量数据导出服务
+替换本地内容：按用户分区流式导出测量数据（按 (user_id, measured_at, id) 做 keyset 分批查询，不一次性加载整个查询集），
+支持 CSV 和列式格式（pandas 可用的 Parquet/Feather 引擎，否则为压缩 NPZ）。
+每个分区写一个文件，互不依赖，可由多个工作进程并行导出
+"""
+import os
+from typing import Dict, Iterator, List
+
+import numpy as np
+import pandas as pd
+from django.db.models import Q
+
+from measurements.models import Measurement
+
+# 导出的列（user_id 之后）
+EXPORT_FIELDS = ['measured_at', 'weight_kg', 'systolic', 'diastolic', 'heart_rate', 'blood_glucose', 'notes']
+
+# 数值列及导出类型
+DECIMAL_FIELDS = ['weight_kg', 'blood_glucose']
+INTEGER_FIELDS = ['systolic', 'diastolic', 'heart_rate']
+
+# 每次从数据库读取的行数
+EXPORT_CHUNK_SIZE = 20000
+
+FILE_EXTENSIONS = {'csv': 'csv', 'parquet': 'parquet', 'feather': 'feather', 'npz': 'npz'}
+
+
+def resolve_format(requested: str) -> str:
+    """
+    确定实际使用的导出格式
+
+    Parquet/Feather 需要 pandas 的可选引擎（pyarrow，Parquet 也可用 fastparquet），
+    不可用时回退到压缩 NPZ。
+    """
+    if requested in ('csv', 'npz'):
+        return requested
+    engines = ['pyarrow', 'fastparquet'] if requested == 'parquet' else ['pyarrow']
+    for engine in engines:
+        try:
+            __import__(engine)
+            return requested
+        except ImportError:
+            continue
+    return 'npz'
+
+
+def _chunk_frame(rows: List[tuple], include_user_id: bool) -> pd.DataFrame:
+    """一块 values_list 行 -> 按列转换类型的 DataFrame"""
+    df = pd.DataFrame.from_records(rows, columns=['user_id', *EXPORT_FIELDS])
+    if not include_user_id:
+        df = df.drop(columns='user_id')
+    df['measured_at'] = pd.to_datetime(df['measured_at'])
+    for field in DECIMAL_FIELDS:
+        df[field] = df[field].astype('float64')
+    for field in INTEGER_FIELDS:
+        df[field] = df[field].astype('Int64')
+    return df
+
+
+def _write_npz(path: str, frames: List[pd.DataFrame]):
+    """数值列写入压缩 NPZ（缺失值为 NaN，时间为 UTC datetime64[s]，不含备注）"""
+    df = pd.concat(frames, ignore_index=True)
+    measured_at = df['measured_at']
+    if measured_at.dt.tz is not None:
+        measured_at = measured_at.dt.tz_convert('UTC').dt.tz_localize(None)
+    arrays = {'measured_at': measured_at.to_numpy(dtype='datetime64[s]')}
+    if 'user_id' in df:
+        arrays['user_id'] = df['user_id'].to_numpy(dtype='int64')
+    for field in DECIMAL_FIELDS + INTEGER_FIELDS:
+        arrays[field] = df[field].to_numpy(dtype='float64', na_value=np.nan)
+    np.savez_compressed(path, **arrays)
+
+
+def iter_partition_chunks(user_ids: List[int], chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[List[tuple]]:
+    """
+    按 (user_id, measured_at, id) 分批读取一组用户的测量数据，每次产出一块 (user_id, *EXPORT_FIELDS) 行
+
+    每批以上一批最后一行为游标做 keyset 查询（与管理员流式导出相同），内存占用只与 chunk_size 有关。
+    MySQL 驱动会把整个结果集缓存在客户端，单独使用 .iterator() 并不能流式读取，因此分批查询。
+    """
+    queryset = (
+        Measurement.objects.filter(user_id__in=user_ids)
+        .order_by('user_id', 'measured_at', 'id')
+        .values_list('id', 'user_id', *EXPORT_FIELDS)
+    )
+
+    last = None
+    while True:
+        batch = queryset
+        if last is not None:
+            last_id, last_user_id, last_measured_at = last[:3]
+            batch = batch.filter(
+                Q(user_id__gt=last_user_id)
+                | Q(user_id=last_user_id, measured_at__gt=last_measured_at)
+                | Q(user_id=last_user_id, measured_at=last_measured_at, id__gt=last_id)
+            )
+        rows = list(batch[:chunk_size])
+        if rows:
+            yield [row[1:] for row in rows]
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1]
+
+
+def export_partition(user_ids: List[int], path: str, fmt: str,
+                     chunk_size: int = EXPORT_CHUNK_SIZE, include_user_id: bool = True) -> Dict:
+    """
+    导出一组用户的测量数据到一个文件（按用户、时间排序）
+
+    按 keyset 分批读取（iter_partition_chunks）。CSV 逐块追加写入，内存只与 chunk_size 有关；
+    列式格式在内存中拼接整个分区后一次写入，
+    内存与分区大小有关（由调用方控制每个分区的用户数）。
+
+    Args:
+        user_ids: 分区内的用户ID
+        path: 输出文件路径
+        fmt: csv / parquet / feather / npz（已经过 resolve_format）
+        chunk_size: 每次从数据库读取的行数
+        include_user_id: 是否输出 user_id 列
+
+    Returns:
+        {'path', 'rows', 'users'}
+    """
+    rows_written = 0
+    frames = []
+
+    for chunk in iter_partition_chunks(user_ids, chunk_size):
+        df = _chunk_frame(chunk, include_user_id)
+        if fmt == 'csv':
+            df.to_csv(path, mode='w' if rows_written == 0 else 'a', header=rows_written == 0,
+                      index=False, encoding='utf-8-sig' if rows_written == 0 else 'utf-8')
+        else:
+            frames.append(df)
+        rows_written += len(df)
+
+    if frames:
+        if fmt == 'parquet':
+            pd.concat(frames, ignore_index=True).to_parquet(path, index=False)
+        elif fmt == 'feather':
+            pd.concat(frames, ignore_index=True).to_feather(path)
+        else:
+            _write_npz(path, frames)
+
+    return {'path': path if rows_written else None, 'rows': rows_written, 'users': len(user_ids)}
+
+
+def partition_path(output_dir: str, index: int, fmt: str) -> str:
+    """第 index 个分区的输出文件路径"""
+    return os.path.join(output_dir, f'health_data_part{index:05d}.{FILE_EXTENSIONS[fmt]}')
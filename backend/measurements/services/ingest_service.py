@@ -0,0 +1,234 @@
+"""
+测量数据批量写入服务
+替换本地内容：设备/批量上传时逐条按 MeasurementSerializer 的规则校验（一次遍历，收集每条的错误），
+按 (user, measured_at) 唯一键在一个事务中 upsert（与库中完全相同的记录跳过，已有记录只更新本条提供的字段，
+与单条创建接口的 update_or_create 一致），
+并发送 measurements_bulk_created 信号更新每日汇总、评分快照和报告缓存。
+设备重传、重复导入都是幂等的。
+CSV/DataFrame 导入按列转换整块数据（measurements_from_frame），不逐行构造
+"""
+from typing import Dict, Iterable, List, Tuple
+
+import pandas as pd
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from measurements import timeseries_cache
+from measurements.models import Measurement
+from measurements.report_cache import invalidate_user
+from measurements.serializers import MeasurementSerializer
+from measurements.services.rollup_service import rebuild_users
+from measurements.services.snapshot_service import refresh_user_snapshots
+from measurements.signals import measurements_bulk_created
+
+# 单次请求最多接收的记录数
+MAX_BULK_ITEMS = getattr(settings, 'MEASUREMENT_BULK_MAX_ITEMS', 5000)
+
+# bulk_create 每条 INSERT 的行数
+BULK_BATCH_SIZE = 1000
+
+# upsert 冲突时覆盖的字段
+UPSERT_FIELDS = ['weight_kg', 'systolic', 'diastolic', 'blood_glucose', 'heart_rate', 'notes', 'updated_at']
+
+
+def upsert_measurements(measurements: List[Measurement], batch_size: int = BULK_BATCH_SIZE) -> List[Measurement]:
+    """
+    按 (user, measured_at) 批量 upsert：不存在则插入，已存在则用实例的值覆盖 UPSERT_FIELDS
+
+    实例需带有完整的字段值（未设置的字段会写为 NULL/默认值），部分更新需由调用方先与库中的值合并。
+    同一批内重复的键只保留最后一条（PostgreSQL 不允许一条语句两次更新同一行）。
+    不触发 post_save，调用方需自行发送 measurements_bulk_created，
+    或在导入完成后调用 refresh_imported_users。
+
+    Returns:
+        实际写入的（去重后的）测量实例
+    """
+    unique = {}
+    for measurement in measurements:
+        unique[(measurement.user_id, measurement.measured_at)] = measurement
+    rows = list(unique.values())
+
+    options = {'update_conflicts': True, 'update_fields': UPSERT_FIELDS}
+    # MySQL 的 ON DUPLICATE KEY UPDATE 不能指定冲突目标
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['user', 'measured_at']
+    Measurement.objects.bulk_create(rows, batch_size=batch_size, **options)
+    return rows
+
+
+def delete_user_measurements(user_ids: Iterable[int]) -> int:
+    """
+    删除这些用户的全部测量（导入前清理旧数据）
+
+    直接执行一条 DELETE，不把记录加载到内存、不逐条触发 post_delete；
+    调用方导入完成后需调用 refresh_imported_users 刷新汇总和快照。
+
+    Returns:
+        删除的记录数
+    """
+    user_ids = list(user_ids)
+    queryset = Measurement.objects.filter(user_id__in=user_ids)
+    deleted = queryset._raw_delete(queryset.db)
+    timeseries_cache.invalidate_users(user_ids)
+    return deleted
+
+
+def refresh_imported_users(user_ids: Iterable[int]) -> int:
+    """
+    批量导入（不发送 measurements_bulk_created）完成后刷新这些用户的派生数据
+
+    重建每日汇总、使时间序列缓存失效，重算评分快照并清除报告缓存。
+    导入会替换用户的全部测量，因此重算该用户的全部已有快照。
+
+    Returns:
+        刷新的快照数
+    """
+    user_ids = sorted(set(user_ids))
+    rebuild_users(user_ids)
+    timeseries_cache.invalidate_users(user_ids)
+
+    refreshed = 0
+    for user_id in user_ids:
+        refreshed += refresh_user_snapshots(user_id)
+        invalidate_user(user_id)
+    return refreshed
+
+
+def _column_values(series: pd.Series, decimals: int) -> List:
+    """数值列 -> Python 值列表（缺失为 None，整数字段为 int）"""
+    values = series.astype('float64').round(decimals).tolist()
+    if decimals:
+        return [None if value != value else value for value in values]
+    return [None if value != value else int(value) for value in values]
+
+
+def measurements_from_frame(frame: pd.DataFrame, user_ids: Dict[str, int],
+                            notes: str = '') -> Tuple[List[Measurement], int]:
+    """
+    把一块测量数据按列转换为 Measurement 实例（用于 CSV/生成数据的批量导入）
+
+    Args:
+        frame: 含 username、measured_at 和各指标列的数据块（PyHealth 生成器/CSV 的格式），
+            不带时区的时间按当前时区解释
+        user_ids: 用户名 -> 用户ID
+        notes: 写入每条记录的备注
+
+    Returns:
+        (Measurement 实例列表, 找不到用户或时间无效而跳过的行数)
+    """
+    user_id = frame['username'].map(user_ids)
+    measured_at = pd.to_datetime(frame['measured_at'], errors='coerce')
+    if settings.USE_TZ and measured_at.dt.tz is None:
+        measured_at = measured_at.dt.tz_localize(
+            timezone.get_current_timezone(), ambiguous='NaT', nonexistent='shift_forward'
+        )
+
+    valid = user_id.notna() & measured_at.notna()
+    skipped = int((~valid).sum())
+    if skipped:
+        frame, user_id, measured_at = frame[valid], user_id[valid], measured_at[valid]
+
+    columns = zip(
+        user_id.astype('int64').tolist(),
+        measured_at.dt.to_pydatetime(),
+        _column_values(frame['weight_kg'], 1),
+        _column_values(frame['systolic'], 0),
+        _column_values(frame['diastolic'], 0),
+        _column_values(frame['blood_glucose'], 1),
+        _column_values(frame['heart_rate'], 0),
+    )
+    measurements = [
+        Measurement(
+            user_id=uid, measured_at=at, weight_kg=weight_kg, systolic=systolic,
+            diastolic=diastolic, blood_glucose=blood_glucose, heart_rate=heart_rate, notes=notes
+        )
+        for uid, at, weight_kg, systolic, diastolic, blood_glucose, heart_rate in columns
+    ]
+    return measurements, skipped
+
+
+def validate_items(items: List) -> Tuple[List, List[Dict]]:
+    """
+    逐条校验
+
+    Returns:
+        (合法记录 [(下标, validated_data)], 错误 [{'index': 下标, 'errors': {...}}])
+    """
+    serializer = MeasurementSerializer()
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'errors': {'non_field_errors': ['每条记录必须是对象']}})
+            continue
+        try:
+            valid.append((index, serializer.run_validation(item)))
+        except ValidationError as e:
+            errors.append({'index': index, 'errors': e.detail})
+    return valid, errors
+
+
+def ingest_measurements(user, items: List) -> Dict:
+    """
+    批量写入某用户的测量数据
+
+    Args:
+        user: 记录所属用户
+        items: 原始记录列表（与单条创建接口的字段相同）
+
+    Returns:
+        {'received', 'created', 'updated', 'duplicates': [下标], 'errors': [{'index', 'errors'}]}
+        duplicates 为与库中记录完全相同或本批内重复的记录，updated 为更新了已有记录的条数；
+        更新已有记录时只修改本条提供的字段，未提供的字段保留库中的值
+    """
+    valid, errors = validate_items(items)
+
+    duplicates = []
+    created, updated = [], []
+    with transaction.atomic():
+        existing = {}
+        if valid:
+            # 用时间范围（走 (user, measured_at) 唯一索引）代替超长的 IN 列表
+            times = [data['measured_at'] for _, data in valid]
+            existing = {
+                row[0]: row[1:] for row in Measurement.objects.filter(
+                    user=user, measured_at__gte=min(times), measured_at__lte=max(times)
+                ).values_list('measured_at', *UPSERT_FIELDS[:-1])
+            }
+
+        seen = set()
+        for index, data in valid:
+            measured_at = data['measured_at']
+            if measured_at in seen:
+                duplicates.append(index)
+                continue
+            seen.add(measured_at)
+
+            current = existing.get(measured_at)
+            if current is None:
+                created.append(Measurement(user=user, **data))
+                continue
+
+            # 已有记录：未提供的字段保留库中的值
+            merged = dict(zip(UPSERT_FIELDS[:-1], current))
+            merged.update(data)
+            measurement = Measurement(user=user, **merged)
+            if current == tuple(getattr(measurement, field) for field in UPSERT_FIELDS[:-1]):
+                duplicates.append(index)
+            else:
+                updated.append(measurement)
+
+        if created or updated:
+            upsert_measurements(created + updated)
+            measurements_bulk_created.send(
+                sender=Measurement, user_id=user.id, measurements=created, updated=updated
+            )
+
+    return {
+        'received': len(items),
+        'created': len(created),
+        'updated': len(updated),
+        'duplicates': duplicates,
+        'errors': errors,
+    }
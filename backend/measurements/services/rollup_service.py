@@ -0,0 +1,290 @@
+"""
+每日测量汇总服务
+替换本地内容：按用户、按本地日期维护各指标的 count/sum/min/max/平方和（MeasurementDaily）。
+新增测量时增量累加，修改/删除时只重算受影响的那一天；批量导入后或数据不一致时
+由 rebuild_measurement_daily 命令重建。预测、趋势和统计读取汇总表，计算量随天数而非读数增长
+"""
+import math
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FloatField, Max, Min, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
+
+from measurements.models import Measurement, MeasurementDaily
+
+ROLLUP_METRICS = ('weight_kg', 'systolic', 'diastolic', 'heart_rate', 'blood_glucose')
+
+# 重建时每次写入的汇总行数
+REBUILD_BATCH_SIZE = 1000
+
+
+def _day_bounds(day: date):
+    """本地日期对应的 [开始, 结束) 时间范围"""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+    return start, end
+
+
+def add_measurement(user_id: int, measured_at: datetime, values: Dict):
+    """
+    把一条新测量累加到当天的汇总行（不重新扫描当天的其他读数）
+
+    Args:
+        user_id: 用户ID
+        measured_at: 测量时间
+        values: 指标名 -> 值（None 表示未测量）
+    """
+    day = timezone.localdate(measured_at)
+    daily, _ = MeasurementDaily.objects.get_or_create(user_id=user_id, date=day)
+
+    updates = {'measurement_count': F('measurement_count') + 1}
+    for metric in ROLLUP_METRICS:
+        value = values.get(metric)
+        if value is None:
+            continue
+        value = float(value)
+        updates[f'{metric}_count'] = F(f'{metric}_count') + 1
+        updates[f'{metric}_sum'] = F(f'{metric}_sum') + value
+        updates[f'{metric}_sumsq'] = F(f'{metric}_sumsq') + value * value
+        # 多数数据库中 LEAST/GREATEST 遇到 NULL 返回 NULL，先用新值补齐
+        updates[f'{metric}_min'] = Least(Coalesce(f'{metric}_min', Value(value)), Value(value))
+        updates[f'{metric}_max'] = Greatest(Coalesce(f'{metric}_max', Value(value)), Value(value))
+
+    MeasurementDaily.objects.filter(pk=daily.pk).update(**updates)
+
+
+def add_measurements(user_id: int, rows: Iterable) -> int:
+    """
+    把一批新测量合并到汇总表（批量写入不触发 post_save，由调用方在同一事务中调用）
+
+    先在内存中按天聚合，再与已有汇总行合并：一次读取（加行锁）、一次批量更新、一次批量插入。
+
+    Args:
+        user_id: 用户ID
+        rows: (measured_at, weight_kg, systolic, diastolic, heart_rate, blood_glucose) 行
+
+    Returns:
+        受影响的天数
+    """
+    days = aggregate_rows(rows)
+    if not days:
+        return 0
+
+    existing = {
+        daily.date: daily for daily in
+        MeasurementDaily.objects.select_for_update().filter(user_id=user_id, date__in=list(days))
+    }
+    to_create, to_update = [], []
+    now = timezone.now()
+    for day, stats in days.items():
+        daily = existing.get(day)
+        if daily is None:
+            to_create.append(MeasurementDaily(user_id=user_id, date=day, **stats))
+            continue
+        for name, value in stats.items():
+            current = getattr(daily, name)
+            if name.endswith('_min'):
+                value = value if current is None else current if value is None else min(current, value)
+            elif name.endswith('_max'):
+                value = value if current is None else current if value is None else max(current, value)
+            else:
+                value = current + value
+            setattr(daily, name, value)
+        daily.updated_at = now
+        to_update.append(daily)
+
+    if to_update:
+        MeasurementDaily.objects.bulk_update(
+            to_update, [*stats_fields(), 'updated_at'], batch_size=REBUILD_BATCH_SIZE
+        )
+    if to_create:
+        try:
+            with transaction.atomic():
+                MeasurementDaily.objects.bulk_create(to_create, batch_size=REBUILD_BATCH_SIZE)
+        except IntegrityError:
+            # 并发写入已创建了同一天的汇总行：按原始数据（含本事务刚写入的行）重算这些天
+            for daily in to_create:
+                rebuild_day(user_id, daily.date)
+    return len(days)
+
+
+def stats_fields() -> List[str]:
+    """汇总行中的统计字段名"""
+    return ['measurement_count'] + [
+        f'{metric}_{stat}' for metric in ROLLUP_METRICS for stat in ('count', 'sum', 'min', 'max', 'sumsq')
+    ]
+
+
+def rebuild_day(user_id: int, day: date) -> Optional[MeasurementDaily]:
+    """
+    从原始测量重算某用户某一天的汇总（修改/删除测量后调用）
+
+    当天没有测量时删除汇总行并返回 None。
+    """
+    start, end = _day_bounds(day)
+    aggregates = {'measurement_count': Count('pk')}
+    for metric in ROLLUP_METRICS:
+        aggregates[f'{metric}_count'] = Count(metric)
+        aggregates[f'{metric}_sum'] = Sum(metric, output_field=FloatField())
+        aggregates[f'{metric}_min'] = Min(metric)
+        aggregates[f'{metric}_max'] = Max(metric)
+        aggregates[f'{metric}_sumsq'] = Sum(F(metric) * F(metric), output_field=FloatField())
+
+    row = Measurement.objects.filter(
+        user_id=user_id, measured_at__gte=start, measured_at__lt=end
+    ).aggregate(**aggregates)
+
+    if not row['measurement_count']:
+        MeasurementDaily.objects.filter(user_id=user_id, date=day).delete()
+        return None
+
+    defaults = {}
+    for name, value in row.items():
+        if name.endswith(('_min', '_max')):
+            defaults[name] = float(value) if value is not None else None
+        elif name.endswith('_count'):
+            defaults[name] = value
+        else:
+            defaults[name] = float(value or 0)
+
+    daily, _ = MeasurementDaily.objects.update_or_create(user_id=user_id, date=day, defaults=defaults)
+    return daily
+
+
+def aggregate_rows(rows: Iterable) -> Dict[date, Dict]:
+    """
+    把 (measured_at, weight_kg, systolic, diastolic, heart_rate, blood_glucose) 行
+    按本地日期聚合为汇总字段
+    """
+    days = defaultdict(lambda: {
+        name: None if name.endswith(('_min', '_max')) else 0 for name in stats_fields()
+    })
+
+    for measured_at, *values in rows:
+        stats = days[timezone.localdate(measured_at)]
+        stats['measurement_count'] += 1
+        for metric, value in zip(ROLLUP_METRICS, values):
+            if value is None:
+                continue
+            value = float(value)
+            stats[f'{metric}_count'] += 1
+            stats[f'{metric}_sum'] += value
+            stats[f'{metric}_sumsq'] += value * value
+            low, high = stats[f'{metric}_min'], stats[f'{metric}_max']
+            stats[f'{metric}_min'] = value if low is None else min(low, value)
+            stats[f'{metric}_max'] = value if high is None else max(high, value)
+    return days
+
+
+def rebuild_user(user_id: int, measurement_model=Measurement, daily_model=MeasurementDaily) -> int:
+    """
+    从原始测量重建某用户的全部汇总行
+
+    模型可以替换为迁移中的历史模型。
+
+    Returns:
+        写入的汇总行数
+    """
+    rows = (
+        measurement_model.objects.filter(user_id=user_id)
+        .order_by('measured_at')
+        .values_list('measured_at', *ROLLUP_METRICS)
+        .iterator(chunk_size=REBUILD_BATCH_SIZE)
+    )
+    days = aggregate_rows(rows)
+
+    daily_model.objects.filter(user_id=user_id).delete()
+    daily_model.objects.bulk_create(
+        [daily_model(user_id=user_id, date=day, **stats) for day, stats in sorted(days.items())],
+        batch_size=REBUILD_BATCH_SIZE
+    )
+    return len(days)
+
+
+def rebuild_users(user_ids: Iterable[int]) -> int:
+    """批量导入后重建这些用户的汇总"""
+    return sum(rebuild_user(user_id) for user_id in set(user_ids))
+
+
+# ------------------------------------------------------------------
+# 读取
+# ------------------------------------------------------------------
+def summarize(count: int, total: float, sumsq: float) -> Dict:
+    """由 count/sum/平方和 计算均值和（总体）标准差"""
+    if not count:
+        return {'count': 0, 'avg': None, 'std_dev': None}
+    mean = total / count
+    variance = max(sumsq / count - mean * mean, 0.0)
+    return {'count': count, 'avg': mean, 'std_dev': math.sqrt(variance)}
+
+
+def _summary_aggregates(metrics) -> Dict:
+    aggregates = {'measurement_count': Coalesce(Sum('measurement_count'), 0)}
+    for metric in metrics:
+        aggregates[f'{metric}_count'] = Coalesce(Sum(f'{metric}_count'), 0)
+        aggregates[f'{metric}_sum'] = Coalesce(Sum(f'{metric}_sum'), 0.0)
+        aggregates[f'{metric}_sumsq'] = Coalesce(Sum(f'{metric}_sumsq'), 0.0)
+        aggregates[f'{metric}_min'] = Min(f'{metric}_min')
+        aggregates[f'{metric}_max'] = Max(f'{metric}_max')
+    return aggregates
+
+
+def metric_summary(queryset, metrics=ROLLUP_METRICS) -> Dict[str, Dict]:
+    """
+    汇总行查询集上各指标的 count/avg/min/max/std_dev（一条聚合查询）
+
+    Args:
+        queryset: MeasurementDaily 查询集（已按用户/日期过滤）
+
+    Returns:
+        指标名 -> 统计值，另含 'measurement_count'（测量记录总数）
+    """
+    row = queryset.aggregate(**_summary_aggregates(metrics))
+    summary = {metric: _metric_stats(row, metric) for metric in metrics}
+    summary['measurement_count'] = row['measurement_count']
+    return summary
+
+
+def metric_summary_by_user(queryset, metrics=ROLLUP_METRICS) -> Dict[int, Dict]:
+    """按用户分组的 metric_summary（一条 GROUP BY 查询），按用户ID升序"""
+    rows = (
+        queryset.order_by('user_id').values('user_id')
+        .annotate(**_summary_aggregates(metrics))
+    )
+    result = {}
+    for row in rows:
+        summary = {metric: _metric_stats(row, metric) for metric in metrics}
+        summary['measurement_count'] = row['measurement_count']
+        result[row['user_id']] = summary
+    return result
+
+
+def _metric_stats(row: Dict, metric: str) -> Dict:
+    stats = summarize(row[f'{metric}_count'], row[f'{metric}_sum'], row[f'{metric}_sumsq'])
+    stats['min'] = row[f'{metric}_min']
+    stats['max'] = row[f'{metric}_max']
+    return stats
+
+
+def daily_series(user_id: int, metric: str, start_date: Optional[date] = None) -> List[Dict]:
+    """
+    某指标的每日序列（按日期升序，只包含有读数的日期）
+
+    Returns:
+        [{'date': date, 'count', 'avg', 'min', 'max', 'std_dev'}, ...]
+    """
+    queryset = MeasurementDaily.objects.filter(user_id=user_id, **{f'{metric}_count__gt': 0})
+    if start_date is not None:
+        queryset = queryset.filter(date__gte=start_date)
+
+    fields = [f'{metric}_{stat}' for stat in ('count', 'sum', 'min', 'max', 'sumsq')]
+    series = []
+    for row in queryset.order_by('date').values('date', *fields):
+        stats = _metric_stats(row, metric)
+        stats['date'] = row['date']
+        series.append(stats)
+    return series
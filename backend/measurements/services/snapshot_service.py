@@ -0,0 +1,189 @@
+"""
+健康评分快照服务
+替换本地内容：按天持久化每个用户的综合评分和各维度评分。报告直接读取当天快照，
+新的测量/睡眠/情绪记录提交后增量刷新受影响的快照，历史快照由 backfill_health_scores 命令回填
+"""
+import logging
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from measurements.health_scoring import HealthScoringService
+from measurements.models import HealthScoreSnapshot
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+# 默认评估窗口（天），写入时总会保证该窗口的当天快照是最新的
+SNAPSHOT_DAYS = getattr(settings, 'HEALTH_SCORE_SNAPSHOT_DAYS', 30)
+
+DIMENSION_FIELDS = {
+    'bmi': 'bmi_score',
+    'blood_pressure': 'blood_pressure_score',
+    'heart_rate': 'heart_rate_score',
+    'blood_glucose': 'blood_glucose_score',
+    'sleep_quality': 'sleep_quality_score',
+    'mood_index': 'mood_index_score',
+}
+
+# 同一事务内待刷新的用户: user_id -> 最早变更日期
+_PENDING_ATTR = '_health_score_pending_refresh'
+
+
+def refresh_snapshot(user_id: int, snapshot_date: Optional[date] = None,
+                     days: int = SNAPSHOT_DAYS) -> HealthScoreSnapshot:
+    """
+    计算并保存某一天的评分快照
+
+    Args:
+        user_id: 用户ID
+        snapshot_date: 快照日期（默认今天），评估窗口截止到该日结束
+        days: 评估窗口（天）
+    """
+    snapshot_date = snapshot_date or timezone.localdate()
+    report = HealthScoringService(user_id, days=days, as_of=snapshot_date).calculate_overall_score()
+
+    defaults = {
+        'overall_score': report['overall_score'],
+        'overall_status': report['overall_status'],
+        'report': report,
+    }
+    for dimension, field in DIMENSION_FIELDS.items():
+        score = report['dimensions'][dimension]['score']
+        defaults[field] = float(score) if score is not None else None
+
+    snapshot, _ = HealthScoreSnapshot.objects.update_or_create(
+        user_id=user_id,
+        snapshot_date=snapshot_date,
+        evaluation_period_days=days,
+        defaults=defaults
+    )
+    return snapshot
+
+
+def refresh_affected_snapshots(user_id: int, changed_date: date) -> int:
+    """
+    刷新评估窗口覆盖 changed_date 的已有快照，并保证今天的默认快照最新
+
+    Returns:
+        刷新的快照数
+    """
+    today = timezone.localdate()
+    targets = set()
+
+    existing = HealthScoreSnapshot.objects.filter(
+        user_id=user_id,
+        snapshot_date__gte=changed_date
+    ).values_list('snapshot_date', 'evaluation_period_days')
+    for snapshot_date, days in existing:
+        # 快照窗口为 [snapshot_date - days + 1, snapshot_date]
+        if (snapshot_date - changed_date).days < days:
+            targets.add((snapshot_date, days))
+
+    if changed_date <= today and (today - changed_date).days < SNAPSHOT_DAYS:
+        targets.add((today, SNAPSHOT_DAYS))
+
+    for snapshot_date, days in sorted(targets):
+        refresh_snapshot(user_id, snapshot_date, days)
+    return len(targets)
+
+
+def refresh_user_snapshots(user_id: int) -> int:
+    """
+    重算用户全部已有快照，并保证今天的默认快照最新（批量导入替换了用户的全部测量后调用）
+
+    Returns:
+        刷新的快照数
+    """
+    targets = set(
+        HealthScoreSnapshot.objects.filter(user_id=user_id)
+        .values_list('snapshot_date', 'evaluation_period_days')
+    )
+    targets.add((timezone.localdate(), SNAPSHOT_DAYS))
+    for snapshot_date, days in sorted(targets):
+        refresh_snapshot(user_id, snapshot_date, days)
+    return len(targets)
+
+
+def _flush_pending_refreshes():
+    pending = getattr(connection, _PENDING_ATTR, None)
+    if not pending:
+        return
+    setattr(connection, _PENDING_ATTR, {})
+
+    for user_id, changed_date in pending.items():
+        try:
+            refresh_affected_snapshots(user_id, changed_date)
+        except User.DoesNotExist:
+            continue  # 用户已删除（级联删除其记录）
+        except (DatabaseError, ValueError, ArithmeticError):
+            # 快照刷新失败（锁超时、异常数据等）不影响已提交的数据写入，下次写入或定时回填时会重新计算
+            logger.exception(f"Failed to refresh health score snapshots for user {user_id} from {changed_date}")
+
+
+def schedule_refresh(user_id: int, changed_date: date):
+    """
+    在当前事务提交后刷新用户的评分快照
+
+    同一事务内的多次写入按用户合并，只刷新一次（从最早的变更日期开始）。
+    """
+    pending = getattr(connection, _PENDING_ATTR, None)
+    if pending is None:
+        pending = {}
+        setattr(connection, _PENDING_ATTR, pending)
+
+    previous = pending.get(user_id)
+    pending[user_id] = changed_date if previous is None else min(previous, changed_date)
+
+    # 每次都注册回调：回调会取走全部待刷新用户，后续回调为空操作；
+    # 事务回滚时回调被丢弃，残留的条目在下一次提交时刷新（按实际数据重算，无副作用）
+    transaction.on_commit(_flush_pending_refreshes)
+
+
+def get_current_report(user_id: int, days: int = SNAPSHOT_DAYS) -> Dict:
+    """读取今天的评分报告，没有快照时计算并保存"""
+    snapshot = HealthScoreSnapshot.objects.filter(
+        user_id=user_id,
+        snapshot_date=timezone.localdate(),
+        evaluation_period_days=days
+    ).only('report').first()
+
+    if snapshot is None:
+        snapshot = refresh_snapshot(user_id, days=days)
+    return snapshot.report
+
+
+def get_score_history(user_id: int, start_date: date, end_date: Optional[date] = None,
+                      days: int = SNAPSHOT_DAYS) -> List[Dict]:
+    """
+    评分随时间变化的序列（按日期升序）
+
+    只读取已有快照，缺失的日期需先运行 backfill_health_scores 回填。
+    """
+    end_date = end_date or timezone.localdate()
+    fields = ['snapshot_date', 'overall_score', 'overall_status', *DIMENSION_FIELDS.values()]
+
+    snapshots = HealthScoreSnapshot.objects.filter(
+        user_id=user_id,
+        evaluation_period_days=days,
+        snapshot_date__gte=start_date,
+        snapshot_date__lte=end_date
+    ).order_by('snapshot_date').values(*fields)
+
+    return [{
+        'date': row['snapshot_date'].isoformat(),
+        'overall_score': row['overall_score'],
+        'overall_status': row['overall_status'],
+        'dimensions': {dimension: row[field] for dimension, field in DIMENSION_FIELDS.items()},
+    } for row in snapshots]
+
+
+def score_history_since(user_id: int, history_days: int, days: int = SNAPSHOT_DAYS) -> List[Dict]:
+    """最近 history_days 天的评分序列"""
+    today = timezone.localdate()
+    return get_score_history(user_id, today - timedelta(days=history_days - 1), today, days)
@@ -0,0 +1,172 @@
+"""
+测量数据的信号处理
+替换本地内容：在测量记录写入/删除时维护增量统计和每日汇总，
+并在测量/睡眠/情绪记录变更提交后刷新健康评分快照、清除报告缓存
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .models import Measurement, SleepLog, MoodLog
+from .live_stats import rolling_statistics
+from .report_cache import invalidate_user
+from .services.snapshot_service import schedule_refresh
+from .services import rollup_service
+from . import timeseries_cache
+from users.models import Profile
+
+User = get_user_model()
+
+# 批量写入测量（bulk_create / upsert 不触发 post_save）后发送
+# 参数: sender=Measurement, user_id, measurements（新插入的实例列表），
+#       updated（覆盖了已有记录的实例列表，可省略）
+measurements_bulk_created = Signal()
+
+
+@receiver(pre_save, sender=Measurement)
+def remember_previous_measurement(sender, instance, **kwargs):
+    """更新前记录旧值，便于从增量统计中扣除"""
+    instance._previous_values = None
+    if instance.pk and not kwargs.get('raw'):
+        instance._previous_values = sender.objects.filter(pk=instance.pk).values(
+            'user_id', 'measured_at', 'systolic', 'heart_rate'
+        ).first()
+
+
+@receiver(post_save, sender=Measurement)
+def measurement_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_values', None)
+    if previous:
+        rolling_statistics.remove(
+            previous['user_id'], previous['measured_at'],
+            previous['systolic'], previous['heart_rate']
+        )
+    rolling_statistics.add(
+        instance.user_id, instance.measured_at, instance.systolic, instance.heart_rate
+    )
+
+    # 每日汇总与测量写入在同一事务中：新增时直接累加，修改时重算旧日期和新日期
+    new_day = timezone.localdate(instance.measured_at)
+    if previous:
+        previous_day = timezone.localdate(previous['measured_at'])
+        rollup_service.rebuild_day(previous['user_id'], previous_day)
+        if (previous['user_id'], previous_day) != (instance.user_id, new_day):
+            rollup_service.rebuild_day(instance.user_id, new_day)
+        timeseries_cache.invalidate(previous['user_id'], instance.user_id)
+    elif created and not kwargs.get('raw'):
+        rollup_service.add_measurement(instance.user_id, instance.measured_at, {
+            metric: getattr(instance, metric) for metric in rollup_service.ROLLUP_METRICS
+        })
+        timeseries_cache.append(instance.user_id, [instance])
+    else:
+        rollup_service.rebuild_day(instance.user_id, new_day)
+        timeseries_cache.invalidate(instance.user_id)
+
+    if kwargs.get('raw'):
+        return
+    changed_date = timezone.localdate(instance.measured_at)
+    if previous:
+        if previous['user_id'] != instance.user_id:
+            schedule_refresh(previous['user_id'], timezone.localdate(previous['measured_at']))
+            invalidate_user(previous['user_id'])
+        else:
+            changed_date = min(changed_date, timezone.localdate(previous['measured_at']))
+    schedule_refresh(instance.user_id, changed_date)
+    invalidate_user(instance.user_id)
+
+
+@receiver(post_delete, sender=Measurement)
+def measurement_deleted(sender, instance, **kwargs):
+    rolling_statistics.remove(
+        instance.user_id, instance.measured_at, instance.systolic, instance.heart_rate
+    )
+    rollup_service.rebuild_day(instance.user_id, timezone.localdate(instance.measured_at))
+    timeseries_cache.invalidate(instance.user_id)
+    schedule_refresh(instance.user_id, timezone.localdate(instance.measured_at))
+    invalidate_user(instance.user_id)
+
+
+@receiver(measurements_bulk_created, sender=Measurement)
+def measurements_bulk_saved(sender, user_id, measurements, updated=(), **kwargs):
+    """批量写入后一次性更新增量统计和每日汇总，并调度快照刷新"""
+    if not measurements and not updated:
+        return
+    for measurement in measurements:
+        rolling_statistics.add(user_id, measurement.measured_at, measurement.systolic, measurement.heart_rate)
+
+    rollup_service.add_measurements(user_id, [
+        (measurement.measured_at, *(getattr(measurement, metric) for metric in rollup_service.ROLLUP_METRICS))
+        for measurement in measurements
+    ])
+    # 被覆盖的记录旧值未知，重算所在的日期（measured_at 是唯一键，日期不变）
+    changed_days = {timezone.localdate(m.measured_at) for m in updated}
+    for day in sorted(changed_days):
+        rollup_service.rebuild_day(user_id, day)
+
+    # 有覆盖的记录时缓存中的旧值需要替换，整体失效；否则只追加
+    if updated:
+        timeseries_cache.invalidate(user_id)
+    else:
+        timeseries_cache.append(user_id, measurements)
+
+    changed_days.update(timezone.localdate(m.measured_at) for m in measurements)
+    schedule_refresh(user_id, min(changed_days))
+    invalidate_user(user_id)
+
+
+# 睡眠/情绪记录对应的日期字段
+_LOG_DATE_FIELDS = {SleepLog: 'sleep_date', MoodLog: 'log_date'}
+
+
+@receiver(pre_save, sender=SleepLog)
+@receiver(pre_save, sender=MoodLog)
+def remember_previous_log_date(sender, instance, **kwargs):
+    """更新前记录旧日期，日期被修改时旧日期所在的快照也需要刷新"""
+    instance._previous_log_date = None
+    if instance.pk and not kwargs.get('raw'):
+        instance._previous_log_date = sender.objects.filter(pk=instance.pk).values_list(
+            _LOG_DATE_FIELDS[sender], flat=True
+        ).first()
+
+
+@receiver(post_save, sender=SleepLog)
+@receiver(post_save, sender=MoodLog)
+def log_saved(sender, instance, created, **kwargs):
+    if kwargs.get('raw'):
+        return
+    changed_date = getattr(instance, _LOG_DATE_FIELDS[sender])
+    previous = getattr(instance, '_previous_log_date', None)
+    if previous:
+        changed_date = min(changed_date, previous)
+    schedule_refresh(instance.user_id, changed_date)
+    invalidate_user(instance.user_id)
+
+
+@receiver(post_delete, sender=SleepLog)
+@receiver(post_delete, sender=MoodLog)
+def log_deleted(sender, instance, **kwargs):
+    schedule_refresh(instance.user_id, getattr(instance, _LOG_DATE_FIELDS[sender]))
+    invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def profile_changed(sender, instance, **kwargs):
+    # 身高变化影响 BMI 评分：刷新今天的快照（报告读取当天快照）并清除报告缓存
+    if kwargs.get('raw'):
+        return
+    schedule_refresh(instance.user_id, timezone.localdate())
+    invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created and instance.role == 'user':
+        rolling_statistics.adjust_total_users(1)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    if instance.role == 'user':
+        rolling_statistics.adjust_total_users(-1)
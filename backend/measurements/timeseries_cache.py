@@ -0,0 +1,270 @@
+"""
+按用户的列式时间序列缓存（供 ML 推理/训练读取）
+替换本地内容：每个用户一个定长记录文件（测量时间 + 各指标 float32，NaN 表示未测量），
+读取时以内存映射方式打开，不经过数据库和 Decimal 转换：window() 返回映射上的记录切片，
+按字段取得的是不复制数据的视图；metric_frame() 构造 DataFrame 时会把选中的列复制一份。
+新测量提交后追加到文件末尾；修改、删除或乱序写入时删除文件，下次读取时从数据库重建。
+Django 与 FastAPI 进程通过同一缓存目录共享（多主机部署需要共享文件系统），
+文件超过 TIMESERIES_CACHE_MAX_AGE 秒后重建一次，兜底不经过信号的写入
+"""
+import os
+import struct
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Measurement
+
+try:
+    import fcntl
+except ImportError:  # Windows：只有单进程内的保护
+    fcntl = None
+
+User = get_user_model()
+
+CACHE_DIR = getattr(settings, 'TIMESERIES_CACHE_DIR', os.path.join(settings.BASE_DIR, 'cache', 'timeseries'))
+
+# 文件最长使用时间（秒），超过后从数据库重建
+MAX_AGE = getattr(settings, 'TIMESERIES_CACHE_MAX_AGE', 24 * 3600)
+
+METRICS = ('weight_kg', 'systolic', 'diastolic', 'heart_rate', 'blood_glucose')
+
+# 时间用 UTC 微秒（float32 无法精确表示时间戳），指标用 float32
+RECORD_DTYPE = np.dtype([('measured_at', '<M8[us]')] + [(metric, '<f4') for metric in METRICS])
+
+# 文件头：魔数、记录长度（记录格式变化时旧文件自动失效）、构建时间（秒）
+_HEADER = struct.Struct('<4sIq')
+_MAGIC = b'HTS1'
+
+# 重建时每次从数据库读取的行数
+REBUILD_CHUNK_SIZE = 5000
+
+
+def _path(user_id: int) -> str:
+    return os.path.join(CACHE_DIR, f'user_{user_id}.ts')
+
+
+@contextmanager
+def _locked(user_id: int):
+    """同一用户的追加、失效和重建互斥（跨进程，基于 flock）"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(os.path.join(CACHE_DIR, f'user_{user_id}.lock'), 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read_header(path: str) -> Optional[int]:
+    """读取文件头中的构建时间，文件不存在或格式不符时返回 None"""
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read(_HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(raw) < _HEADER.size:
+        return None
+    magic, itemsize, built_at = _HEADER.unpack(raw)
+    if magic != _MAGIC or itemsize != RECORD_DTYPE.itemsize:
+        return None
+    return built_at
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def to_records(rows: Iterable[Sequence]) -> np.ndarray:
+    """
+    (measured_at, weight_kg, systolic, diastolic, heart_rate, blood_glucose) 行 -> 记录数组
+
+    None 转为 NaN，时间统一为 UTC。
+    """
+    frame = pd.DataFrame.from_records(list(rows), columns=['measured_at', *METRICS])
+    records = np.empty(len(frame), dtype=RECORD_DTYPE)
+    if not len(frame):
+        return records
+    measured_at = pd.to_datetime(frame['measured_at'], utc=True).dt.tz_localize(None)
+    records['measured_at'] = measured_at.to_numpy(dtype='datetime64[us]')
+    for metric in METRICS:
+        records[metric] = pd.to_numeric(frame[metric], errors='coerce').to_numpy(dtype='float32')
+    return records
+
+
+def _rebuild(user_id: int) -> bool:
+    """
+    从数据库重建某用户的缓存文件（先写临时文件再原子替换）
+
+    Returns:
+        False 表示用户不存在（不写文件）
+    """
+    with _locked(user_id):
+        rows = (
+            Measurement.objects.filter(user_id=user_id)
+            .order_by('measured_at')
+            .values_list('measured_at', *METRICS)
+            .iterator(chunk_size=REBUILD_CHUNK_SIZE)
+        )
+        records = to_records(rows)
+        if not len(records) and not User.objects.filter(id=user_id).exists():
+            return False
+
+        path = _path(user_id)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, RECORD_DTYPE.itemsize, int(time.time())))
+            f.write(records.tobytes())
+        os.replace(temp_path, path)
+    return True
+
+
+def _open(user_id: int) -> Optional[np.ndarray]:
+    """内存映射打开缓存文件，不存在、格式不符或过期时返回 None"""
+    path = _path(user_id)
+    built_at = _read_header(path)
+    if built_at is None or time.time() - built_at > MAX_AGE:
+        return None
+    try:
+        size = os.path.getsize(path) - _HEADER.size
+    except FileNotFoundError:
+        return None
+    # 并发追加中的不完整记录不读取
+    count = size // RECORD_DTYPE.itemsize
+    if count == 0:
+        return np.empty(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=_HEADER.size, shape=(count,))
+
+
+def load(user_id: int) -> Optional[np.ndarray]:
+    """
+    某用户按时间升序的全部测量记录（只读内存映射，字段为 measured_at 和各指标）
+
+    缓存缺失或过期时从数据库重建。
+
+    Returns:
+        记录数组；用户不存在时返回 None
+    """
+    records = _open(user_id)
+    if records is None:
+        if not _rebuild(user_id):
+            return None
+        records = _open(user_id)
+    return records
+
+
+def window(user_id: int, start: Optional[datetime] = None,
+           end: Optional[datetime] = None) -> Optional[np.ndarray]:
+    """
+    某用户在 [start, end] 内的记录（内存映射上的切片，不复制数据）
+
+    时间范围用二分查找定位；records['systolic'] 等字段访问得到的也是映射上的（带步长的）视图，
+    可直接交给 NumPy 计算，只有实际访问的页面会被读入。
+
+    Returns:
+        记录数组；用户不存在时返回 None
+    """
+    records = load(user_id)
+    if records is None:
+        return None
+
+    times = records['measured_at']
+    lo = 0 if start is None else np.searchsorted(times, _as_utc64(start), side='left')
+    hi = len(records) if end is None else np.searchsorted(times, _as_utc64(end), side='right')
+    return records[lo:hi]
+
+
+def metric_frame(user_id: int, metrics: Sequence[str], start: Optional[datetime] = None,
+                 end: Optional[datetime] = None) -> Optional[pd.DataFrame]:
+    """
+    以 measured_at（UTC DatetimeIndex）为索引的指标 DataFrame
+
+    在 window() 的切片上构造，DataFrame 会复制选中的列（只复制时间范围内的行）；
+    不需要 DataFrame 时直接使用 window() 避免复制。
+
+    Returns:
+        DataFrame；用户不存在时返回 None
+    """
+    records = window(user_id, start, end)
+    if records is None:
+        return None
+
+    index = pd.DatetimeIndex(records['measured_at'], name='measured_at').tz_localize('UTC')
+    return pd.DataFrame({metric: records[metric] for metric in metrics}, index=index)
+
+
+def _as_utc64(value: datetime) -> np.datetime64:
+    """datetime -> UTC datetime64[us]（不带时区时按当前时区解释）"""
+    stamp = pd.Timestamp(value)
+    if stamp.tzinfo is None:
+        stamp = stamp.tz_localize(timezone.get_current_timezone())
+    return np.datetime64(stamp.tz_convert('UTC').tz_localize(None), 'us')
+
+
+# ------------------------------------------------------------------
+# 写入（在事务提交后执行）
+# ------------------------------------------------------------------
+def _append_now(user_id: int, records: np.ndarray):
+    if not len(records):
+        return
+    if not os.path.isdir(CACHE_DIR):
+        return  # 从未构建过缓存
+    records = np.sort(records, order='measured_at')
+    path = _path(user_id)
+    with _locked(user_id):
+        if _read_header(path) is None:
+            return  # 未缓存，首次读取时整体构建
+        size = os.path.getsize(path) - _HEADER.size
+        if size % RECORD_DTYPE.itemsize:
+            _remove(path)  # 上次追加被中断
+            return
+        if size:
+            with open(path, 'rb') as f:
+                f.seek(-RECORD_DTYPE.itemsize, os.SEEK_END)
+                last = np.frombuffer(f.read(RECORD_DTYPE.itemsize), dtype=RECORD_DTYPE)[0]['measured_at']
+            if records['measured_at'][0] <= last:
+                # 补录更早的数据或覆盖已有时刻：不能只追加，整体失效
+                _remove(path)
+                return
+        with open(path, 'ab') as f:
+            f.write(records.tobytes())
+
+
+def append(user_id: int, measurements: List[Measurement]):
+    """新测量提交后追加到用户的缓存（缓存不存在时不处理）"""
+    records = to_records(
+        (m.measured_at, *(getattr(m, metric) for metric in METRICS)) for m in measurements
+    )
+    transaction.on_commit(lambda: _append_now(user_id, records))
+
+
+def _invalidate_now(user_ids: Iterable[int]):
+    if not os.path.isdir(CACHE_DIR):
+        return  # 从未构建过缓存
+    for user_id in set(user_ids):
+        with _locked(user_id):
+            _remove(_path(user_id))
+
+
+def invalidate(*user_ids: int):
+    """测量修改/删除提交后删除这些用户的缓存"""
+    transaction.on_commit(lambda: _invalidate_now(user_ids))
+
+
+def invalidate_users(user_ids: Iterable[int]):
+    """批量导入/删除后删除这些用户的缓存"""
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: _invalidate_now(user_ids))
@@ -3,7 +3,9 @@ from .views import (
     MeasurementListCreateView,
     MeasurementDetailView,
     my_measurements,
+    bulk_create_measurements,
     health_statistics,
+    daily_measurements,
     predict_health_trends,
     health_recommendations,
     # Existing report endpoints
@@ -12,6 +14,7 @@ from .views import (
     # New endpoints
     health_report,
     health_report_for_user,
+    health_score_history,
     forecast_health_metric,
 )
 from . import collaborative_views
@@ -39,7 +42,9 @@ urlpatterns = [
     path('measurements/', MeasurementListCreateView.as_view(), name='measurement-list-create'),
     path('measurements/<int:pk>/', MeasurementDetailView.as_view(), name='measurement-detail'),
     path('measurements/my-measurements/', my_measurements, name='my-measurements'),
+    path('measurements/bulk/', bulk_create_measurements, name='measurement-bulk-create'),
     path('measurements/statistics/', health_statistics, name='health-statistics'),
+    path('measurements/daily/', daily_measurements, name='daily-measurements'),
     path('measurements/predict/', predict_health_trends, name='predict-health-trends'),
     path('measurements/recommendations/', health_recommendations, name='health-recommendations'),
 
@@ -48,6 +53,7 @@ urlpatterns = [
     
     path('health-report/', health_report, name='health-report'),
     path('health-report/<int:user_id>/', health_report_for_user, name='health-report-user'),
+    path('health-report/history/', health_score_history, name='health-score-history'),
     
     path('forecast/', forecast_health_metric, name='forecast-metric'),
 
@@ -61,6 +67,7 @@ urlpatterns = [
     path('admin/statistics-all/', admin_views.health_statistics_all, name='health-statistics-all'),
     path('admin/alerts-all/', admin_views.health_alerts_all, name='health-alerts-all'),
     path('admin/trends-analysis/', admin_views.health_trends_analysis, name='health-trends-analysis'),
+    path('admin/health-scores/', admin_views.population_health_scores, name='population-health-scores'),
     path('admin/measurements/<int:measurement_id>/', admin_views.measurement_management, name='measurement-management'),
     path('admin/measurements/', admin_views.measurement_management, name='measurement-management-create'),
 
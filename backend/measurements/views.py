@@ -3,11 +3,16 @@ from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import get_user_model
-from django.db.models import Avg, Max, Min, StdDev, Count
+from django.db.models import Avg
 from django.utils import timezone
-from .models import Measurement
+from .models import Measurement, MeasurementDaily
 from .serializers import MeasurementSerializer
 from .permissions import IsOwnerOrAdminOrDoctor
+from .pagination import MeasurementPagination
+from .services.snapshot_service import get_current_report, score_history_since
+from .services.rollup_service import ROLLUP_METRICS, metric_summary, daily_series
+from .report_cache import ReportCache
+from users.serializers import UserSerializer
 import numpy as np
 from datetime import datetime, timedelta
 import json
@@ -18,9 +23,10 @@ User = get_user_model()
 class MeasurementListCreateView(generics.ListCreateAPIView):
     serializer_class = MeasurementSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = MeasurementPagination
     
     def get_queryset(self):
-        return Measurement.objects.filter(user=self.request.user).order_by('-measured_at')
+        return Measurement.objects.filter(user=self.request.user).select_related('user').order_by('-measured_at')
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -34,77 +40,144 @@ class MeasurementDetailView(generics.RetrieveUpdateDestroyAPIView):
         return Measurement.objects.filter(user=self.request.user)
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_create_measurements(request):
+    """
+    批量上传测量数据（可穿戴设备、诊所设备、批量导入）
+    请求体: [{measured_at, systolic, ...}, ...] 或 {"user_id": 3, "measurements": [...]}
+    （user_id 仅医生/管理员可用，默认当前用户）
+
+    每条记录按单条创建的规则校验，合法记录在一个事务中批量写入；
+    同一用户 measured_at 相同的记录：库中已有的只更新本条提供的字段（与单条创建一致），
+    值完全相同或本批内重复的跳过。
+    返回新增/更新数量、跳过记录的下标和每条非法记录的错误；
+    有记录写入但部分记录非法时返回 207，没有写入任何记录时才返回 400。
+    """
+    from .services.ingest_service import MAX_BULK_ITEMS, ingest_measurements
+
+    payload = request.data
+    target = request.user
+    if isinstance(payload, dict):
+        user_id = payload.get('user_id')
+        if user_id is not None and str(user_id) != str(request.user.id):
+            if not (request.user.is_admin_user or request.user.is_doctor_user):
+                return Response({'error': '权限不足'}, status=status.HTTP_403_FORBIDDEN)
+            try:
+                target = User.objects.get(id=user_id)
+            except (User.DoesNotExist, ValueError, TypeError):
+                return Response({'error': '用户不存在'}, status=status.HTTP_404_NOT_FOUND)
+        payload = payload.get('measurements')
+
+    if not isinstance(payload, list) or not payload:
+        return Response({'error': '请求体必须是非空的测量记录列表'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(payload) > MAX_BULK_ITEMS:
+        return Response({'error': f'单次最多上传 {MAX_BULK_ITEMS} 条记录'}, status=status.HTTP_400_BAD_REQUEST)
+
+    result = ingest_measurements(target, payload)
+    result['user_id'] = target.id
+
+    # 有记录写入时部分失败返回 207；没有任何写入且全部非法时才返回 400
+    written = result['created'] or result['updated']
+    if written and result['errors']:
+        response_status = status.HTTP_207_MULTI_STATUS
+    elif result['created']:
+        response_status = status.HTTP_201_CREATED
+    elif result['errors'] and not result['duplicates']:
+        response_status = status.HTTP_400_BAD_REQUEST
+    else:
+        response_status = status.HTTP_200_OK
+    return Response(result, status=response_status)
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def my_measurements(request):
-    """获取当前用户的测量记录"""
-    measurements = Measurement.objects.filter(user=request.user).order_by('-measured_at')
-    page_size = int(request.GET.get('page_size', 20))
+    """
+    获取当前用户的测量记录
+    分页：?page=N（默认），或 ?cursor= 使用游标分页；?count=false 跳过总数统计
+    """
+    measurements = Measurement.objects.filter(user=request.user).select_related('user').order_by('-measured_at')
     
     # 分页处理
-    from django.core.paginator import Paginator
-    paginator = Paginator(measurements, page_size)
-    page_number = request.GET.get('page', 1)
-    page_obj = paginator.get_page(page_number)
+    paginator = MeasurementPagination()
+    paginator.page_size = 20
+    page = paginator.paginate_queryset(measurements, request)
     
-    serializer = MeasurementSerializer(page_obj, many=True)
+    serializer = MeasurementSerializer(page, many=True)
     
-    return Response({
-        'results': serializer.data,
-        'count': paginator.count,
-        'next': page_obj.has_next() and f"?page={page_obj.next_page_number()}" or None,
-        'previous': page_obj.has_previous() and f"?page={page_obj.previous_page_number()}" or None,
-    })
+    return paginator.get_paginated_response(serializer.data)
 
 
-@api_view(['GET'])
-@permission_classes([permissions.IsAuthenticated])
-def health_statistics(request):
-    """获取用户健康统计数据"""
-    user = request.user
-    measurements = Measurement.objects.filter(user=user)
-    
-    if not measurements.exists():
-        return Response({'error': '暂无健康数据'}, status=404)
-    
-    # 计算统计数据
-    stats = {
+def _as_float(value):
+    return float(value) if value is not None else None
+
+
+def _as_int(value):
+    return int(value) if value is not None else None
+
+
+def build_health_statistics(summary, latest):
+    """
+    由每日汇总统计（rollup_service.metric_summary）和最新一条测量组装统计数据
+    """
+    weight = summary['weight_kg']
+    systolic = summary['systolic']
+    diastolic = summary['diastolic']
+    heart_rate = summary['heart_rate']
+    glucose = summary['blood_glucose']
+    return {
         'weight': {
-            'latest': float(measurements.latest('measured_at').weight_kg),
-            'average': float(measurements.aggregate(Avg('weight_kg'))['weight_kg__avg']),
-            'max': float(measurements.aggregate(Max('weight_kg'))['weight_kg__max']),
-            'min': float(measurements.aggregate(Min('weight_kg'))['weight_kg__min']),
-            'std_dev': float(measurements.aggregate(StdDev('weight_kg'))['weight_kg__stddev'] or 0)
+            'latest': _as_float(latest.weight_kg),
+            'average': _as_float(weight['avg']),
+            'max': _as_float(weight['max']),
+            'min': _as_float(weight['min']),
+            'std_dev': float(weight['std_dev'] or 0)
         },
         'blood_pressure': {
-            'latest_systolic': int(measurements.latest('measured_at').systolic),
-            'latest_diastolic': int(measurements.latest('measured_at').diastolic),
-            'avg_systolic': float(measurements.aggregate(Avg('systolic'))['systolic__avg']),
-            'avg_diastolic': float(measurements.aggregate(Avg('diastolic'))['diastolic__avg']),
-            'max_systolic': int(measurements.aggregate(Max('systolic'))['systolic__max']),
-            'max_diastolic': int(measurements.aggregate(Max('diastolic'))['diastolic__max']),
-            'min_systolic': int(measurements.aggregate(Min('systolic'))['systolic__min']),
-            'min_diastolic': int(measurements.aggregate(Min('diastolic'))['diastolic__min'])
+            'latest_systolic': _as_int(latest.systolic),
+            'latest_diastolic': _as_int(latest.diastolic),
+            'avg_systolic': _as_float(systolic['avg']),
+            'avg_diastolic': _as_float(diastolic['avg']),
+            'max_systolic': _as_int(systolic['max']),
+            'max_diastolic': _as_int(diastolic['max']),
+            'min_systolic': _as_int(systolic['min']),
+            'min_diastolic': _as_int(diastolic['min'])
         },
         'heart_rate': {
-            'latest': int(measurements.latest('measured_at').heart_rate),
-            'average': float(measurements.aggregate(Avg('heart_rate'))['heart_rate__avg']),
-            'max': int(measurements.aggregate(Max('heart_rate'))['heart_rate__max']),
-            'min': int(measurements.aggregate(Min('heart_rate'))['heart_rate__min']),
-            'std_dev': float(measurements.aggregate(StdDev('heart_rate'))['heart_rate__stddev'] or 0)
+            'latest': _as_int(latest.heart_rate),
+            'average': _as_float(heart_rate['avg']),
+            'max': _as_int(heart_rate['max']),
+            'min': _as_int(heart_rate['min']),
+            'std_dev': float(heart_rate['std_dev'] or 0)
         },
         'blood_glucose': {
-            'latest': float(measurements.latest('measured_at').blood_glucose),
-            'average': float(measurements.aggregate(Avg('blood_glucose'))['blood_glucose__avg']),
-            'max': float(measurements.aggregate(Max('blood_glucose'))['blood_glucose__max']),
-            'min': float(measurements.aggregate(Min('blood_glucose'))['blood_glucose__min']),
-            'std_dev': float(measurements.aggregate(StdDev('blood_glucose'))['blood_glucose__stddev'] or 0)
+            'latest': _as_float(latest.blood_glucose),
+            'average': _as_float(glucose['avg']),
+            'max': _as_float(glucose['max']),
+            'min': _as_float(glucose['min']),
+            'std_dev': float(glucose['std_dev'] or 0)
         },
-        'total_measurements': measurements.count(),
-        'date_range': {
-            'start': measurements.earliest('measured_at').measured_at,
-            'end': measurements.latest('measured_at').measured_at
-        }
+    }
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def health_statistics(request):
+    """获取用户健康统计数据（聚合值读取每日汇总）"""
+    user = request.user
+    measurements = Measurement.objects.filter(user=user)
+    
+    latest = measurements.order_by('-measured_at').first()
+    if latest is None:
+        return Response({'error': '暂无健康数据'}, status=404)
+    
+    summary = metric_summary(MeasurementDaily.objects.filter(user=user))
+    stats = build_health_statistics(summary, latest)
+    stats['total_measurements'] = summary['measurement_count']
+    stats['date_range'] = {
+        'start': measurements.order_by('measured_at').values_list('measured_at', flat=True).first(),
+        'end': latest.measured_at
     }
     
     return Response(stats)
@@ -414,7 +487,8 @@ def my_report(request):
             'notes': latest.notes
         },
         'issues': issues,
-        'timeseries': timeseries
+        'timeseries': timeseries,
+        'score_trend': score_history_since(user.id, 90)
     }
     return Response(report)
 @api_view(['GET'])
@@ -477,7 +551,8 @@ def report_for_user(request, user_id):
             'notes': latest.notes
         },
         'issues': issues,
-        'timeseries': timeseries
+        'timeseries': timeseries,
+        'score_trend': score_history_since(target.id, 90)
     }
     return Response(report)
 # ------------------------------------------------------------
@@ -487,17 +562,21 @@ class MeasurementViewSet(viewsets.ModelViewSet):
     - 普通用户：只能看到/操作自己的数据
     - 医生/管理员：可以看到全部数据（可通过 ?user_id=xxx 过滤）
     - 支持按 measured_at 排序（默认升序）
+    - 分页：?page=N（默认），或 ?cursor= 按 (measured_at, id) 游标分页；?count=false 跳过总数统计
     - 附加 action: statistics/?days=30
     """
     serializer_class = MeasurementSerializer
     permission_classes = [IsAuthenticated, IsOwnerOrAdminOrDoctor]
+    pagination_class = MeasurementPagination
     filter_backends = [filters.OrderingFilter,]
     ordering_fields = ['measured_at']
     ordering = ['measured_at']  # 默认按时间升序
 
     def get_queryset(self):
+        return self.filter_by_user(Measurement.objects.select_related('user').order_by('measured_at'))
+
+    def filter_by_user(self, qs):
         user = self.request.user
-        qs = Measurement.objects.all().order_by('measured_at')
         # 管理员/医生可查看所有，支持按 user_id 过滤
         if getattr(user, "is_admin_user", False) or getattr(user, "is_doctor_user", False):
             user_id = self.request.query_params.get('user_id')
@@ -519,23 +598,24 @@ class MeasurementViewSet(viewsets.ModelViewSet):
     def statistics(self, request):
         """
         返回指定时间范围（默认最近 days 天）的各项指标统计（avg/min/max/count）
+        按本地日期读取每日汇总，窗口包含起止两天的全部测量
         调用示例: GET /api/measurements/statistics/?days=30 或 /api/measurements/statistics/?user_id=3&days=14
         """
         days = int(request.query_params.get('days', 30))
         end = timezone.now()
         start = end - timedelta(days=days)
-        qs = self.get_queryset().filter(measured_at__gte=start, measured_at__lte=end)
+        qs = self.filter_by_user(MeasurementDaily.objects.filter(
+            date__gte=timezone.localdate(start), date__lte=timezone.localdate(end)
+        ))
 
+        summary = metric_summary(qs)
         stats = {}
-        metrics = ['weight_kg', 'systolic', 'diastolic', 'heart_rate', 'blood_glucose']
-        for m in metrics:
-            agg = qs.aggregate(avg=Avg(m), min=Min(m), max=Max(m), count=Count(m))
-            # 将 Decimal/NaN 之类转换为原生类型（简单处理）
+        for m in ROLLUP_METRICS:
             stats[m] = {
-                'avg': float(agg['avg']) if agg['avg'] is not None else None,
-                'min': float(agg['min']) if agg['min'] is not None else None,
-                'max': float(agg['max']) if agg['max'] is not None else None,
-                'count': agg['count']
+                'avg': summary[m]['avg'],
+                'min': summary[m]['min'],
+                'max': summary[m]['max'],
+                'count': summary[m]['count']
             }
 
         return Response({
@@ -552,16 +632,21 @@ def health_report(request):
     """
     GET /api/health-report/
     Generate comprehensive health report with scoring for current user.
+    Reads today's score snapshot (computed and stored on first access).
+    Supports conditional GET: returns 304 when If-None-Match / If-Modified-Since
+    match the user's current data.
     Query params:
     - days: Number of days to consider (default: 30)
     """
-    from .health_scoring import HealthScoringService
-    
     days = int(request.GET.get('days', 30))
     
+    report_cache = ReportCache(request, 'health_report', request.user.id, {'days': days})
+    cached = report_cache.cached_response()
+    if cached is not None:
+        return cached
+    
     try:
-        scoring_service = HealthScoringService(request.user.id, days=days)
-        report = scoring_service.calculate_overall_score()
+        report = get_current_report(request.user.id, days=days)
         
         # Add user info
         report['user'] = {
@@ -570,7 +655,7 @@ def health_report(request):
             'email': request.user.email,
         }
         
-        return Response(report, status=status.HTTP_200_OK)
+        return report_cache.respond(report)
     except User.DoesNotExist:
         return Response({'error': '用户不存在'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
@@ -583,21 +668,25 @@ def health_report_for_user(request, user_id):
     """
     GET /api/health-report/{user_id}/
     Generate health report for specific user (admin/doctor only).
+    Reads today's score snapshot (computed and stored on first access).
+    Supports conditional GET like health_report.
     Query params:
     - days: Number of days to consider (default: 30)
     """
-    from .health_scoring import HealthScoringService
-    
     # Check permissions
     if not (request.user.is_admin_user or request.user.is_doctor_user):
         return Response({'error': '权限不足'}, status=status.HTTP_403_FORBIDDEN)
     
     days = int(request.GET.get('days', 30))
     
+    report_cache = ReportCache(request, 'health_report_for_user', user_id, {'days': days})
+    cached = report_cache.cached_response()
+    if cached is not None:
+        return cached
+    
     try:
         target_user = User.objects.get(id=user_id)
-        scoring_service = HealthScoringService(user_id, days=days)
-        report = scoring_service.calculate_overall_score()
+        report = get_current_report(user_id, days=days)
         
         # Add user info
         report['user'] = {
@@ -606,13 +695,100 @@ def health_report_for_user(request, user_id):
             'email': target_user.email,
         }
         
-        return Response(report, status=status.HTTP_200_OK)
+        return report_cache.respond(report)
     except User.DoesNotExist:
         return Response({'error': '用户不存在'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         return Response({'error': f'生成报告失败: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def health_score_history(request):
+    """
+    GET /api/health-report/history/
+    Daily overall and per-dimension scores over time, read from score snapshots.
+    Query params:
+    - history_days: Number of past days to return (default: 90, max: 730)
+    - days: Scoring window of the snapshots (default: 30)
+    - user_id: Target user (admin/doctor only, default: current user)
+    """
+    try:
+        user_id = int(request.GET.get('user_id', request.user.id))
+        history_days = int(request.GET.get('history_days', 90))
+        days = int(request.GET.get('days', 30))
+    except ValueError:
+        return Response({'error': 'user_id、history_days 和 days 必须是整数'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= history_days <= 730:
+        return Response({'error': 'history_days 必须在 1-730 之间'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if user_id != request.user.id:
+        if not (request.user.is_admin_user or request.user.is_doctor_user):
+            return Response({'error': '权限不足'}, status=status.HTTP_403_FORBIDDEN)
+        if not User.objects.filter(id=user_id).exists():
+            return Response({'error': '用户不存在'}, status=status.HTTP_404_NOT_FOUND)
+
+    history = score_history_since(user_id, history_days, days=days)
+    return Response({
+        'user_id': user_id,
+        'evaluation_period_days': days,
+        'history_days': history_days,
+        'count': len(history),
+        'history': history,
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def daily_measurements(request):
+    """
+    GET /api/measurements/daily/
+    Per-day metric series for charts, read from the daily rollup.
+    Query params:
+    - metric: One metric, or omit for all ('weight_kg', 'systolic', 'diastolic', 'heart_rate', 'blood_glucose')
+    - days: Number of past days to return (default: 90, max: 730)
+    - user_id: Target user (admin/doctor only, default: current user)
+    """
+    try:
+        user_id = int(request.GET.get('user_id', request.user.id))
+        days = int(request.GET.get('days', 90))
+    except ValueError:
+        return Response({'error': 'user_id 和 days 必须是整数'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= days <= 730:
+        return Response({'error': 'days 必须在 1-730 之间'}, status=status.HTTP_400_BAD_REQUEST)
+
+    metric = request.GET.get('metric')
+    if metric and metric not in ROLLUP_METRICS:
+        return Response({
+            'error': f'无效的metric。有效选项: {", ".join(ROLLUP_METRICS)}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if user_id != request.user.id:
+        if not (request.user.is_admin_user or request.user.is_doctor_user):
+            return Response({'error': '权限不足'}, status=status.HTTP_403_FORBIDDEN)
+        if not User.objects.filter(id=user_id).exists():
+            return Response({'error': '用户不存在'}, status=status.HTTP_404_NOT_FOUND)
+
+    start_date = timezone.localdate() - timedelta(days=days - 1)
+    series = {}
+    for name in ([metric] if metric else ROLLUP_METRICS):
+        series[name] = [{
+            'date': day['date'].isoformat(),
+            'count': day['count'],
+            'avg': round(day['avg'], 2),
+            'min': day['min'],
+            'max': day['max'],
+            'std_dev': round(day['std_dev'], 2),
+        } for day in daily_series(user_id, name, start_date)]
+
+    return Response({
+        'user_id': user_id,
+        'start_date': start_date.isoformat(),
+        'days': days,
+        'series': series,
+    }, status=status.HTTP_200_OK)
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def forecast_health_metric(request):
@@ -26,7 +26,7 @@ import os
 import json
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional
 from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
@@ -241,7 +241,8 @@ class LSTMTrainer:
     
     def train(self, X_train, y_train, X_val, y_val, epochs: int = 100, 
               batch_size: int = 32, learning_rate: float = 0.001, 
-              patience: int = 15, verbose: bool = True) -> Dict:
+              patience: int = 15, verbose: bool = True,
+              progress_callback: Optional[Callable[[Dict], None]] = None) -> Dict:
         """
         训练 LSTM 模型
         
@@ -253,6 +254,8 @@ class LSTMTrainer:
             learning_rate: 学习率
             patience: 早停耐心值
             verbose: 是否打印训练信息
+            progress_callback: 每个 epoch 结束后的回调，参数为进度字典
+                (epoch, epochs, train_loss, val_loss, best_val_loss)
             
         Returns:
             训练历史字典
@@ -339,6 +342,15 @@ class LSTMTrainer:
             else:
                 patience_counter += 1
             
+            if progress_callback is not None:
+                progress_callback({
+                    'epoch': epoch + 1,
+                    'epochs': epochs,
+                    'train_loss': train_loss,
+                    'val_loss': val_loss,
+                    'best_val_loss': best_val_loss,
+                })
+            
             if verbose and (epoch + 1) % 10 == 0:
                 print(f"Epoch [{epoch+1}/{epochs}] "
                       f"Train Loss: {train_loss:.6f}, Val Loss: {val_loss:.6f}")
@@ -9,6 +9,9 @@
 
 import os
 import json
+import threading
+from collections import OrderedDict
+import numpy as np
 import pandas as pd
 from typing import Dict, Optional, Tuple, List
 from datetime import datetime, timedelta
@@ -24,6 +27,17 @@ class ModelLoader:
     SUPPORTED_MODELS = ['lstm', 'transformer']
     SUPPORTED_METRICS = ['blood_glucose', 'heart_rate', 'systolic', 'diastolic', 'weight_kg']
     
+    # Monte Carlo Dropout 采样次数
+    MC_ITERATIONS = 100
+    
+    # 已加载模型缓存: (model_type, user_id, metric, model_dir) -> (mtime, trainer, metrics, lock)
+    MODEL_CACHE_SIZE = int(os.getenv('MODEL_CACHE_SIZE', '32'))
+    _model_cache = OrderedDict()
+    _cache_lock = threading.Lock()
+    
+    # 模型使用统计: (model_type, user_id, metric) -> {'count', 'last_used'}
+    _usage = {}
+    
     @staticmethod
     def load_model(user_id: int, metric: str, model_type: str = 'lstm', 
                   model_dir: str = 'models'):
@@ -49,6 +63,79 @@ class ModelLoader:
             from ml_models.transformer_predictor import TransformerTrainer
             return TransformerTrainer.load_model(user_id, metric, model_dir)
     
+    @staticmethod
+    def get_model(user_id: int, metric: str, model_type: str = 'lstm',
+                  model_dir: str = 'models', record_usage: bool = True) -> Tuple:
+        """
+        获取已训练的模型（带进程内缓存）
+        
+        缓存以模型文件的修改时间校验，重新训练保存后会自动重新加载。
+        
+        Args:
+            user_id: 用户ID
+            metric: 指标名称
+            model_type: 模型类型
+            model_dir: 模型目录
+            record_usage: 是否计入使用统计（预热加载不计入）
+            
+        Returns:
+            (trainer, metrics, lock) 或 (None, None, None)
+            lock 用于串行化同一模型的推理（MC Dropout 会切换模型的 train/eval 状态）
+        """
+        if model_type not in ModelLoader.SUPPORTED_MODELS:
+            raise ValueError(f"不支持的模型类型: {model_type}")
+        
+        model_path = os.path.join(model_dir, f'{model_type}_user{user_id}_{metric}.pth')
+        try:
+            mtime = os.path.getmtime(model_path)
+        except OSError:
+            return None, None, None
+        
+        key = (model_type, user_id, metric, os.path.abspath(model_dir))
+        with ModelLoader._cache_lock:
+            if record_usage:
+                usage = ModelLoader._usage.setdefault((model_type, user_id, metric), {'count': 0, 'last_used': None})
+                usage['count'] += 1
+                usage['last_used'] = datetime.now().isoformat()
+            
+            entry = ModelLoader._model_cache.get(key)
+            if entry is not None and entry[0] == mtime:
+                ModelLoader._model_cache.move_to_end(key)
+                return entry[1:]
+        
+        trainer, metrics = ModelLoader.load_model(user_id, metric, model_type, model_dir)
+        if trainer is None:
+            return None, None, None
+        
+        entry = (mtime, trainer, metrics, threading.Lock())
+        with ModelLoader._cache_lock:
+            ModelLoader._model_cache[key] = entry
+            ModelLoader._model_cache.move_to_end(key)
+            while len(ModelLoader._model_cache) > ModelLoader.MODEL_CACHE_SIZE:
+                ModelLoader._model_cache.popitem(last=False)
+        
+        return entry[1:]
+    
+    @staticmethod
+    def clear_cache():
+        """清空模型缓存"""
+        with ModelLoader._cache_lock:
+            ModelLoader._model_cache.clear()
+    
+    @staticmethod
+    def get_usage() -> List[Dict]:
+        """
+        获取本进程内各模型的使用统计
+        
+        Returns:
+            [{'model_type', 'user_id', 'metric', 'count', 'last_used'}, ...]
+        """
+        with ModelLoader._cache_lock:
+            return [
+                {'model_type': model_type, 'user_id': user_id, 'metric': metric, **usage}
+                for (model_type, user_id, metric), usage in ModelLoader._usage.items()
+            ]
+    
     @staticmethod
     def predict(df: pd.DataFrame, user_id: int, metric: str, days: int = 7,
                model_type: str = 'lstm', confidence_level: float = 0.95,
@@ -68,34 +155,138 @@ class ModelLoader:
         Returns:
             预测结果字典
         """
-        # 加载模型
-        trainer, metrics = ModelLoader.load_model(user_id, metric, model_type, model_dir)
+        request = {'df': df, 'days': days, 'confidence_level': confidence_level}
+        return ModelLoader.predict_batch([request], user_id, metric, model_type, model_dir)[0]
+    
+    @staticmethod
+    def predict_batch(requests: List[Dict], user_id: int, metric: str,
+                      model_type: str = 'lstm', model_dir: str = 'models') -> List[Dict]:
+        """
+        同一模型的多个预测请求合并为批量前向传播
+        
+        Args:
+            requests: 请求列表，每项包含 df、days、confidence_level
+            user_id: 用户ID
+            metric: 指标名称
+            model_type: 模型类型
+            model_dir: 模型目录
+            
+        Returns:
+            与 requests 顺序一致的预测结果列表
+        """
+        trainer, metrics, lock = ModelLoader.get_model(user_id, metric, model_type, model_dir)
         
         if trainer is None:
             raise ValueError(f"找不到模型: user{user_id}_{metric}_{model_type}")
         
-        # 预测未来值
-        prediction_result = trainer.predict_future(df, metric, days, confidence_level)
+        series = [ModelLoader._prepare_series(request['df'], metric) for request in requests]
+        days_list = [request['days'] for request in requests]
+        
+        with lock:
+            forecasts = ModelLoader._forecast_batch(trainer, series, days_list)
+            backtests = ModelLoader._backtest_batch(trainer, series)
         
-        # 生成未来日期
-        last_date = df.index[-1] if isinstance(df.index, pd.DatetimeIndex) else df['measured_at'].max()
-        future_dates = [last_date + timedelta(days=i+1) for i in range(days)]
+        results = []
+        for request, forecast, backtest in zip(requests, forecasts, backtests):
+            df = request['df']
+            
+            # 生成未来日期
+            last_date = df.index[-1] if isinstance(df.index, pd.DatetimeIndex) else df['measured_at'].max()
+            future_dates = [last_date + timedelta(days=i+1) for i in range(request['days'])]
+            
+            results.append({
+                'success': True,
+                'model_type': model_type,
+                'metric': metric,
+                'user_id': user_id,
+                'predictions': forecast['predictions'],
+                'confidence_interval': {
+                    'lower': forecast['lower'],
+                    'upper': forecast['upper'],
+                    'level': request['confidence_level']
+                },
+                'future_dates': [d.strftime('%Y-%m-%d') for d in future_dates],
+                'historical_backtest': backtest,
+                'metrics': metrics,
+                'last_update': datetime.now().isoformat(),
+            })
         
-        # 构建回测数据（用于展示模型在历史数据上的表现）
-        historical_backtest = ModelLoader._generate_backtest(trainer, df, metric)
+        return results
+    
+    @staticmethod
+    def _prepare_series(df: pd.DataFrame, metric: str) -> np.ndarray:
+        """取出指标列并前向/后向填充缺失值，返回 [n, 1] 的 float 数组"""
+        data = pd.DataFrame(df[[metric]].values).ffill().bfill()
+        return data.values.astype(float)
+    
+    @staticmethod
+    def _forecast_batch(trainer, series: List[np.ndarray], days_list: List[int],
+                        n_iterations: int = None) -> List[Dict]:
+        """
+        批量滚动预测（Monte Carlo Dropout 估计置信区间）
         
-        return {
-            'success': True,
-            'model_type': model_type,
-            'metric': metric,
-            'user_id': user_id,
-            'predictions': prediction_result['predictions'],
-            'confidence_interval': prediction_result['confidence_interval'],
-            'future_dates': [d.strftime('%Y-%m-%d') for d in future_dates],
-            'historical_backtest': historical_backtest,
-            'metrics': metrics,
-            'last_update': datetime.now().isoformat(),
-        }
+        所有请求共用同一模型和 seq_length，每一步把各请求的当前序列
+        复制 n_iterations 份拼成一个批次做一次前向传播；预测天数不同的请求
+        按前缀掩码处理，已达到自身天数的请求不再参与后续步骤。
+        
+        Args:
+            trainer: 训练好的模型
+            series: 各请求的历史数据（未标准化）
+            days_list: 各请求的预测天数
+            n_iterations: MC Dropout 采样次数
+            
+        Returns:
+            各请求的 predictions / lower / upper（已反标准化）
+        """
+        import torch
+        
+        n_iterations = n_iterations or ModelLoader.MC_ITERATIONS
+        seq_length = trainer.seq_length
+        horizon = max(days_list)
+        
+        # 各请求最后 seq_length 个点作为初始序列 [R, seq_length, 1]
+        sequences = np.stack([trainer.scaler_X.transform(data)[-seq_length:] for data in series])
+        means = np.zeros((len(series), horizon))
+        stds = np.zeros((len(series), horizon))
+        days = np.asarray(days_list)
+        
+        trainer.model.train()  # 启用 Dropout
+        try:
+            with torch.no_grad():
+                for step in range(horizon):
+                    active = np.flatnonzero(days > step)
+                    
+                    input_seq = torch.as_tensor(sequences[active], dtype=torch.float32, device=trainer.device)
+                    input_seq = input_seq.repeat_interleave(n_iterations, dim=0)
+                    
+                    mc_predictions = trainer.model(input_seq).cpu().numpy()
+                    mc_predictions = mc_predictions.reshape(len(active), n_iterations, -1)
+                    
+                    mean_pred = mc_predictions.mean(axis=1)  # [A, 1]
+                    means[active, step] = mean_pred[:, 0]
+                    stds[active, step] = mc_predictions.std(axis=1)[:, 0]
+                    
+                    # 更新序列（滚动预测）
+                    sequences[active] = np.concatenate(
+                        [sequences[active, 1:], mean_pred[:, None, :]], axis=1
+                    )
+        finally:
+            trainer.model.eval()
+        
+        def inverse(values):
+            return trainer.scaler_y.inverse_transform(values.reshape(-1, 1)).flatten().tolist()
+        
+        z_score = 1.96  # 95% confidence
+        results = []
+        for i, n_days in enumerate(days_list):
+            mean, std = means[i, :n_days], stds[i, :n_days]
+            results.append({
+                'predictions': inverse(mean),
+                'lower': inverse(mean - z_score * std),
+                'upper': inverse(mean + z_score * std),
+            })
+        
+        return results
     
     @staticmethod
     def _generate_backtest(trainer, df: pd.DataFrame, metric: str, 
@@ -112,42 +303,55 @@ class ModelLoader:
         Returns:
             回测数据字典
         """
-        import torch
-        import numpy as np
-        
-        # 取最后 n_points 个数据点进行回测
-        data = df[[metric]].values[-n_points*2:]  # 多取一些以确保有足够数据
-        data = pd.DataFrame(data).fillna(method='ffill').fillna(method='bfill').values
-        
-        if len(data) < trainer.seq_length + n_points:
-            n_points = len(data) - trainer.seq_length
-        
-        data_scaled = trainer.scaler_X.transform(data)
+        return ModelLoader._backtest_batch(trainer, [ModelLoader._prepare_series(df, metric)], n_points)[0]
+    
+    @staticmethod
+    def _backtest_batch(trainer, series: List[np.ndarray], n_points: int = 50) -> List[Dict]:
+        """
+        批量生成历史回测数据：所有请求的全部滑动窗口合并为一次前向传播
         
-        actual_values = []
-        predicted_values = []
+        Args:
+            trainer: 训练好的模型
+            series: 各请求的历史数据（未标准化）
+            n_points: 每个请求的回测点数
+            
+        Returns:
+            各请求的回测数据字典
+        """
+        import torch
         
-        trainer.model.eval()
+        seq_length = trainer.seq_length
+        windows, actuals, counts = [], [], []
         
-        for i in range(n_points):
-            # 取序列
-            seq = data_scaled[i:i+trainer.seq_length]
-            actual = data[i+trainer.seq_length][0]
+        for data in series:
+            # 取最后 n_points 个数据点进行回测（多取一些以确保有足够数据）
+            data = data[-n_points*2:]
+            count = min(n_points, max(len(data) - seq_length, 0))
+            data_scaled = trainer.scaler_X.transform(data)
             
-            # 预测
-            input_tensor = torch.FloatTensor(seq).unsqueeze(0).to(trainer.device)
+            for i in range(count):
+                windows.append(data_scaled[i:i+seq_length])
+                actuals.append(float(data[i+seq_length][0]))
+            counts.append(count)
+        
+        predicted = []
+        if windows:
+            trainer.model.eval()
+            input_tensor = torch.as_tensor(np.stack(windows), dtype=torch.float32, device=trainer.device)
             with torch.no_grad():
-                pred_scaled = trainer.model(input_tensor).cpu().numpy()[0]
-            
-            pred = trainer.scaler_y.inverse_transform(pred_scaled.reshape(-1, 1))[0][0]
-            
-            actual_values.append(float(actual))
-            predicted_values.append(float(pred))
+                pred_scaled = trainer.model(input_tensor).cpu().numpy()
+            predicted = trainer.scaler_y.inverse_transform(pred_scaled.reshape(-1, 1)).flatten().tolist()
         
-        return {
-            'actual': actual_values,
-            'predicted': predicted_values,
-        }
+        results = []
+        offset = 0
+        for count in counts:
+            results.append({
+                'actual': actuals[offset:offset+count],
+                'predicted': predicted[offset:offset+count],
+            })
+            offset += count
+        
+        return results
     
     @staticmethod
     def get_available_models(user_id: int, model_dir: str = 'models') -> Dict[str, List[str]]:
@@ -34,7 +34,7 @@ class ModelTrainer:
             user_id: 用户ID
             metric: 要预测的指标
             model_type: 模型类型 ('lstm' 或 'transformer')
-            **kwargs: 其他训练参数
+            **kwargs: 其他训练参数（progress_callback 会透传给训练器，按 epoch 汇报进度）
             
         Returns:
             训练结果字典
@@ -85,7 +85,8 @@ class ModelTrainer:
             batch_size=kwargs.get('batch_size', 32),
             learning_rate=kwargs.get('learning_rate', 0.001),
             patience=kwargs.get('patience', 15),
-            verbose=kwargs.get('verbose', True)
+            verbose=kwargs.get('verbose', True),
+            progress_callback=kwargs.get('progress_callback')
         )
         
         # 评估模型